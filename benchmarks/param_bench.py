@@ -0,0 +1,90 @@
+"""Bulk parameter set: Vehicle.set_parameters vs. Vehicle.apply_parameters.
+
+Both run against FakeAutopilot over loopback UDP with a synthetic table of
+--params parameters, every one of which is set to a new value. The fake
+beats at 1 Hz like ArduPilot, which is what paces set_parameters' rounds.
+--delay holds back every PARAM_VALUE (a radio's round trip) and --loss drops
+that share of them. For each method it reports:
+
+  seconds       wall time until the call returned
+  params/s      parameters confirmed per second
+  param_sets    PARAM_SETs the autopilot received (the minimum is --params)
+  failed        parameters not confirmed
+
+    python benchmarks/param_bench.py
+    python benchmarks/param_bench.py --params 300 --delay 0.1 --loss 0.05 --window 1 8 32 --json
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.vehicle import Vehicle
+
+
+def run(method, window, n_params, delay, loss, seed):
+    params = {"BENCH_P%03d" % i: float(i) for i in range(n_params)}
+    wanted = {name: value + 0.5 for name, value in params.items()}
+    with FakeAutopilot(params=params, seed=seed) as fake:
+        fake.delay("PARAM_VALUE", delay)
+        if loss:
+            fake.drop("PARAM_VALUE", probability=loss)
+        vehicle = Vehicle(sysid=fake.sysid)
+        vehicle.connect(fake.connection_string)
+        try:
+            tstart = time.monotonic()
+            if method == "set_parameters":
+                try:
+                    vehicle.set_parameters(dict(wanted), verbose=False)
+                except ValueError:
+                    pass
+            else:
+                vehicle.apply_parameters(wanted, window=window)
+            elapsed = time.monotonic() - tstart
+        finally:
+            vehicle.close()
+        failed = sum(1 for name, value in wanted.items() if fake.params[name] != value)
+        return {
+            "method": method if method == "set_parameters" else "apply_parameters(window=%d)" % window,
+            "params": n_params,
+            "delay_s": delay,
+            "loss": loss,
+            "seconds": round(elapsed, 3),
+            "params_per_s": round((n_params - failed) / elapsed, 1),
+            "param_sets": fake.received["PARAM_SET"],
+            "failed": failed,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--params", type=int, default=100, help="Parameters to set")
+    parser.add_argument("--window", type=int, nargs="*", default=[1, 4, 16], help="apply_parameters windows to try")
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds each PARAM_VALUE is held back")
+    parser.add_argument("--loss", type=float, default=0.0, help="Share of PARAM_VALUEs dropped")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip_baseline", action="store_true", help="Do not run set_parameters")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+    # set_parameters logs every round of every parameter.
+    logging.getLogger("VEHICLE").setLevel(logging.WARNING)
+
+    runs = [] if args.skip_baseline else [("set_parameters", None)]
+    runs += [("apply_parameters", window) for window in args.window]
+    results = []
+    if not args.json:
+        print("%-30s %9s %9s %10s %7s" % ("method", "seconds", "params/s", "param_sets", "failed"))
+    for method, window in runs:
+        r = run(method, window, args.params, args.delay, args.loss, args.seed)
+        results.append(r)
+        if not args.json:
+            print("%-30s %9.2f %9.1f %10d %7d" % (r["method"], r["seconds"], r["params_per_s"], r["param_sets"],
+                                                  r["failed"]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Multi-leg GUIDED flight: client-side go_to + polling vs. TargetQueue.
+
+Both fly the same --legs legs (a square of --side metres, repeated) against
+FakeAutopilot, which flies straight to each target at --speed m/s and
+streams LOCAL_POSITION_NED at --rate Hz. The polling client does what a
+remote script does over HTTP: go_to_ned, then read the position every
+--poll seconds until within 1 m, each request costing --latency seconds
+each way. The queue gets every target at once. For each it reports:
+
+  seconds       wall time for all legs
+  flight s      the part spent moving (path length / speed)
+  overhead/leg ms
+                (seconds - flight s) / legs: time per leg beyond the
+                flight itself. Both methods count a target as reached
+                within 1 m, which a fast enough reaction turns into a few
+                milliseconds of head start.
+
+    python benchmarks/queue_bench.py
+    python benchmarks/queue_bench.py --legs 40 --poll 0.5 --latency 0.05 --json
+"""
+
+import argparse
+import json
+import math
+import time
+
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.target_queue import TargetQueue
+
+
+def square(legs, side):
+    corners = [(side, 0.0, -10.0), (side, side, -10.0), (0.0, side, -10.0), (0.0, 0.0, -10.0)]
+    return [corners[i % 4] for i in range(legs)]
+
+
+def poll(copter, targets, interval, latency):
+    for target in targets:
+        time.sleep(latency)
+        copter.go_to_ned(*target)
+        time.sleep(latency)
+        while True:
+            time.sleep(latency)
+            m = copter.latest("LOCAL_POSITION_NED")
+            time.sleep(latency)
+            if m is not None and math.dist((m.x, m.y, m.z), target) <= 1.0:
+                break
+            time.sleep(interval)
+
+
+def queued(copter, targets):
+    queue = TargetQueue(copter)
+    queue.enqueue([{"frame": "ned", "x": x, "y": y, "z": z} for x, y, z in targets])
+    while queue.status()["state"] != "idle":
+        time.sleep(0.005)
+
+
+def run(method, args):
+    targets = square(args.legs, args.side)
+    # The fake starts at home and flies to 10 m up first; start it there.
+    with FakeAutopilot(rates={"LOCAL_POSITION_NED": args.rate, "GLOBAL_POSITION_INT": args.rate}) as fake:
+        fake.speed = args.speed
+        fake.position = [0.0, 0.0, -10.0]
+        copter = Copter(sysid=fake.sysid)
+        copter.connect(fake.connection_string)
+        try:
+            tstart = time.monotonic()
+            if method == "poll":
+                poll(copter, targets, args.poll, args.latency)
+            else:
+                queued(copter, targets)
+            elapsed = time.monotonic() - tstart
+        finally:
+            copter.close()
+    path = sum(math.dist(a, b) for a, b in zip([(0.0, 0.0, -10.0)] + targets, targets))
+    flight = path / args.speed
+    return {
+        "method": method,
+        "legs": args.legs,
+        "seconds": round(elapsed, 3),
+        "flight_s": round(flight, 3),
+        "overhead_per_leg_ms": round((elapsed - flight) / args.legs * 1000.0, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--legs", type=int, default=20)
+    parser.add_argument("--side", type=float, default=10.0, help="Square side (m)")
+    parser.add_argument("--speed", type=float, default=20.0, help="Fake ground speed (m/s)")
+    parser.add_argument("--rate", type=float, default=10.0, help="LOCAL_POSITION_NED stream rate (Hz)")
+    parser.add_argument("--poll", type=float, default=0.2, help="Polling client's sleep between position reads (s)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Polling client's one-way request latency (s)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if not args.json:
+        print("%-6s %5s %9s %9s %16s" % ("method", "legs", "seconds", "flight s", "overhead/leg ms"))
+    for method in ("poll", "queue"):
+        r = run(method, args)
+        results.append(r)
+        if not args.json:
+            print("%-6s %5d %9.2f %9.2f %16.1f" % (r["method"], r["legs"], r["seconds"], r["flight_s"],
+                                                  r["overhead_per_leg_ms"]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
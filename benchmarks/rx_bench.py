@@ -0,0 +1,201 @@
+"""Receiver throughput: recv_match -> history -> _dispatch -> Subscription._offer.
+
+Runs the real Vehicle._rx_loop thread over MemoryLink, a mavfile that hands
+out pre-packed MAVLink2 packets one per recv() (as a UDP read would), so no
+socket or autopilot is involved. For each combination of message mix,
+subscriber count and predicate cost it reports:
+
+  msgs/s        messages the receiver parsed and dispatched per second
+  dispatch p50/p99/max
+                time spent in _dispatch per message (the offer to every
+                interested subscription, predicates included)
+  dropped       messages the never-drained subscriptions lost to drop-oldest
+
+Subscribers ask for the mix's hot type and are never drained, which is the
+worst case of a stalled consumer. A 50 Hz telemetry link needs well under
+1000 msgs/s, so the msgs/s column read on the target (e.g. a Pi 4) is the
+headroom before heartbeats and acks start to queue behind telemetry.
+
+    python benchmarks/rx_bench.py
+    python benchmarks/rx_bench.py --mix telemetry acks --subs 0 10 100 --predicate none costly --json
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from array import array
+
+os.environ['MAVLINK20'] = '1'
+
+from pymavlink import mavutil  # noqa: E402
+
+mavutil.set_dialect("ardupilotmega")
+
+from uav_api.vehicles.vehicle import Vehicle  # noqa: E402
+
+mavlink = mavutil.mavlink
+
+
+def _traffic():
+    return {
+        "GLOBAL_POSITION_INT": mavlink.MAVLink_global_position_int_message(
+            1000, -158400810, -479266420, 1042000, 15000, 120, -40, 10, 9000),
+        "LOCAL_POSITION_NED": mavlink.MAVLink_local_position_ned_message(1000, 1.0, 2.0, -15.0, 0.1, 0.2, 0.0),
+        "VFR_HUD": mavlink.MAVLink_vfr_hud_message(12.5, 11.0, 90, 55, 1042.5, 0.0),
+        "ATTITUDE": mavlink.MAVLink_attitude_message(1000, 0.01, 0.02, 1.5, 0.0, 0.0, 0.0),
+        "SYS_STATUS": mavlink.MAVLink_sys_status_message(0x3FFF, 0x3FFF, 0x3FFF, 100, 12600, 500, 90,
+                                                         0, 0, 0, 0, 0, 0),
+        "GPS_RAW_INT": mavlink.MAVLink_gps_raw_int_message(1000, 3, -158400810, -479266420, 1042000,
+                                                           80, 120, 0, 0, 14),
+        "HEARTBEAT": mavlink.MAVLink_heartbeat_message(2, 3, 81, 4, 4, 3),
+        "COMMAND_ACK": mavlink.MAVLink_command_ack_message(400, 0),
+    }
+
+
+# Mix name -> (hot type the subscribers want, [(type, share), ...]).
+MIXES = {
+    # What MAV_DATA_STREAM_ALL at 5-10 Hz mostly carries.
+    "telemetry": ("GLOBAL_POSITION_INT", [
+        ("GLOBAL_POSITION_INT", 3), ("LOCAL_POSITION_NED", 3), ("VFR_HUD", 3), ("ATTITUDE", 3),
+        ("GPS_RAW_INT", 2), ("SYS_STATUS", 1), ("HEARTBEAT", 1)]),
+    # A high-rate position/attitude profile (--message_rates GLOBAL_POSITION_INT=50 ATTITUDE=50).
+    "position": ("GLOBAL_POSITION_INT", [("GLOBAL_POSITION_INT", 1), ("ATTITUDE", 1)]),
+    # Telemetry with a command burst in flight: every tenth message is an ack.
+    "acks": ("COMMAND_ACK", [
+        ("GLOBAL_POSITION_INT", 3), ("LOCAL_POSITION_NED", 2), ("VFR_HUD", 2), ("ATTITUDE", 2),
+        ("COMMAND_ACK", 1)]),
+}
+
+PREDICATES = {
+    "none": None,
+    "cheap": lambda m: getattr(m, "command", 0) == 400 or getattr(m, "lat", 1) != 0,
+    # About what a distance-to-target check costs.
+    "costly": lambda m: math.hypot(getattr(m, "lat", 0) * 1.0e-7 + 15.84,
+                                   getattr(m, "lon", 0) * 1.0e-7 + 47.92) < 1.0,
+}
+
+
+class MemoryLink(mavutil.mavfile):
+    """A mavfile over pre-packed packets, one per recv() like a UDP read.
+
+    `exhausted` is set once the last packet has been handed out; writes (our
+    heartbeats) are discarded."""
+
+    def __init__(self, packets):
+        self._packets = packets
+        self._next = 0
+        self.exhausted = threading.Event()
+        mavutil.mavfile.__init__(self, None, "memory", source_system=250, source_component=250)
+
+    def recv(self, n=None):
+        if self._next >= len(self._packets):
+            self.exhausted.set()
+            return b""
+        packet = self._packets[self._next]
+        self._next += 1
+        return packet
+
+    def write(self, buf):
+        pass
+
+    def close(self):
+        pass
+
+
+def packets(mix, count):
+    traffic = _traffic()
+    encoder = mavlink.MAVLink(None, srcSystem=1, srcComponent=1)
+    cycle = [mtype for mtype, share in MIXES[mix][1] for _ in range(share)]
+    packed = {mtype: None for mtype in cycle}
+    out = []
+    for i in range(count):
+        mtype = cycle[i % len(cycle)]
+        # Re-pack every time so sequence numbers advance as on a real link.
+        packed[mtype] = traffic[mtype].pack(encoder)
+        out.append(packed[mtype])
+    return out
+
+
+def run(mix, n_subs, predicate, messages, maxsize):
+    vehicle = Vehicle(sysid=1)
+    link = MemoryLink(packets(mix, messages))
+    vehicle.mav = link
+    vehicle._start_transmitter()
+
+    latencies = array('d', bytes(8 * messages))
+    count = 0
+    dispatch = vehicle._dispatch
+    clock = time.perf_counter
+
+    def timed_dispatch(m):
+        nonlocal count
+        tstart = clock()
+        dispatch(m)
+        latencies[count] = clock() - tstart
+        count += 1
+
+    vehicle._dispatch = timed_dispatch
+    hot = MIXES[mix][0]
+    contexts = [vehicle.subscribe(types={hot}, predicate=PREDICATES[predicate], maxsize=maxsize)
+                for _ in range(n_subs)]
+    subs = [ctx.__enter__() for ctx in contexts]
+    try:
+        tstart = clock()
+        vehicle._start_receiver()
+        link.exhausted.wait()
+        elapsed = clock() - tstart
+    finally:
+        vehicle.close()
+        for ctx in contexts:
+            ctx.__exit__(None, None, None)
+
+    ordered = sorted(latencies[:count])
+
+    def us(q):
+        return round(ordered[min(len(ordered) - 1, int(q * (len(ordered) - 1)))] * 1e6, 2) if ordered else None
+
+    return {
+        "mix": mix,
+        "subs": n_subs,
+        "predicate": predicate,
+        "messages": count,
+        "msgs_per_s": round(count / elapsed),
+        "dispatch_p50_us": us(0.50),
+        "dispatch_p99_us": us(0.99),
+        "dispatch_max_us": us(1.0),
+        "dropped": sum(sub.dropped for sub in subs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", nargs="*", choices=sorted(MIXES), default=["telemetry", "acks"])
+    parser.add_argument("--subs", type=int, nargs="*", default=[0, 10, 100])
+    parser.add_argument("--predicate", nargs="*", choices=sorted(PREDICATES), default=["none", "costly"])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--maxsize", type=int, default=512, help="Queue size of each subscriber")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if not args.json:
+        print("%-10s %5s %-9s %10s %9s %9s %9s %9s" % (
+            "mix", "subs", "predicate", "msgs/s", "p50 us", "p99 us", "max us", "dropped"))
+    for mix in args.mix:
+        for n_subs in args.subs:
+            for predicate in (args.predicate if n_subs else ["none"]):
+                r = run(mix, n_subs, predicate, args.messages, args.maxsize)
+                results.append(r)
+                if not args.json:
+                    print("%-10s %5d %-9s %10d %9.2f %9.2f %9.2f %9d" % (
+                        r["mix"], r["subs"], r["predicate"], r["msgs_per_s"], r["dispatch_p50_us"],
+                        r["dispatch_p99_us"], r["dispatch_max_us"], r["dropped"]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
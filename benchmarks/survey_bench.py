@@ -0,0 +1,139 @@
+"""Survey generation: survey.lawnmower vs. a per-line, per-edge Python loop.
+
+Each shape is scaled so its lawnmower has about --waypoints waypoints (two
+per line segment), then generated --repeat times by the vectorized
+lawnmower and by scalar_lawnmower, the same algorithm written as nested
+Python loops. The waypoints are also loaded into a Copter's wploader with
+add_waypoint, as Vehicle.load_survey does. For each shape it reports:
+
+  vertices      polygon vertices
+  waypoints     survey waypoints generated
+  numpy ms      median lawnmower time
+  loop ms       median scalar_lawnmower time
+  load ms       wploader fill time for the waypoints
+
+    python benchmarks/survey_bench.py
+    python benchmarks/survey_bench.py --waypoints 10000 --shape square comb circle --json
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.survey import _rotation, _to_latlon, _to_local, lawnmower
+
+ORIGIN = (-15.84, -47.92)
+
+
+def shape(name, size):
+    """Polygon (lat, lon) vertices about `size` metres across."""
+    if name == "square":
+        xy = np.array([(0, 0), (size, 0), (size, size), (0, size)], dtype=float)
+    elif name == "comb":
+        # Ten teeth standing on a base, so most lines cross the polygon ten times.
+        teeth = 10
+        width = size / (2 * teeth - 1)
+        xy = [(0.0, 0.0), (size, 0.0)]
+        for k in reversed(range(teeth)):
+            left = 2 * k * width
+            xy += [(left + width, size), (left, size)]
+            if k:
+                xy += [(left, 0.1 * size), (left - width, 0.1 * size)]
+        xy = np.array(xy)
+    elif name == "circle":
+        angle = np.linspace(0, 2 * np.pi, 1000, endpoint=False)
+        xy = np.column_stack((np.cos(angle), np.sin(angle))) * size / 2.0
+    else:
+        raise ValueError(name)
+    return _to_latlon(xy, ORIGIN).tolist()
+
+
+def scalar_lawnmower(polygon, spacing, heading=0.0):
+    """lawnmower() without NumPy in the sweep: one line, one edge at a time."""
+    latlon = np.asarray(polygon, dtype=float)
+    origin = latlon.mean(axis=0)
+    rotate = _rotation(np.radians(90.0 - heading))
+    vertices = (_to_local(latlon, origin) @ rotate).tolist()
+    edges = list(zip(vertices, vertices[1:] + vertices[:1]))
+    y_min = min(v[1] for v in vertices)
+    y_max = max(v[1] for v in vertices)
+    points = []
+    y = y_min + spacing / 2.0
+    line = 0
+    while y < y_max:
+        xs = sorted(x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                    for (x1, y1), (x2, y2) in edges if (y1 <= y) != (y2 <= y))
+        segments = list(zip(xs[0::2], xs[1::2]))
+        if line % 2:
+            segments = [(end, start) for start, end in reversed(segments)]
+        for start, end in segments:
+            points += [(start, y), (end, y)]
+        y += spacing
+        line += 1
+    return _to_latlon(np.array(points) @ rotate.T, origin)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        tstart = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - tstart)
+    return result, statistics.median(times)
+
+
+def run(name, n_waypoints, repeat):
+    size = 1000.0
+    polygon = shape(name, size)
+    # Waypoints grow as 1 / spacing; one trial run sizes the real one.
+    spacing = size / 10.0
+    spacing *= len(lawnmower(polygon, spacing)) / n_waypoints
+    points, numpy_s = timed(lambda: lawnmower(polygon, spacing), repeat)
+    reference, loop_s = timed(lambda: scalar_lawnmower(polygon, spacing), repeat)
+    assert np.allclose(points, reference)
+    vehicle = Copter(sysid=1)
+
+    def load():
+        vehicle.wploader.clear()
+        for lat, lon in points.tolist():
+            vehicle.add_waypoint(lat, lon, 30)
+
+    _, load_s = timed(load, 1)
+    return {
+        "shape": name,
+        "vertices": len(polygon),
+        "waypoints": len(points),
+        "spacing_m": round(spacing, 4),
+        "numpy_ms": round(numpy_s * 1000.0, 2),
+        "loop_ms": round(loop_s * 1000.0, 2),
+        "load_ms": round(load_s * 1000.0, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--waypoints", type=int, default=10000, help="Survey waypoints to aim for")
+    parser.add_argument("--shape", nargs="*", default=["square", "comb", "circle"], help="square, comb and/or circle")
+    parser.add_argument("--repeat", type=int, default=5, help="Generations per measurement (median)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if not args.json:
+        print("%-8s %8s %9s %9s %9s %9s" % ("shape", "vertices", "waypoints", "numpy ms", "loop ms", "load ms"))
+    for name in args.shape:
+        r = run(name, args.waypoints, args.repeat)
+        results.append(r)
+        if not args.json:
+            print("%-8s %8d %9d %9.2f %9.2f %9.2f" % (r["shape"], r["vertices"], r["waypoints"], r["numpy_ms"],
+                                                      r["loop_ms"], r["load_ms"]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Trajectory streamer timing: setpoint jitter at each rate, idle and busy.
+
+Streams a --seconds circle (radius 20 m) to FakeAutopilot through
+TrajectoryStreamer at each --rate, once on an idle process and once with
+--load Python threads spinning (they compete for the GIL as request
+handlers and telemetry encoding do in the API). For each run it reports
+the streamer's own statistics:
+
+  sent          setpoints sent (skipped ticks are in "skipped")
+  lag p50/p99/max
+                ms between a tick's scheduled time and its setpoint
+  interval sd   standard deviation of the time between setpoints, ms
+  max error     largest deviation of one interval from the period, ms
+
+    python benchmarks/trajectory_bench.py
+    python benchmarks/trajectory_bench.py --rate 10 20 50 --seconds 10 --load 4 --json
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.trajectory import Trajectory, TrajectoryStreamer
+
+
+def circle(seconds, radius=20.0, samples=40):
+    return [{"t": seconds * i / samples,
+             "x": radius * math.cos(2 * math.pi * i / samples),
+             "y": radius * math.sin(2 * math.pi * i / samples),
+             "z": -10.0} for i in range(samples + 1)]
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def run(rate, seconds, load):
+    with FakeAutopilot() as fake:
+        copter = Copter(sysid=fake.sysid)
+        copter.connect(fake.connection_string)
+        streamer = TrajectoryStreamer(copter)
+        stop = threading.Event()
+        spinners = [threading.Thread(target=spin, args=(stop,), daemon=True) for _ in range(load)]
+        try:
+            for spinner in spinners:
+                spinner.start()
+            streamer.start(Trajectory(circle(seconds)), rate=rate)
+            while streamer.streaming:
+                time.sleep(0.05)
+            status = streamer.status()
+        finally:
+            stop.set()
+            streamer.stop()
+            copter.close()
+    jitter = status["jitter"]
+    return {
+        "rate": rate,
+        "load": load,
+        "state": status["state"],
+        "sent": status["sent"],
+        "skipped": status["skipped"],
+        "lag_p50_ms": jitter["lag_ms"]["p50"],
+        "lag_p99_ms": jitter["lag_ms"]["p99"],
+        "lag_max_ms": jitter["lag_ms"]["max"],
+        "interval_sd_ms": jitter["interval_ms"]["stdev"],
+        "interval_max_error_ms": jitter["interval_ms"]["max_error"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, nargs="*", default=[10, 20, 50], help="Setpoint rates to try (Hz)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Trajectory duration")
+    parser.add_argument("--load", type=int, default=2, help="Spinning threads in the busy runs")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if not args.json:
+        print("%5s %5s %6s %7s %8s %8s %8s %12s %10s" % ("rate", "load", "sent", "skipped", "lag p50", "lag p99",
+                                                        "lag max", "interval sd", "max error"))
+    for rate in args.rate:
+        for load in (0, args.load):
+            r = run(rate, args.seconds, load)
+            results.append(r)
+            if not args.json:
+                print("%5g %5d %6d %7d %8.2f %8.2f %8.2f %12.2f %10.2f" % (
+                    r["rate"], r["load"], r["sent"], r["skipped"], r["lag_p50_ms"], r["lag_p99_ms"],
+                    r["lag_max_ms"], r["interval_sd_ms"], r["interval_max_error_ms"]))
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import math
 import time
 import sys
@@ -61,22 +62,69 @@ def euclidean_distance(p1, p2):
     return math.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2 + (p1[2] - p2[2])**2)
 
 
+# The API sends a keepalive comment after 15 s without data, so a stream
+# silent for longer than this has stalled.
+STREAM_READ_TIMEOUT = 20
+
+
+def stream_telemetry(session, base_url, types, rate=None, deadline=None):
+    """Yield samples pushed by /telemetry/stream (Server-Sent Events) as the API receives them.
+
+    Stops at `deadline` (a time.time() value), checked on every line including keepalives.
+    Raises the session's read timeout error when the stream stays silent for STREAM_READ_TIMEOUT.
+    """
+    params = {"types": types}
+    if rate is not None:
+        params["rate"] = rate
+    read_timeout = STREAM_READ_TIMEOUT
+    if deadline is not None:
+        read_timeout = max(1.0, min(read_timeout, deadline - time.time()))
+    with session.get(f"{base_url}/telemetry/stream", params=params, stream=True,
+                     timeout=(5, read_timeout)) as response:
+        if response.status_code != 200:
+            print(f"Telemetry stream failed. status_code={response.status_code}")
+            sys.exit(1)
+        for line in response.iter_lines():
+            if deadline is not None and time.time() > deadline:
+                return
+            if isinstance(line, bytes):
+                line = line.decode()
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
+
+
 def wait_for_arrival(session, base_url, target, tolerance=1.0, timeout=120):
-    """Poll /telemetry/ned until the drone is within tolerance of target (absolute NED coords).
+    """Watch the pushed NED stream until the drone is within tolerance of target (absolute NED coords).
 
+    Falls back to polling /telemetry/ned if the stream stalls or ends early.
     Returns True if arrived, False if timed out.
     """
-    start = time.time()
-    while time.time() < start + timeout:
-        ned = send_command(session, base_url, "/telemetry/ned")
-        pos = ned["info"]["position"]
+    deadline = time.time() + timeout
+    last_print = 0
+
+    def arrived(sample):
+        nonlocal last_print
+        pos = sample["info"]["position"]
         current = (pos["x"], pos["y"], pos["z"])
         dist = euclidean_distance(target, current)
-        print(f"  Position: ({current[0]:.1f}, {current[1]:.1f}, {current[2]:.1f}), "
-              f"distance to target: {dist:.2f}m")
         if dist < tolerance:
             return True
-        time.sleep(1)
+        if time.time() - last_print >= 1:
+            print(f"  Position: ({current[0]:.1f}, {current[1]:.1f}, {current[2]:.1f}), "
+                  f"distance to target: {dist:.2f}m")
+            last_print = time.time()
+        return False
+
+    try:
+        for sample in stream_telemetry(session, base_url, "ned", rate=10, deadline=deadline):
+            if arrived(sample):
+                return True
+    except Exception as e:
+        print(f"  Telemetry stream lost ({e}), polling instead")
+    while time.time() < deadline:
+        if arrived(send_command(session, base_url, "/telemetry/ned")):
+            return True
+        time.sleep(max(0.0, min(1.0, deadline - time.time())))
     print(f"  Timeout: did not reach target within {timeout}s")
     return False
 
@@ -27,8 +27,10 @@ def test_plane_app_registers_plane_routers(plane_args):
     assert "/command/land_at" in paths
     assert "/movement/stop" in paths
     assert "/telemetry/general" in paths
-    # copter-only routers must be absent
-    assert not any(path.startswith("/mission") for path in paths)
+    # mission upload and surveys are shared; the copter-only script routes must be absent
+    shared = {"/mission/items", "/mission/survey"}
+    assert shared <= paths
+    assert not any(path.startswith("/mission") and path not in shared for path in paths)
     assert not any(path.startswith("/peripherical") for path in paths)
     assert "/movement/go_to_ned" not in paths
 
@@ -0,0 +1,38 @@
+"""Unit tests for the pure parts of `uav-api bench` (mix parsing, stats and
+budget checks); the load run itself needs a spawned API and is not run here."""
+
+import pytest
+
+from uav_api.bench import check_budgets, parse_mix, percentile, summarize
+
+
+def test_parse_mix():
+    assert parse_mix("telemetry=90, command=10") == {"telemetry": 90.0, "command": 10.0}
+    with pytest.raises(ValueError):
+        parse_mix("telemetry")
+    with pytest.raises(ValueError):
+        parse_mix("takeoff=5")
+
+
+def test_percentiles_and_summary():
+    latencies = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    assert percentile(sorted(latencies), 0.5) == pytest.approx(0.051)
+    assert percentile([], 0.5) is None
+    stats = summarize(latencies, {"504": 4}, elapsed=2.0, cpu_seconds=0.52)
+    assert stats["requests"] == 104
+    assert stats["rps"] == 52.0
+    assert (stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (95.0, 99.0, 100.0)
+    assert stats["api_cpu_percent"] == 26.0
+    assert stats["api_cpu_ms_per_request"] == 5.0
+
+
+def test_budget_violations():
+    result = {
+        "endpoints": {"gps": {"p95_ms": 12.0, "rps": 800.0}},
+        "mix": {"total": {"p99_ms": 700.0, "rps": 50.0}},
+    }
+    budgets = {"gps": {"p95_ms": 50}, "mix": {"p99_ms": 500, "min_rps": 100}, "absent": {"p95_ms": 1}}
+    assert check_budgets(result, budgets) == [
+        {"endpoint": "mix", "metric": "p99_ms", "value": 700.0, "budget": 500},
+        {"endpoint": "mix", "metric": "min_rps", "value": 50.0, "budget": 100},
+    ]
@@ -15,6 +15,10 @@ Telemetry getters must return attribute-bearing objects with numeric fields
 in raw MAVLink units (lat in 1e7 degrees, alt in mm, hdg in centidegrees...):
 the handlers do the unit conversion arithmetic, which is asserted exactly in
 copter_telemetry_unit_test.py.
+
+Tests that need real MAVLink behavior instead connect a real Vehicle to the
+in-process FakeAutopilot through `connected`, and reach the routers through
+`vehicle_client`.
 """
 
 from unittest.mock import create_autospec
@@ -34,9 +38,12 @@ from uav_api.routers.dependencies import (
     get_copter_instance,
     get_plane_instance,
     get_scripts_table,
+    get_vehicle_instance,
 )
+from uav_api.routers.response_cache import telemetry_cache
 from uav_api.vehicles.copter import Copter
 from uav_api.vehicles.plane import Plane
+from uav_api.vehicles.vehicle import Vehicle
 
 
 def _configure_vehicle_mock(mock):
@@ -50,6 +57,14 @@ def _configure_vehicle_mock(mock):
     return mock
 
 
+@pytest.fixture(autouse=True)
+def _empty_response_cache():
+    """The telemetry response cache is process-wide; start every test cold."""
+    telemetry_cache.clear()
+    yield
+    telemetry_cache.clear()
+
+
 @pytest.fixture
 def copter_args(tmp_path):
     args = parse_args([])
@@ -74,6 +89,7 @@ def fake_copter():
     mock.get_raw_gps.return_value = RAW_GPS
     mock.get_ned_info.return_value = NED
     mock.get_ned_position.return_value = NED_POSITION
+    mock.get_ned_position_async.return_value = NED_POSITION
     mock.get_compass_info.return_value = COMPASS
     mock.get_raw_status_message.return_value = SYS_STATUS
     return mock
@@ -95,6 +111,7 @@ def copter_client(copter_args, fake_copter, scripts_table):
     app = create_app(copter_args)
     app.dependency_overrides[get_args] = lambda: copter_args
     app.dependency_overrides[get_copter_instance] = lambda: fake_copter
+    app.dependency_overrides[get_vehicle_instance] = lambda: fake_copter
     app.dependency_overrides[get_scripts_table] = lambda: scripts_table
     return TestClient(app)
 
@@ -104,4 +121,47 @@ def plane_client(plane_args, fake_plane):
     app = create_app(plane_args)
     app.dependency_overrides[get_args] = lambda: plane_args
     app.dependency_overrides[get_plane_instance] = lambda: fake_plane
+    app.dependency_overrides[get_vehicle_instance] = lambda: fake_plane
     return TestClient(app)
+
+
+def _returning(value):
+    # A closure, not `lambda value=value: value`: FastAPI would take the
+    # default argument for a query parameter.
+    return lambda: value
+
+
+@pytest.fixture
+def connected():
+    """connected(fake, cls=Vehicle): a `cls` connected to a FakeAutopilot,
+    closed at teardown."""
+    made = []
+
+    def make(fake, cls=Vehicle):
+        vehicle = cls(sysid=fake.sysid)
+        vehicle.connect(fake.connection_string)
+        made.append(vehicle)
+        return vehicle
+
+    yield make
+    for vehicle in made:
+        vehicle.close()
+
+
+@pytest.fixture
+def vehicle_client(copter_args):
+    """vehicle_client(vehicle, overrides=None, args=None): a TestClient whose
+    routers are served by a real (not mocked) `vehicle`. `overrides` maps more
+    dependencies to the objects they return; `args` defaults to copter_args."""
+    def make(vehicle, overrides=None, args=None):
+        args = args or copter_args
+        app = create_app(args)
+        app.dependency_overrides[get_args] = lambda: args
+        app.dependency_overrides[get_vehicle_instance] = lambda: vehicle
+        if isinstance(vehicle, Copter):
+            app.dependency_overrides[get_copter_instance] = lambda: vehicle
+        for dependency, value in (overrides or {}).items():
+            app.dependency_overrides[dependency] = _returning(value)
+        return TestClient(app)
+
+    return make
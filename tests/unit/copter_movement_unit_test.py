@@ -33,7 +33,7 @@ class TestGps:
         assert_envelope(r.json(), "Arrived")
         fake_copter.go_to_gps.assert_called_once_with(-15.84, -47.92, 30.0, False)
         fake_copter.mav_location.assert_called_once_with(-15.84, -47.92, 30.0)
-        fake_copter.wait_location.assert_called_once_with(
+        fake_copter.wait_location_async.assert_awaited_once_with(
             fake_copter.mav_location.return_value, timeout=60
         )
 
@@ -56,8 +56,8 @@ class TestNed:
         assert r.status_code == 200
         assert_envelope(r.json(), "Arrived")
         fake_copter.go_to_ned.assert_called_once_with(10.0, 5.0, -20.0, look_at_target=False)
-        fake_copter.wait_ned_position.assert_called_once()
-        target = fake_copter.wait_ned_position.call_args[0][0]
+        fake_copter.wait_ned_position_async.assert_awaited_once()
+        target = fake_copter.wait_ned_position_async.call_args[0][0]
         assert (target.x, target.y, target.z) == (10.0, 5.0, -20.0)
 
     def test_drive(self, copter_client, fake_copter):
@@ -73,7 +73,7 @@ class TestNed:
         expected = (NED_POSITION.x + 3.0, NED_POSITION.y + 4.0, NED_POSITION.z - 1.0)
         assert_envelope(r.json(), str(expected))
         fake_copter.drive_ned.assert_called_once_with(3.0, 4.0, -1.0, look_at_target=False)
-        target = fake_copter.wait_ned_position.call_args[0][0]
+        target = fake_copter.wait_ned_position_async.call_args[0][0]
         assert (target.x, target.y, target.z) == expected
 
     def test_travel_at_ned(self, copter_client, fake_copter):
@@ -5,12 +5,17 @@ vel/100 to m/s, hdg/100 to degrees) are real handler logic the SITL suite
 can only bound-check — here they are asserted exactly.
 """
 
+from types import SimpleNamespace
+
 import pytest
 
 from unit_helpers import (
     BATTERY, COMPASS, ERRORS, GENERAL, HOME, NED, SENSORS, assert_envelope,
 )
 
+from uav_api.routers import formatters
+from uav_api.vehicles.vehicle import TimeoutException
+
 pytestmark = pytest.mark.copter
 
 
@@ -113,3 +118,57 @@ def test_telemetry_failure_is_500(copter_client, fake_copter):
     r = copter_client.get("/telemetry/general")
     assert r.status_code == 500
     assert "GET_GENERAL_INFO FAIL" in r.json()["detail"]
+
+
+def test_gps_body_is_served_from_cache_until_a_newer_message(copter_client, fake_copter, monkeypatch):
+    calls = []
+    real_gps_info = formatters.gps_info
+    monkeypatch.setattr(formatters, "gps_info", lambda m: calls.append(m) or real_gps_info(m))
+
+    first = copter_client.get("/telemetry/gps")
+    second = copter_client.get("/telemetry/gps")
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert len(calls) == 1
+
+    newer = SimpleNamespace(**{**vars(fake_copter.get_gps_info.return_value), "_timestamp": 101.0, "hdg": 18000})
+    fake_copter.get_gps_info.return_value = newer
+    third = copter_client.get("/telemetry/gps")
+    assert third.json()["info"]["heading"] == 180.0
+    assert third.headers["etag"] != first.headers["etag"]
+    assert len(calls) == 2
+
+
+def test_if_none_match_returns_304(copter_client, fake_copter):
+    etag = copter_client.get("/telemetry/ned").headers["etag"]
+    r = copter_client.get("/telemetry/ned", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+    fake_copter.get_ned_info.return_value = SimpleNamespace(**{**vars(NED), "_timestamp": 101.0})
+    r = copter_client.get("/telemetry/ned", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_plain_read_does_not_wait(copter_client, fake_copter):
+    body = copter_client.get("/telemetry/gps").json()
+    assert body["timestamp"] == 100.0
+    fake_copter.wait_fresh_async.assert_not_awaited()
+
+
+def test_since_and_max_age_wait_for_a_qualifying_sample(copter_client, fake_copter):
+    fake_copter.wait_fresh_async.return_value = SimpleNamespace(**{**vars(NED), "_timestamp": 101.0})
+    r = copter_client.get("/telemetry/ned", params={"since": 100.0, "max_age": 0.1})
+    assert r.status_code == 200
+    assert r.json()["timestamp"] == 101.0
+    fake_copter.wait_fresh_async.assert_awaited_once_with(
+        "LOCAL_POSITION_NED", since=100.0, max_age=0.1, timeout=10.0)
+
+
+def test_long_poll_timeout_is_504(copter_client, fake_copter):
+    fake_copter.wait_fresh_async.side_effect = TimeoutException("no GPS_RAW_INT")
+    r = copter_client.get("/telemetry/gps_raw", params={"since": 100.0, "timeout": 0.5})
+    assert r.status_code == 504
+    assert "GET_GPS_RAW TIMEOUT" in r.json()["detail"]
@@ -0,0 +1,104 @@
+"""End-to-end Vehicle tests against the in-process FakeAutopilot.
+
+Unlike the router tests these run the real MAVLink path — sockets, parser,
+receiver thread, subscriptions — with no SITL. Heartbeats are fast so the
+heartbeat-paced loops (set_parameters) finish in milliseconds.
+"""
+
+import time
+
+import pytest
+from pymavlink import mavutil
+
+from uav_api.vehicles.fake_autopilot import FAKE_HOME, FakeAutopilot
+from uav_api.vehicles.vehicle import TimeoutException, Vehicle
+
+mavlink = mavutil.mavlink
+
+
+@pytest.fixture
+def fake():
+    with FakeAutopilot(rates={"HEARTBEAT": 50, "SYSTEM_TIME": 50}, seed=1) as fake:
+        yield fake
+
+
+@pytest.fixture
+def vehicle(fake):
+    vehicle = Vehicle(sysid=fake.sysid)
+    vehicle.connect(fake.connection_string)
+    yield vehicle
+    vehicle.close()
+
+
+def arm(vehicle, timeout=2):
+    vehicle.run_cmd(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1, 0, 0, 0, 0, 0, 0, timeout=timeout)
+
+
+def test_connect_and_stream(fake, vehicle):
+    m = vehicle.wait_message('GLOBAL_POSITION_INT', timeout=2)
+    assert m.lat == int(FAKE_HOME[0] * 1.0e7)
+    assert vehicle.wait_heartbeat(timeout=2).autopilot == mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA
+    assert fake.received['REQUEST_DATA_STREAM'] >= 1
+
+
+def test_commands_are_acked(fake, vehicle):
+    arm(vehicle)
+    assert fake.armed
+    assert fake.commands[-1][0] == mavlink.MAV_CMD_COMPONENT_ARM_DISARM
+    fake.command_results[mavlink.MAV_CMD_COMPONENT_ARM_DISARM] = mavlink.MAV_RESULT_DENIED
+    with pytest.raises(ValueError):
+        arm(vehicle)
+
+
+def test_dropped_and_delayed_acks(fake, vehicle):
+    fake.drop('COMMAND_ACK', count=1)
+    with pytest.raises(TimeoutException):
+        arm(vehicle, timeout=0.3)
+    arm(vehicle)  # only the first ack was lost
+    assert fake.dropped['COMMAND_ACK'] == 1
+
+    fake.delay('COMMAND_ACK', 0.2)
+    tstart = time.time()
+    arm(vehicle)
+    assert time.time() - tstart >= 0.2
+
+
+def test_message_rates_round_trip(fake, vehicle):
+    report = vehicle.apply_message_rates({'GLOBAL_POSITION_INT': 20, 'SYS_STATUS': -1}, timeout=2)
+    assert report['GLOBAL_POSITION_INT']['applied'] == pytest.approx(20)
+    assert report['SYS_STATUS']['applied'] == 0.0
+    assert fake.rates['SYS_STATUS'] == 0
+
+
+def test_parameters(fake, vehicle):
+    assert vehicle.get_parameter('RTL_ALT', timeout=2) == 1500.0
+    vehicle.set_parameters({'WPNAV_SPEED': 800.0, 'RTL_ALT': 2000.0}, verbose=False)
+    assert fake.params['WPNAV_SPEED'] == 800.0
+    assert fake.params['RTL_ALT'] == 2000.0
+
+
+def test_mission_upload_and_download(fake, vehicle):
+    vehicle.wploader.target_system = fake.sysid
+    for i in range(5):
+        vehicle.add_waypoint(FAKE_HOME[0] + i * 1.0e-4, FAKE_HOME[1], 10 + i)
+    vehicle.send_all_waypoints(timeout=5)
+    deadline = time.time() + 2
+    while len(fake.mission) < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert [item.z for item in fake.mission] == [10, 11, 12, 13, 14]
+
+    vehicle.wploader.clear()
+    assert vehicle.get_all_waypoints(timeout=5) == 5
+    assert vehicle.wploader.wp(4).x == pytest.approx(FAKE_HOME[0] + 4.0e-4)
+
+
+def test_upload_survives_a_lost_request(fake, vehicle):
+    vehicle.wploader.target_system = fake.sysid
+    for i in range(3):
+        vehicle.add_waypoint(FAKE_HOME[0], FAKE_HOME[1], 10 + i)
+    fake.drop('MISSION_REQUEST', count=1)  # the autopilot re-requests after a second
+    vehicle.send_all_waypoints(timeout=5)
+    deadline = time.time() + 2
+    while len(fake.mission) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(fake.mission) == 3
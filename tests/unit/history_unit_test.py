@@ -0,0 +1,82 @@
+"""Unit tests for the telemetry history ring buffers and /telemetry/history."""
+
+import time
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import assert_envelope, stamped
+
+from uav_api.vehicles.history import TelemetryHistory
+from uav_api.vehicles.vehicle import Vehicle
+
+mavlink = mavutil.mavlink
+
+
+def ned(t, x):
+    return stamped(mavlink.MAVLink_local_position_ned_message(0, x, 0, -10, 0, 0, 0), t)
+
+
+def gps(t):
+    return stamped(mavlink.MAVLink_global_position_int_message(
+        0, -158400810, -479266420, 1042000, 15000, 120, -40, 10, 9000), t)
+
+
+def test_values_are_converted_on_append():
+    history = TelemetryHistory(capacity=4)
+    history.record(gps(1.0))
+    history.record(mavlink.MAVLink_heartbeat_message(2, 3, 0, 0, 0, 3))  # not recorded
+    columns = history.buffers["GLOBAL_POSITION_INT"].query()
+    assert columns["time"] == [1.0]
+    assert columns["lat"] == [pytest.approx(-15.840081)]
+    assert (columns["relative_alt"], columns["vx"], columns["hdg"]) == ([15.0], [1.2], [90.0])
+    assert history.units("GLOBAL_POSITION_INT")["alt"] == "m"
+
+
+def test_ring_keeps_the_newest_capacity_samples_in_order():
+    history = TelemetryHistory(capacity=5)
+    for i in range(12):
+        history.record(ned(float(i), float(i)))
+    buf = history.buffers["LOCAL_POSITION_NED"]
+    assert len(buf) == 5
+    assert buf.query()["x"] == [7.0, 8.0, 9.0, 10.0, 11.0]
+    # A window that crosses the physical wrap point
+    assert buf.query(since=8.0, until=10.0)["time"] == [8.0, 9.0, 10.0]
+    assert buf.query(since=20.0)["x"] == []
+
+
+def test_step_thins_by_stride():
+    history = TelemetryHistory(capacity=100)
+    for i in range(50):
+        history.record(ned(i * 0.1, float(i)))  # 10 Hz
+    columns = history.buffers["LOCAL_POSITION_NED"].query(step=0.5)
+    assert columns["x"] == [0.0, 5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 35.0, 40.0, 45.0]
+
+
+@pytest.fixture
+def vehicle():
+    return Vehicle()
+
+
+@pytest.fixture
+def history_client(vehicle, vehicle_client):
+    return vehicle_client(vehicle)
+
+
+def test_history_endpoint_returns_columns(history_client, vehicle):
+    now = time.time()
+    for i in range(10):
+        vehicle.history.record(ned(now - 9.5 + i, float(i)))
+    r = history_client.get("/telemetry/history", params={"type": "local_position_ned", "since": -5})
+    assert r.status_code == 200
+    body = r.json()
+    assert_envelope(body, "Success")
+    assert body["type"] == "LOCAL_POSITION_NED"
+    assert body["units"]["x"] == "m"
+    assert body["columns"]["x"] == [5.0, 6.0, 7.0, 8.0, 9.0]
+    assert body["count"] == 5
+
+
+def test_history_rejects_unrecorded_type(history_client):
+    r = history_client.get("/telemetry/history", params={"type": "SYS_STATUS"})
+    assert r.status_code == 400
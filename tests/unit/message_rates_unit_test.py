@@ -0,0 +1,97 @@
+"""Unit tests for per-message stream rate profiles.
+
+Covers the `--message_rates` parsing, Vehicle.apply_message_rates against a
+stand-in autopilot (acks and MESSAGE_INTERVAL replies dispatched from a
+timer, as the receiver would), and the /telemetry/message_rates endpoints.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import assert_envelope
+
+from uav_api.args import parse_args, parse_message_rates
+from uav_api.vehicles.vehicle import Vehicle
+
+mavlink = mavutil.mavlink
+
+
+def test_parse_message_rates():
+    assert parse_message_rates(["global_position_int=20", "SYS_STATUS=1", "ATTITUDE=-1"]) == {
+        "GLOBAL_POSITION_INT": 20.0, "SYS_STATUS": 1.0, "ATTITUDE": -1.0}
+    for bad in (["GLOBAL_POSITION_INT"], ["=5"], ["ATTITUDE=fast"]):
+        with pytest.raises(ValueError):
+            parse_message_rates(bad)
+
+
+def test_message_rates_from_config_file(tmp_path):
+    config = tmp_path / "uav.ini"
+    config.write_text("[api]\nmessage_rates=[GLOBAL_POSITION_INT=20, SYS_STATUS=1]\n")
+    args = parse_args(["--config", str(config)])
+    assert parse_message_rates(args.message_rates) == {"GLOBAL_POSITION_INT": 20.0, "SYS_STATUS": 1.0}
+
+
+def autopilot(vehicle, refuse=()):
+    """A `tx` answering SET/GET_MESSAGE_INTERVAL like ArduPilot: it stores
+    the interval, acks, and reports it back. Messages in `refuse` are NAKed."""
+    intervals = {}
+
+    def command_long_send(target_system, target_component, command, confirmation, p1, p2, *rest):
+        msg_id = int(p1)
+        if command == mavlink.MAV_CMD_SET_MESSAGE_INTERVAL:
+            result = mavlink.MAV_RESULT_DENIED if msg_id in refuse else mavlink.MAV_RESULT_ACCEPTED
+            if msg_id not in refuse:
+                intervals[msg_id] = p2
+            reply = mavlink.MAVLink_command_ack_message(command, result)
+        else:
+            reply = mavlink.MAVLink_message_interval_message(msg_id, int(intervals.get(msg_id, 0)))
+        threading.Timer(0.01, vehicle._dispatch, args=(reply,)).start()
+
+    return SimpleNamespace(command_long_send=command_long_send)
+
+
+def test_apply_message_rates_reports_what_the_autopilot_applied():
+    vehicle = Vehicle()
+    vehicle.tx = autopilot(vehicle, refuse={mavlink.MAVLINK_MSG_ID_ATTITUDE})
+    report = vehicle.apply_message_rates({"GLOBAL_POSITION_INT": 20, "SYS_STATUS": -1, "ATTITUDE": 10}, timeout=2)
+    assert report["GLOBAL_POSITION_INT"] == {"requested": 20, "applied": pytest.approx(20.0), "error": None}
+    assert report["SYS_STATUS"]["applied"] == 0.0
+    assert report["ATTITUDE"]["applied"] is None
+    assert report["ATTITUDE"]["error"]
+    assert vehicle.message_rates == report
+
+
+def test_post_message_rates_applies_and_reports(copter_client, fake_copter):
+    fake_copter.apply_message_rates.return_value = {
+        "GLOBAL_POSITION_INT": {"requested": 20, "applied": 20.0, "error": None}}
+    r = copter_client.post("/telemetry/message_rates", json={"global_position_int": 20})
+    assert r.status_code == 200
+    assert_envelope(r.json(), "Success")
+    assert r.json()["info"]["GLOBAL_POSITION_INT"]["applied"] == 20.0
+    fake_copter.apply_message_rates.assert_called_once_with({"GLOBAL_POSITION_INT": 20})
+
+
+def test_post_message_rates_names_refused_messages(copter_client, fake_copter):
+    fake_copter.apply_message_rates.return_value = {
+        "ATTITUDE": {"requested": 10, "applied": None, "error": "denied"}}
+    r = copter_client.post("/telemetry/message_rates", json={"ATTITUDE": 10})
+    assert r.json()["result"] == "Not applied: ATTITUDE"
+
+
+@pytest.mark.parametrize("body", [{"NOT_A_MESSAGE": 5}, {"ATTITUDE": -3}])
+def test_post_message_rates_rejects_bad_input(copter_client, fake_copter, body):
+    r = copter_client.post("/telemetry/message_rates", json=body)
+    assert r.status_code == 400
+    fake_copter.apply_message_rates.assert_not_called()
+
+
+def test_get_message_rates_reads_back_profiled_messages(plane_client, fake_plane):
+    fake_plane.message_rates = {"SYS_STATUS": {"requested": 1, "applied": 1.0, "error": None}}
+    fake_plane.send_get_message_interval.return_value = 1.0
+    r = plane_client.get("/telemetry/message_rates")
+    assert r.status_code == 200
+    assert r.json()["info"] == {"SYS_STATUS": 1.0}
+    fake_plane.send_get_message_interval.assert_called_once_with("SYS_STATUS")
@@ -0,0 +1,157 @@
+"""Unit tests for the Prometheus metrics: the instruments, the vehicle
+counters the receiver keeps, and GET /metrics with the HTTP middleware.
+
+The endpoint tests use a real (unconnected) Vehicle so the exposition is
+rendered from the actual counters, not from mock attributes.
+"""
+
+import pytest
+from pymavlink import mavutil
+
+from uav_api.metrics import CONTENT_TYPE, CommandStats, Histogram, HttpMetrics, MetricsWriter, RxStats, http_metrics
+from uav_api.vehicles.vehicle import TimeoutException, Vehicle
+
+pytestmark = pytest.mark.copter
+
+mavlink = mavutil.mavlink
+
+
+def _samples(text):
+    """{'name{labels}': value} of an exposition, comments skipped."""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            out[key] = float(value)
+    return out
+
+
+def test_histogram_is_cumulative():
+    h = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        h.observe(value)
+    w = MetricsWriter()
+    w.histogram("t", h, {"route": "/x"})
+    samples = _samples(w.text())
+    assert samples['t_bucket{route="/x",le="0.1"}'] == 2
+    assert samples['t_bucket{route="/x",le="1.0"}'] == 3
+    assert samples['t_bucket{route="/x",le="+Inf"}'] == 4
+    assert samples['t_count{route="/x"}'] == 4
+    assert samples['t_sum{route="/x"}'] == pytest.approx(3.65)
+
+
+def test_label_values_are_escaped():
+    w = MetricsWriter()
+    w.sample("m", 1, {"types": 'a"b\\c\nd'})
+    assert w.text() == 'm{types="a\\"b\\\\c\\nd"} 1\n'
+
+
+def test_rx_rate_tracks_interval_and_decays():
+    stats = RxStats()
+    for i in range(20):
+        stats.record("HEARTBEAT", i * 0.5)
+    count, rate = stats.rates(9.5)["HEARTBEAT"]
+    assert count == 20
+    assert rate == pytest.approx(2.0)
+    # Silent for 10 s: the estimate falls to the 1/age bound.
+    assert stats.rates(19.5)["HEARTBEAT"][1] == pytest.approx(0.1)
+
+
+def test_vehicle_counters():
+    vehicle = Vehicle()
+    with vehicle.subscribe(types={"HEARTBEAT"}, maxsize=1) as sub:
+        vehicle._dispatch(mavlink.MAVLink_heartbeat_message(2, 3, 0, 4, 4, 3))
+        vehicle._dispatch(mavlink.MAVLink_heartbeat_message(2, 3, 0, 4, 4, 3))
+        assert sub.dropped == 1
+    assert vehicle.closed_sub_dropped == 1
+
+
+def test_command_stats_report():
+    stats = CommandStats(window=4)
+    for seconds in (0.1, 0.2, 0.3, 0.4, 0.5):
+        stats.record_ack(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, mavlink.MAV_RESULT_ACCEPTED, seconds)
+    stats.record_ack(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, mavlink.MAV_RESULT_TEMPORARILY_REJECTED, 0.05)
+    stats.record_timeout(mavlink.MAV_CMD_COMPONENT_ARM_DISARM)
+    stats.record_timeout(mavlink.MAV_CMD_NAV_TAKEOFF)
+    report = stats.report()
+    arm = report["MAV_CMD_COMPONENT_ARM_DISARM"]
+    assert arm["acks"] == 6
+    assert arm["timeouts"] == 1
+    assert arm["results"] == {"ACCEPTED": 5, "TEMPORARILY_REJECTED": 1}
+    # Percentiles cover the last `window` acks only: 0.3, 0.4, 0.5, 0.05.
+    assert arm["max_s"] == 0.5
+    assert arm["p50_s"] == 0.4
+    assert report["MAV_CMD_NAV_TAKEOFF"] == {"acks": 0, "timeouts": 1, "results": {},
+                                             "p50_s": None, "p95_s": None, "p99_s": None, "max_s": None}
+
+
+def test_acks_and_timeouts_are_recorded_per_command():
+    vehicle = Vehicle()
+    ack = mavlink.MAVLink_command_ack_message(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, mavlink.MAV_RESULT_DENIED)
+    with pytest.raises(ValueError):
+        vehicle._check_ack(ack, mavlink.MAV_RESULT_ACCEPTED, 0.0, quiet=True)
+    with vehicle.subscribe(types={"COMMAND_ACK"}) as sub:
+        with pytest.raises(TimeoutException):
+            vehicle._wait_ack(sub, mavlink.MAV_CMD_NAV_TAKEOFF, mavlink.MAV_RESULT_ACCEPTED, 0.01, 0.0, True)
+    report = vehicle.command_stats.report()
+    assert report["MAV_CMD_COMPONENT_ARM_DISARM"]["results"] == {"DENIED": 1}
+    assert report["MAV_CMD_NAV_TAKEOFF"]["timeouts"] == 1
+
+
+@pytest.fixture
+def metrics_client(vehicle_client):
+    vehicle = Vehicle()
+    vehicle.rx_stats.record("HEARTBEAT", 1.0)
+    vehicle.rx_stats.record("BAD_DATA", 1.0)
+    vehicle.rx_stats.record("BAD_DATA", 2.0)
+    client = vehicle_client(vehicle)
+    http_metrics.clear()
+    yield client, vehicle
+    http_metrics.clear()
+
+
+def test_metrics_endpoint(metrics_client):
+    client, vehicle = metrics_client
+    with vehicle.subscribe(types={"COMMAND_ACK"}):
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    samples = _samples(response.text)
+    assert samples['uav_mavlink_rx_messages_total{type="HEARTBEAT"}'] == 1
+    assert samples["uav_mavlink_bad_data_total"] == 2
+    assert samples['uav_subscriptions{types="COMMAND_ACK"}'] == 1
+    assert samples["uav_mavlink_receiver_up"] == 0
+
+
+def test_command_metrics(metrics_client):
+    client, vehicle = metrics_client
+    vehicle.command_stats.record_ack(mavlink.MAV_CMD_NAV_TAKEOFF, mavlink.MAV_RESULT_ACCEPTED, 0.02)
+    vehicle.command_stats.record_timeout(mavlink.MAV_CMD_NAV_TAKEOFF)
+    samples = _samples(client.get("/metrics").text)
+    assert samples['uav_command_ack_seconds_bucket{command="MAV_CMD_NAV_TAKEOFF",le="0.025"}'] == 1
+    assert samples['uav_command_results_total{command="MAV_CMD_NAV_TAKEOFF",result="ACCEPTED"}'] == 1
+    assert samples['uav_command_timeouts_total{command="MAV_CMD_NAV_TAKEOFF"}'] == 1
+
+    response = client.get("/telemetry/command_stats")
+    assert response.status_code == 200
+    info = response.json()["info"]["MAV_CMD_NAV_TAKEOFF"]
+    assert info["acks"] == 1 and info["timeouts"] == 1 and info["p50_s"] == 0.02
+
+
+def test_http_latency_is_labelled_by_route_template(metrics_client):
+    client, _ = metrics_client
+    client.get("/metrics")
+    client.get("/no/such/route")
+    # A scrape is recorded at its response start, after it has rendered.
+    samples = _samples(client.get("/metrics").text)
+    assert samples['uav_http_responses_total{method="GET",route="/metrics",status="200"}'] == 1
+    assert samples['uav_http_responses_total{method="GET",route="unmatched",status="404"}'] == 1
+    assert samples['uav_http_request_duration_seconds_count{method="GET",route="/metrics"}'] == 1
+
+
+def test_http_metrics_keeps_one_histogram_per_route():
+    metrics = HttpMetrics()
+    for status in ("200", "200", "500"):
+        metrics.observe("GET", "/telemetry/gps", status, 0.002)
+    assert list(metrics.latency) == [("GET", "/telemetry/gps")]
+    assert metrics.responses[("GET", "/telemetry/gps", "500")] == 1
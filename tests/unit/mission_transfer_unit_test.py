@@ -0,0 +1,276 @@
+"""Unit tests for the mission upload and download engines and /mission/items.
+
+Transfers run Vehicle against FakeAutopilot (real sockets and receiver),
+which requests uploaded items one at a time and answers out-of-order ones
+with MISSION_ACK MAV_MISSION_INVALID_SEQUENCE, as ArduPilot does.
+"""
+
+import json
+import time
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import assert_envelope
+
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.mission_cache import changed_ranges, item_key
+from uav_api.vehicles.vehicle import NotAchievedException, TimeoutException, Vehicle
+
+pytestmark = pytest.mark.copter
+
+mavlink = mavutil.mavlink
+
+
+def waypoints(n, alt=None):
+    alt = alt or {}
+    return [mavlink.MAVLink_mission_item_int_message(0, 0, 0, mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
+                                                     mavlink.MAV_CMD_NAV_WAYPOINT, 0, 1, 0, 0, 0, 0,
+                                                     -158400000 + i, -479260000, alt.get(i, 30)) for i in range(n)]
+
+
+def assert_uploaded(fake, n):
+    assert [item.seq for item in fake.mission] == list(range(n))
+    assert [item.x for item in fake.mission] == [-158400000 + i for i in range(n)]
+
+
+@pytest.mark.parametrize("window,request_int", [(1, False), (8, False), (8, True)])
+def test_upload(connected, window, request_int):
+    with FakeAutopilot() as fake:
+        fake.mission_request_int = request_int
+        calls = []
+        result = connected(fake).upload_mission(waypoints(40), window=window,
+                                                progress=lambda done, total: calls.append((done, total)))
+        assert_uploaded(fake, 40)
+        assert result["count"] == 40 and result["retransmitted"] == 0
+        assert result["items_per_s"] > 0
+        assert calls[-1] == (40, 40)
+
+
+def test_lost_item_is_resent(connected):
+    with FakeAutopilot() as fake:
+        handler = fake._on_mission_item_int
+        lost = []
+
+        def lossy(m):
+            if m.seq == 5 and not lost:
+                lost.append(m.seq)  # lost on the way to the autopilot
+                return
+            handler(m)
+
+        fake._on_mission_item_int = lossy
+        send = fake.send
+        refused = []
+
+        def counting(m):
+            if m.get_type() == "MISSION_ACK" and m.type == mavlink.MAV_MISSION_INVALID_SEQUENCE:
+                refused.append(m)
+            send(m)
+
+        fake.send = counting
+        result = connected(fake).upload_mission(waypoints(20), window=4)
+        assert_uploaded(fake, 20)
+        assert result["retransmitted"] >= 1
+        # Items 6 to 8 went out behind the lost one and were refused.
+        assert len(refused) >= 3
+
+
+def test_rejected_upload_raises(connected):
+    with FakeAutopilot() as fake:
+        def no_space(m):
+            fake.send(fake.mav.mission_ack_encode(m.get_srcSystem(), m.get_srcComponent(),
+                                                  mavlink.MAV_MISSION_NO_SPACE))
+
+        fake._on_mission_count = no_space
+        with pytest.raises(NotAchievedException, match="MAV_MISSION_NO_SPACE"):
+            connected(fake).upload_mission(waypoints(3))
+
+
+def test_silent_autopilot_times_out(connected):
+    with FakeAutopilot() as fake:
+        fake.drop("MISSION_REQUEST")
+        vehicle = connected(fake)
+        with pytest.raises(TimeoutException):
+            vehicle.upload_mission(waypoints(3), item_timeout=0.2, retries=1)
+        assert fake.received["MISSION_COUNT"] == 2
+
+
+def test_send_all_waypoints_uses_the_engine(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.wploader.clear()
+        for item in waypoints(5):
+            vehicle.wploader.add(vehicle.wp_from_mission_item_int(item))
+        assert vehicle.send_all_waypoints()["count"] == 5
+        assert_uploaded(fake, 5)
+
+
+@pytest.fixture
+def mission_client(connected, vehicle_client):
+    def make(fake):
+        return vehicle_client(connected(fake))
+
+    return make
+
+
+BODY = {"items": [{"lat": -15.84, "long": -47.926, "alt": 30},
+                  {"command": mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH}]}
+
+
+def test_upload_endpoint(mission_client):
+    with FakeAutopilot() as fake:
+        response = mission_client(fake).post("/mission/items", json=BODY)
+        assert response.status_code == 200
+        body = response.json()
+        assert_envelope(body)
+        assert body["info"]["count"] == 2
+        assert [item.command for item in fake.mission] == [mavlink.MAV_CMD_NAV_WAYPOINT,
+                                                           mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH]
+        assert fake.mission[0].x == -158400000
+
+
+def test_upload_endpoint_streams_progress(mission_client):
+    with FakeAutopilot() as fake:
+        response = mission_client(fake).post("/mission/items", params={"stream": True}, json=BODY)
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+                  for block in response.text.strip().split("\n\n")]
+        assert events[-2] == ("progress", {"done": 2, "total": 2})
+        assert events[-1][0] == "result" and events[-1][1]["info"]["count"] == 2
+
+
+def test_upload_endpoint_timeout_is_504(mission_client, monkeypatch):
+    monkeypatch.setattr(Vehicle, "MISSION_ITEM_TIMEOUT", 0.2)
+    with FakeAutopilot() as fake:
+        fake.drop("MISSION_REQUEST")
+        response = mission_client(fake).post("/mission/items", json=BODY)
+        assert response.status_code == 504
+        assert response.json()["detail"].startswith("UPLOAD_MISSION FAIL")
+
+
+def test_download(connected):
+    with FakeAutopilot() as fake:
+        fake.mission = waypoints(50)
+        for seq, item in enumerate(fake.mission):
+            item.seq = seq
+        vehicle = connected(fake)
+        result = vehicle.download_mission(window=8)
+        assert result["count"] == 50 and result["requests"] == 50
+        assert [round(wp.x * 1.0e7) for wp in result["items"]] == [-158400000 + i for i in range(50)]
+        assert vehicle.wploader.count() == 50
+
+
+def test_download_rerequests_only_gaps(connected):
+    with FakeAutopilot(seed=4) as fake:
+        fake.mission = waypoints(60)
+        for seq, item in enumerate(fake.mission):
+            item.seq = seq
+        fake.drop("MISSION_ITEM_INT", probability=0.2)
+        result = connected(fake).download_mission(window=16, retry_timeout=0.2, retries=10)
+        assert result["count"] == 60
+        assert result["requests"] == 60 + fake.dropped["MISSION_ITEM_INT"]
+
+
+def test_download_gives_up_on_a_silent_item(connected):
+    with FakeAutopilot() as fake:
+        fake.mission = waypoints(3)
+        fake.drop("MISSION_ITEM_INT")
+        with pytest.raises(TimeoutException, match="mission item 0"):
+            connected(fake).download_mission(retry_timeout=0.1, retries=2)
+
+
+def test_download_endpoint_round_trips_an_upload(mission_client):
+    with FakeAutopilot() as fake:
+        client = mission_client(fake)
+        assert client.post("/mission/items", json=BODY).status_code == 200
+        body = client.get("/mission/items").json()
+        assert_envelope(body)
+        items = body["info"]["items"]
+        assert body["info"]["count"] == 2
+        assert items[0]["lat"] == pytest.approx(-15.84) and items[0]["alt"] == 30
+        assert items[1]["command"] == mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH
+        deadline = time.time() + 2
+        while not fake.received["MISSION_ACK"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert fake.received["MISSION_ACK"] == 1
+
+
+def test_changed_ranges():
+    old = list(range(20))
+    new = list(old)
+    for i in (2, 3, 6, 15):
+        new[i] = -1
+    assert changed_ranges(old, new) == [[2, 6], [15, 15]]
+    assert changed_ranges(old, new, merge_gap=0) == [[2, 3], [6, 6], [15, 15]]
+    assert changed_ranges(old, old) == []
+
+
+def test_item_key_ignores_the_encoding():
+    item = waypoints(1)[0]
+    vehicle = Vehicle()
+    assert item_key(vehicle.wp_from_mission_item_int(item)) == item_key(item)
+
+
+def test_update_sends_only_changed_items(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        assert vehicle.update_mission(waypoints(100))["mode"] == "full"
+        fake.received.clear()
+        result = vehicle.update_mission(waypoints(100, alt={40: 50, 41: 50, 90: 60}))
+        assert result["mode"] == "partial" and result["ranges"] == [[40, 41], [90, 90]]
+        assert result["sent"] == 3
+        assert fake.received["MISSION_WRITE_PARTIAL_LIST"] == 2 and fake.received["MISSION_COUNT"] == 0
+        assert [item.z for item in fake.mission] == [{40: 50, 41: 50, 90: 60}.get(i, 30) for i in range(100)]
+        assert_uploaded(fake, 100)
+        assert vehicle.update_mission(waypoints(100, alt={40: 50, 41: 50, 90: 60}))["mode"] == "unchanged"
+
+
+def test_update_matches_float32_read_back(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        # 12.3 has no exact float32, so the autopilot holds a slightly different value.
+        alt = {i: 12.3 for i in range(20)}
+        vehicle.upload_mission(waypoints(20, alt=alt))
+        result = vehicle.update_mission(waypoints(20, alt={**alt, 3: 15.7}))
+        assert result["mode"] == "partial" and result["ranges"] == [[3, 3]]
+        assert fake.mission[3].z == pytest.approx(15.7)
+        # The same holds for a cache filled by a download.
+        vehicle.download_mission()
+        result = vehicle.update_mission(waypoints(20, alt={**alt, 3: 15.7, 9: 0.1}))
+        assert result["mode"] == "partial" and result["ranges"] == [[9, 9]]
+
+
+def test_update_falls_back_to_a_full_upload(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.update_mission(waypoints(10))
+        result = vehicle.update_mission(waypoints(12))
+        assert result["mode"] == "full" and "count" in result["reason"]
+        # Another ground station changed the mission behind our back.
+        fake.mission[5].z = 99
+        result = vehicle.update_mission(waypoints(12, alt={5: 40}))
+        assert result["mode"] == "full" and result["reason"] == "item 5 differs from the cache"
+        assert [item.z for item in fake.mission][5] == 40
+
+
+def test_downloaded_mission_is_the_cache(connected):
+    with FakeAutopilot() as fake:
+        fake.mission = waypoints(20)
+        for seq, item in enumerate(fake.mission):
+            item.seq = seq
+        vehicle = connected(fake)
+        vehicle.download_mission()
+        result = vehicle.update_mission(waypoints(20, alt={7: 45}))
+        assert result["mode"] == "partial" and result["ranges"] == [[7, 7]]
+        assert fake.mission[7].z == 45
+
+
+def test_upload_endpoint_is_incremental(mission_client):
+    with FakeAutopilot() as fake:
+        client = mission_client(fake)
+        assert client.post("/mission/items", json=BODY).json()["info"]["mode"] == "full"
+        edited = {"items": [dict(BODY["items"][0], alt=45), BODY["items"][1]]}
+        info = client.post("/mission/items", json=edited).json()["info"]
+        assert info["mode"] == "partial" and info["ranges"] == [[0, 0]]
+        info = client.post("/mission/items", params={"incremental": False}, json=edited).json()["info"]
+        assert "mode" not in info and fake.mission[0].z == 45
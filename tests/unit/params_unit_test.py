@@ -0,0 +1,263 @@
+"""Unit tests for the parameter table, its disk cache and /params.
+
+Sync tests run Vehicle against FakeAutopilot (real sockets and receiver);
+the router tests fill a real Vehicle's table directly.
+"""
+
+import time
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import assert_envelope
+
+from uav_api.vehicles.fake_autopilot import FAKE_PARAMS, FakeAutopilot
+from uav_api.vehicles.params import PARAM_INDEX_NONE, ParamTable, parse_param_file
+from uav_api.vehicles.vehicle import Vehicle
+
+pytestmark = pytest.mark.copter
+
+mavlink = mavutil.mavlink
+_encoder = mavlink.MAVLink(None)
+REAL32 = mavlink.MAV_PARAM_TYPE_REAL32
+
+
+def param_value(name, value, index, count=3):
+    return _encoder.param_value_encode(name.encode(), value, REAL32, count, index)
+
+
+def filled_table():
+    table = ParamTable()
+    for index, (name, value) in enumerate([("RTL_ALT", 1500.0), ("WPNAV_SPEED", 500.0), ("WPNAV_RADIUS", 200.0)]):
+        table.record(param_value(name, value, index))
+    return table
+
+
+def test_table_records_and_filters():
+    table = ParamTable()
+    table.record(param_value("WPNAV_SPEED", 500.0, 1))
+    assert not table.complete and table.missing() == [0, 2]
+    table.record(param_value("RTL_ALT", 1500.0, 0))
+    table.record(param_value("WPNAV_RADIUS", 200.0, 2))
+    assert table.complete
+    assert table.with_prefix("WPNAV_") == {"WPNAV_RADIUS": 200.0, "WPNAV_SPEED": 500.0}
+    assert table.with_prefix("") == {"RTL_ALT": 1500.0, "WPNAV_RADIUS": 200.0, "WPNAV_SPEED": 500.0}
+    # The echo of a PARAM_SET carries no index; the known one is kept.
+    table.record(param_value("WPNAV_SPEED", 800.0, PARAM_INDEX_NONE))
+    assert table.get("WPNAV_SPEED") == (800.0, REAL32, 1)
+
+
+def test_cache_round_trip(tmp_path):
+    path = str(tmp_path / "params.json")
+    filled_table().save(path, 1, "fw")
+    table = ParamTable()
+    assert not table.load(path, 1, "other-fw")
+    assert not table.load(path, 2, "fw")
+    assert table.load(path, 1, "fw")
+    assert table.source == "cache" and table.complete and not table.dirty
+    assert table.get("RTL_ALT") == (1500.0, REAL32, 0)
+
+
+def test_incomplete_table_is_not_loaded(tmp_path):
+    path = str(tmp_path / "params.json")
+    table = ParamTable()
+    table.record(param_value("RTL_ALT", 1500.0, 0))
+    table.save(path, 1, "fw")
+    assert not ParamTable().load(path, 1, "fw")
+
+
+def test_sync_warm_starts_from_cache(tmp_path, connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        assert vehicle.sync_parameters(str(tmp_path)) == "autopilot"
+        assert vehicle.param_table.count == len(FAKE_PARAMS)
+        vehicle.close()
+    # Another ground station changed RTL_ALT while the API was down.
+    with FakeAutopilot(params={**FAKE_PARAMS, "RTL_ALT": 1800.0}) as fake:
+        vehicle = connected(fake)
+        loaded = []
+        fetch = vehicle.fetch_parameters
+
+        def refresh(**kwargs):
+            table = vehicle.param_table
+            loaded.append((table.source, table.verified, table.get("RTL_ALT")[0]))
+            return fetch(**kwargs)
+
+        vehicle.fetch_parameters = refresh
+        assert vehicle.sync_parameters(str(tmp_path)) == "cache"
+        # The cached table was served, unverified, while it was read again.
+        assert loaded == [("cache", False, 1500.0)]
+        assert vehicle.param_table.verified is True
+        assert vehicle.param_table.get("RTL_ALT")[0] == 1800.0
+        vehicle.close()
+    with FakeAutopilot(params={**FAKE_PARAMS, "RTL_ALT": 1800.0}) as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters = lambda **kwargs: None  # no refresh: the cache as rewritten
+        assert vehicle.sync_parameters(str(tmp_path)) == "cache"
+        assert vehicle.param_table.get("RTL_ALT")[0] == 1800.0
+
+
+def test_stale_cache_is_refetched(tmp_path, connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.sync_parameters(str(tmp_path))
+        vehicle.close()
+    with FakeAutopilot(params={**FAKE_PARAMS, "NEW_PARAM": 1.0}) as fake:
+        vehicle = connected(fake)
+        assert vehicle.sync_parameters(str(tmp_path)) == "autopilot"
+        assert vehicle.param_table.get("NEW_PARAM") is not None
+
+
+def test_fetch_recovers_lost_values(connected):
+    with FakeAutopilot(seed=3) as fake:
+        fake.drop("PARAM_VALUE", probability=0.5)
+        vehicle = connected(fake)
+        assert vehicle.fetch_parameters(timeout=20, quiet_time=0.2) == len(FAKE_PARAMS)
+        assert fake.received["PARAM_REQUEST_READ"] > 0
+
+
+def test_unsolicited_values_update_the_table(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters(timeout=5)
+        fake.params["RTL_ALT"] = 3000.0
+        fake.send(fake._param_value("RTL_ALT"))  # another GCS changed it
+        deadline = time.time() + 2
+        while vehicle.param_table.get("RTL_ALT")[0] != 3000.0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert vehicle.param_table.get("RTL_ALT")[0] == 3000.0
+
+
+def test_values_from_other_components_are_ignored(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters(timeout=5)
+        table = vehicle.param_table
+        before = (dict(table.values), dict(table.names), table.count)
+        table.dirty = False
+        # A gimbal on the same system announces its own parameters.
+        gimbal = mavlink.MAVLink(fake, srcSystem=fake.sysid, srcComponent=mavlink.MAV_COMP_ID_GIMBAL)
+        for index, name in enumerate([b"RTL_ALT", b"MNT_TYPE"]):
+            gimbal.param_value_send(name, 7.0, REAL32, 2, index)  # written with the gimbal's compid
+        # The autopilot's own value, sent after them, marks that they were received.
+        with vehicle.subscribe(types={'PARAM_VALUE'}, predicate=vehicle._from_autopilot) as sub:
+            fake.send(fake._param_value("RTL_ALT"))
+            sub.get(timeout=2)
+        assert (table.values, table.names, table.count) == before
+        assert table.dirty is False
+
+
+def test_parse_param_file():
+    text = "# saved by MAVProxy\nRTL_ALT 1500\nwpnav_speed,750.5  # cm/s\n\nFENCE_ENABLE\t1\n"
+    assert parse_param_file(text) == {"RTL_ALT": 1500.0, "WPNAV_SPEED": 750.5, "FENCE_ENABLE": 1.0}
+    with pytest.raises(ValueError, match="Line 2"):
+        parse_param_file("RTL_ALT 1500\nRTL_ALT\n")
+    with pytest.raises(ValueError):
+        parse_param_file("RTL_ALT high\n")
+
+
+def test_apply_reports_the_diff(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters(timeout=5)
+        calls = []
+        result = vehicle.apply_parameters({"rtl_alt": 2500, "WPNAV_SPEED": FAKE_PARAMS["WPNAV_SPEED"],
+                                           "NO_SUCH_PARAM": 1},
+                                          progress=lambda done, total: calls.append((done, total)))
+        assert result == {"changed": {"RTL_ALT": [1500.0, 2500.0]}, "unchanged": ["WPNAV_SPEED"],
+                          "failed": {"NO_SUCH_PARAM": "unknown parameter"}}
+        assert fake.params["RTL_ALT"] == 2500.0
+        assert fake.received["PARAM_SET"] == 1
+        assert calls[-1] == (3, 3)
+        assert vehicle.param_table.get("RTL_ALT")[0] == 2500.0
+
+
+def test_apply_sends_the_known_type(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters(timeout=5)
+        value, _, index = vehicle.param_table.get("RTL_ALT")
+        vehicle.param_table.values["RTL_ALT"] = (value, mavlink.MAV_PARAM_TYPE_INT16, index)
+        handler = fake._on_param_set
+        types = {}
+
+        def recording(m):
+            types[m.param_id] = m.param_type
+            handler(m)
+
+        fake._on_param_set = recording
+        vehicle.apply_parameters({"RTL_ALT": 2500})
+        assert types == {"RTL_ALT": mavlink.MAV_PARAM_TYPE_INT16}
+        # Not in the table yet: sent as REAL32.
+        vehicle.param_table.clear()
+        vehicle.apply_parameters({"WPNAV_SPEED": 600})
+        assert types["WPNAV_SPEED"] == REAL32
+
+
+def test_apply_retries_only_stragglers(connected):
+    params = {"P%03d" % i: float(i) for i in range(60)}
+    with FakeAutopilot(params=params, seed=5) as fake:
+        fake.drop("PARAM_VALUE", probability=0.3)
+        vehicle = connected(fake)
+        result = vehicle.apply_parameters({name: value + 0.5 for name, value in params.items()},
+                                          window=8, retry_timeout=0.2, retries=10)
+        assert result["failed"] == {} and len(result["changed"]) == 60
+        assert all(fake.params[name] == value + 0.5 for name, value in params.items())
+        # Lost echoes cost a resend of that parameter only.
+        assert 60 < fake.received["PARAM_SET"] < 60 + 2 * fake.dropped["PARAM_VALUE"] + 1
+
+
+def test_apply_gives_up_on_silent_parameters(connected):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        result = vehicle.apply_parameters({"NO_SUCH_PARAM": 1}, retry_timeout=0.1, retries=2)
+        assert result["failed"] == {"NO_SUCH_PARAM": "no PARAM_VALUE"}
+        assert fake.received["PARAM_SET"] == 3
+
+
+def test_apply_endpoint(connected, vehicle_client):
+    with FakeAutopilot() as fake:
+        client = vehicle_client(connected(fake))
+        response = client.post("/params/apply", files={"file": ("copter.param", b"RTL_ALT 2000\n")})
+        assert response.status_code == 200
+        body = response.json()
+        assert_envelope(body)
+        assert body["info"]["changed"] == {"RTL_ALT": [None, 2000.0]}
+        status = client.get("/params/apply").json()["info"]
+        assert status["running"] is False and status["done"] == status["total"] == 1
+        assert status["result"] == body["info"]
+        bad = client.post("/params/apply", files={"file": ("bad.param", b"RTL_ALT\n")})
+        assert bad.status_code == 400
+
+
+@pytest.fixture
+def params_client(vehicle_client):
+    vehicle = Vehicle()
+    vehicle.param_table = filled_table()
+    return vehicle_client(vehicle)
+
+
+def test_list_params(params_client):
+    body = params_client.get("/params", params={"prefix": "wpnav"}).json()
+    assert_envelope(body)
+    assert body["info"] == {"WPNAV_RADIUS": 200.0, "WPNAV_SPEED": 500.0}
+    assert body["table"]["complete"] is True and body["table"]["count"] == 3
+
+
+def test_get_param(params_client):
+    response = params_client.get("/params/rtl_alt")
+    assert response.status_code == 200
+    assert response.json()["info"] == {"name": "RTL_ALT", "value": 1500.0, "type": REAL32, "index": 0}
+    assert params_client.get("/params/NO_SUCH_PARAM").status_code == 404
+
+
+def test_get_param_rereads_an_unverified_cache(connected, vehicle_client):
+    with FakeAutopilot() as fake:
+        vehicle = connected(fake)
+        vehicle.fetch_parameters(timeout=5)
+        table = vehicle.param_table
+        table.source, table.verified = "cache", False  # warm-started, refresh not done
+        fake.params["RTL_ALT"] = 2500.0
+        client = vehicle_client(vehicle)
+        assert client.get("/params").json()["table"]["verified"] is False
+        assert client.get("/params/RTL_ALT").json()["info"]["value"] == 2500.0
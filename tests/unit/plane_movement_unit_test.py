@@ -20,7 +20,7 @@ class TestMovement:
         r = plane_client.post("/movement/go_to_gps_wait", json=GPS_BODY)
         assert r.status_code == 200
         assert_envelope(r.json(), "Arrived")
-        fake_plane.go_to_gps_wait.assert_called_once_with(-15.84, -47.92, 100.0)
+        fake_plane.go_to_gps_wait_async.assert_awaited_once_with(-15.84, -47.92, 100.0)
 
     def test_go_to_gps_malformed_body_is_422(self, plane_client, fake_plane):
         r = plane_client.post("/movement/go_to_gps", json={"lat": -15.84})
@@ -0,0 +1,76 @@
+"""Unit tests for the demand-driven RateArbiter.
+
+plan() is driven with explicit clock values; the vehicle is a real Vehicle
+(never connected) whose set_message_rate_hz is replaced by a recorder.
+"""
+
+import pytest
+
+from uav_api.vehicles.vehicle import Vehicle
+
+
+@pytest.fixture
+def vehicle():
+    vehicle = Vehicle()
+    vehicle.sent = []
+    vehicle.set_message_rate_hz = lambda mtype, rate, timeout=10: vehicle.sent.append((mtype, rate))
+    return vehicle
+
+
+def run(arbiter, now):
+    for mtype, target in arbiter.plan(now):
+        arbiter.apply(mtype, target)
+
+
+def test_subscriptions_declare_the_highest_rate_per_type(vehicle):
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=10), \
+            vehicle.subscribe(types={'GLOBAL_POSITION_INT', 'ATTITUDE'}, rate=25), \
+            vehicle.subscribe(types={'VFR_HUD'}):
+        assert vehicle.rate_arbiter.demand == {'GLOBAL_POSITION_INT': 25, 'ATTITUDE': 25}
+    assert vehicle.rate_arbiter.demand == {}
+
+
+def test_demand_raises_at_once_and_lowers_after_hold(vehicle):
+    arbiter = vehicle.rate_arbiter
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=25):
+        run(arbiter, now=0.0)
+        assert vehicle.sent == [('GLOBAL_POSITION_INT', 25)]
+        run(arbiter, now=1.0)
+        assert len(vehicle.sent) == 1  # already applied
+    run(arbiter, now=10.0)
+    run(arbiter, now=10.0 + arbiter.hold - 0.1)
+    assert len(vehicle.sent) == 1  # still inside the hold
+    run(arbiter, now=10.0 + arbiter.hold)
+    assert vehicle.sent[-1] == ('GLOBAL_POSITION_INT', 0)  # back to the autopilot default
+    assert arbiter.applied == {}
+
+
+def test_reattaching_within_hold_keeps_the_rate(vehicle):
+    arbiter = vehicle.rate_arbiter
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=25):
+        run(arbiter, now=0.0)
+    run(arbiter, now=1.0)
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=25):
+        run(arbiter, now=2.0)
+        run(arbiter, now=1.0 + arbiter.hold + 1)
+    assert vehicle.sent == [('GLOBAL_POSITION_INT', 25)]
+
+
+def test_demand_never_lowers_below_the_profile(vehicle):
+    arbiter = vehicle.rate_arbiter
+    vehicle.message_rates = {'GLOBAL_POSITION_INT': {"requested": 2, "applied": 2.0, "error": None}}
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=1.5), \
+            vehicle.subscribe(types={'SYS_STATUS'}, rate=vehicle.streamrate):
+        run(arbiter, now=0.0)
+        assert vehicle.sent == []
+    with vehicle.subscribe(types={'GLOBAL_POSITION_INT'}, rate=25):
+        run(arbiter, now=1.0)
+    run(arbiter, now=2.0)
+    run(arbiter, now=2.0 + arbiter.hold)
+    assert vehicle.sent == [('GLOBAL_POSITION_INT', 25), ('GLOBAL_POSITION_INT', 2)]  # idle = profile rate
+
+
+def test_demand_is_capped(vehicle):
+    with vehicle.subscribe(types={'ATTITUDE'}, rate=1000):
+        run(vehicle.rate_arbiter, now=0.0)
+    assert vehicle.sent == [('ATTITUDE', vehicle.rate_arbiter.max_rate)]
@@ -0,0 +1,158 @@
+"""Unit tests for the lawnmower survey generator and POST /mission/survey."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import assert_envelope
+
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.survey import EARTH_RADIUS, _to_local, lawnmower, path_length, sweep_segments
+
+pytestmark = pytest.mark.copter
+
+mavlink = mavutil.mavlink
+
+LAT, LON = -15.84, -47.92
+# Metres per degree at LAT.
+M_LAT = np.radians(1.0) * EARTH_RADIUS
+M_LON = M_LAT * np.cos(np.radians(LAT))
+
+
+def square(size):
+    """A size x size metre square with its south-west corner at (LAT, LON)."""
+    d_lat, d_lon = size / M_LAT, size / M_LON
+    return [(LAT, LON), (LAT, LON + d_lon), (LAT + d_lat, LON + d_lon), (LAT + d_lat, LON)]
+
+
+def local(points):
+    return _to_local(np.asarray(points), (LAT, LON))
+
+
+def test_square_lines_alternate_north_south():
+    points = local(lawnmower(square(100), spacing=10))
+    assert len(points) == 20
+    # Lines 10 m apart starting half a spacing in, each spanning the square.
+    np.testing.assert_allclose(np.unique(points[:, 0].round(3)), np.arange(5, 100, 10), atol=0.01)
+    north = points[1::2, 1] - points[0::2, 1]
+    np.testing.assert_allclose(np.abs(north), 100, atol=0.01)
+    assert (np.sign(north[0::2]) == np.sign(north[0])).all()
+    assert (np.sign(north[1::2]) == -np.sign(north[0])).all()
+    np.testing.assert_allclose(path_length(lawnmower(square(100), spacing=10)), 10 * 100 + 9 * 10, rtol=1e-4)
+
+
+@pytest.mark.parametrize("heading,east,north", [(0, 0, 1), (90, 1, 0), (180, 0, -1)])
+def test_heading_sets_the_first_line_direction(heading, east, north):
+    points = local(lawnmower(square(100), spacing=10, heading=heading))
+    direction = (points[1] - points[0]) / np.hypot(*(points[1] - points[0]))
+    np.testing.assert_allclose(direction, (east, north), atol=1e-6)
+
+
+def test_overshoot_extends_every_line():
+    points = local(lawnmower(square(100), spacing=10, overshoot=15))
+    np.testing.assert_allclose(np.sort(np.unique(points[:, 1].round(3))), [-15, 115], atol=0.01)
+
+
+def test_concave_polygon_gets_two_segments_per_line_across_the_notch():
+    # A U shape in metres: two 20 m wide arms 100 m tall joined by a 20 m base.
+    u = np.array([(0, 0), (60, 0), (60, 100), (40, 100), (40, 20), (20, 20), (20, 100), (0, 100)], dtype=float)
+    starts, ends, ys = sweep_segments(u, 10)
+    np.testing.assert_allclose(ys[ys < 20], [5, 15])  # the base: one full-width segment per line
+    upper = ys > 20
+    assert np.count_nonzero(upper) == 2 * len(np.unique(ys[upper]))
+    np.testing.assert_allclose(starts[upper][:2], [0, 40])
+    np.testing.assert_allclose(ends[upper][:2], [20, 60])
+
+
+def test_narrow_polygon_still_gets_one_line():
+    assert len(lawnmower(square(5), spacing=10)) == 2
+
+
+@pytest.mark.parametrize("polygon,spacing,overshoot", [
+    ([(LAT, LON), (LAT, LON + 0.001)], 10, 0),
+    (square(100), 0, 0),
+    (square(100), 10, -1),
+])
+def test_bad_input_raises(polygon, spacing, overshoot):
+    with pytest.raises(ValueError):
+        lawnmower(polygon, spacing, overshoot=overshoot)
+
+
+@pytest.fixture
+def survey_client(connected, vehicle_client):
+    def make(fake):
+        return vehicle_client(connected(fake, Copter))
+
+    return make
+
+
+def survey_body(size=100, spacing=10, **extra):
+    return {"polygon": [{"lat": lat, "long": lon} for lat, lon in square(size)], "spacing": spacing, "alt": 30,
+            **extra}
+
+
+def test_survey_endpoint_uploads_takeoff_survey_and_rtl(survey_client):
+    with FakeAutopilot() as fake:
+        response = survey_client(fake).post("/mission/survey", json=survey_body(takeoff_alt=10))
+        assert response.status_code == 200
+        body = response.json()
+        assert_envelope(body)
+        assert body["info"]["waypoints"] == 20
+        assert body["info"]["upload"]["count"] == 23
+        commands = [item.command for item in fake.mission]
+        assert commands[:2] == [mavlink.MAV_CMD_NAV_WAYPOINT, mavlink.MAV_CMD_NAV_TAKEOFF]
+        assert commands[2:-1] == [mavlink.MAV_CMD_NAV_WAYPOINT] * 20
+        assert commands[-1] == mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH
+        assert fake.mission[1].z == 10 and fake.mission[2].z == 30
+        assert fake.mission[0].x == round(fake.home[0] * 1.0e7)
+
+
+def test_repeating_a_survey_uploads_nothing(survey_client):
+    with FakeAutopilot() as fake:
+        client = survey_client(fake)
+        assert client.post("/mission/survey", json=survey_body()).json()["info"]["upload"]["mode"] == "full"
+        again = client.post("/mission/survey", json=survey_body()).json()["info"]["upload"]
+        assert again["mode"] == "unchanged"
+
+
+def test_survey_endpoint_rejects_bad_input(survey_client):
+    with FakeAutopilot() as fake:
+        client = survey_client(fake)
+        assert client.post("/mission/survey", json=survey_body(spacing=0)).status_code == 422
+        body = survey_body()
+        body["polygon"] = body["polygon"][:2]
+        assert client.post("/mission/survey", json=body).status_code == 422
+        assert client.post("/mission/survey", json=survey_body(alt=-30)).status_code == 422
+        assert client.post("/mission/survey", json=survey_body(takeoff_alt=0)).status_code == 422
+        assert not fake.mission
+
+
+def test_concurrent_surveys_do_not_interleave(connected, monkeypatch):
+    with FakeAutopilot() as fake:
+        copter = connected(fake, Copter)
+        add_waypoint = copter.add_waypoint
+
+        def slow_add_waypoint(lat, lon, alt):
+            time.sleep(0.0005)  # give the other surveys every chance to cut in
+            add_waypoint(lat, lon, alt)
+
+        monkeypatch.setattr(copter, "add_waypoint", slow_add_waypoint)
+        results = {}
+
+        def load(spacing):
+            results[spacing] = copter.load_survey(square(100), spacing, 30)
+
+        threads = [threading.Thread(target=load, args=(spacing,)) for spacing in (5, 10, 20, 25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for spacing, (items, info) in results.items():
+            # home, takeoff, this survey's own waypoints, RTL
+            assert len(items) == info["waypoints"] + 3
+            expected = lawnmower(square(100), spacing).tolist()
+            assert [(item.x, item.y) for item in items[2:-1]] == [tuple(point) for point in expected]
@@ -0,0 +1,189 @@
+"""Unit tests for the GUIDED target queue and the /queue endpoints.
+
+A Copter flies the queue against FakeAutopilot, which moves toward each
+position target in a straight line and streams LOCAL_POSITION_NED and
+GLOBAL_POSITION_INT from where it is.
+"""
+
+import math
+import time
+
+import pytest
+
+from unit_helpers import assert_envelope
+
+from uav_api.routers.dependencies import get_target_queue
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.target_queue import TargetQueue
+from uav_api.vehicles.trajectory import Trajectory, TrajectoryStreamer
+from uav_api.vehicles.vehicle import PreconditionFailedException
+
+pytestmark = pytest.mark.copter
+
+RATES = {"LOCAL_POSITION_NED": 20, "GLOBAL_POSITION_INT": 20}
+
+
+@pytest.fixture
+def flying(connected):
+    def make(fake, speed=50.0):
+        fake.speed = speed
+        return TargetQueue(connected(fake, Copter))
+
+    return make
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not met in %.1fs" % timeout
+        time.sleep(0.01)
+
+
+def ned(x, y, z):
+    return {"frame": "ned", "x": x, "y": y, "z": z}
+
+
+def test_targets_are_flown_in_order(flying):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake)
+        ids = queue.enqueue([ned(10, 0, -5), ned(10, 10, -5), ned(0, 10, -5)])
+        assert ids == [1, 2, 3]
+        wait_until(lambda: queue.status()["state"] == "idle")
+        status = queue.status()
+        assert status["counts"] == {"arrived": 3, "skipped": 0, "cleared": 0, "failed": 0}
+        assert [target["id"] for target in status["done"]] == ids
+        assert all(target["distance"] <= 1.0 for target in status["done"])
+        assert math.dist(fake.position, (0, 10, -5)) <= 1.0
+        # Each leg starts on the position message that shows the previous arrival.
+        for before, after in zip(status["done"], status["done"][1:]):
+            assert after["started"] == pytest.approx(before["finished"], abs=0.01)
+
+
+def test_gps_targets_arrive_on_global_position(flying):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake)
+        lat, lon, _ = fake.home
+        queue.enqueue([{"frame": "gps", "lat": lat + 0.0001, "long": lon, "alt": 10}], accuracy=2.0)
+        wait_until(lambda: queue.status()["counts"]["arrived"] == 1)
+        assert fake.position[0] == pytest.approx(11.1, abs=2.0)
+        assert fake.position[2] == pytest.approx(-10, abs=2.0)
+
+
+def test_enqueue_while_flying_appends(flying):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake, speed=5.0)
+        queue.enqueue([ned(5, 0, 0)])
+        queue.enqueue([ned(0, 0, 0)])
+        status = queue.status()
+        assert status["current"]["id"] == 1 and [target["id"] for target in status["pending"]] == [2]
+        wait_until(lambda: queue.status()["counts"]["arrived"] == 2)
+
+
+def test_skip_sends_the_next_target(flying):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake, speed=1.0)
+        queue.enqueue([ned(1000, 0, 0), ned(0, 3, 0)])
+        assert queue.skip()["id"] == 1
+        wait_until(lambda: fake.position_target is not None and fake.position_target[1] == 3)
+        wait_until(lambda: queue.status()["counts"]["arrived"] == 1)
+        assert queue.status()["counts"]["skipped"] == 1
+        assert queue.skip() is None
+
+
+def test_clear_drops_current_and_pending(flying):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake, speed=1.0)
+        queue.enqueue([ned(1000, 0, 0), ned(0, 1000, 0), ned(0, 0, -1000)], accuracy=0.0)
+        assert queue.status()["current"]["accuracy"] == 0.0  # explicit, not the default
+        assert queue.clear() == 3
+        status = queue.status()
+        assert status["state"] == "idle" and not status["pending"]
+        assert status["counts"]["cleared"] == 3
+        # The executor is still there for the next batch.
+        fake.speed = 50.0
+        queue.enqueue([ned(2, 0, 0)])
+        wait_until(lambda: queue.status()["counts"]["arrived"] == 1)
+
+
+def test_failed_send_moves_to_the_next_target(flying, monkeypatch):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake)
+        go_to_ned = queue.vehicle.go_to_ned
+
+        def refuse_far(x, y, z, look_at_target=False):
+            if x > 100:
+                raise RuntimeError("link busy")
+            go_to_ned(x, y, z, look_at_target=look_at_target)
+
+        monkeypatch.setattr(queue.vehicle, "go_to_ned", refuse_far)
+        queue.enqueue([ned(1000, 0, 0), ned(2, 0, 0)], accuracy=0.5)
+        assert queue.status()["current"]["id"] == 2
+        wait_until(lambda: queue.status()["state"] == "idle")
+        status = queue.status()
+        assert status["counts"] == {"arrived": 1, "skipped": 0, "cleared": 0, "failed": 1}
+        failed = status["done"][0]
+        assert failed["id"] == 1 and failed["state"] == "failed" and failed["error"] == "link busy"
+
+
+def test_queue_and_trajectory_are_exclusive(flying, vehicle_client):
+    with FakeAutopilot(rates=RATES) as fake:
+        queue = flying(fake, speed=1.0)
+        streamer = TrajectoryStreamer(queue.vehicle)
+        queue.trajectory, streamer.queue = streamer, queue  # as get_target_queue() links them
+        try:
+            queue.enqueue([ned(1000, 0, 0), ned(0, 1000, 0)])
+            streamer.start(Trajectory([{"t": 0, "x": 0, "y": 0, "z": 0}, {"t": 30, "x": 10, "y": 0, "z": 0}]))
+            status = queue.status()
+            assert status["state"] == "idle" and status["counts"]["cleared"] == 2
+            with pytest.raises(PreconditionFailedException):
+                queue.enqueue([ned(1, 0, 0)])
+            client = vehicle_client(queue.vehicle, {get_target_queue: queue})
+            response = client.post("/queue/targets", json={"targets": [{"x": 1, "y": 0, "z": 0}]})
+            assert response.status_code == 409 and response.json()["detail"].startswith("QUEUE FAIL")
+            # Once the trajectory has stopped the queue takes targets again.
+            streamer.cancel()
+            assert queue.enqueue([ned(1, 0, 0)]) == [3]
+        finally:
+            streamer.stop()
+
+
+@pytest.fixture
+def queue_client(flying, vehicle_client):
+    def make(fake, speed=50.0):
+        queue = flying(fake, speed)
+        return vehicle_client(queue.vehicle, {get_target_queue: queue})
+
+    return make
+
+
+def test_queue_endpoints(queue_client):
+    with FakeAutopilot(rates=RATES) as fake:
+        client = queue_client(fake, speed=1.0)
+        lat, lon, _ = fake.home
+        response = client.post("/queue/targets", json={"targets": [{"x": 500, "y": 0, "z": -5},
+                                                                  {"lat": lat, "long": lon, "alt": 5}]})
+        assert response.status_code == 200
+        body = response.json()
+        assert_envelope(body)
+        assert body["info"]["ids"] == [1, 2]
+        assert body["info"]["current"]["frame"] == "ned" and body["info"]["pending"][0]["frame"] == "gps"
+
+        body = client.post("/queue/skip").json()
+        assert body["info"]["skipped"]["id"] == 1 and body["info"]["current"]["id"] == 2
+
+        body = client.post("/queue/clear").json()
+        assert body["info"]["dropped"] == 1
+        status = client.get("/queue").json()["info"]
+        assert status["state"] == "idle"
+        assert [target["state"] for target in status["done"]] == ["skipped", "cleared"]
+        assert client.post("/queue/skip").status_code == 409
+
+
+def test_queue_rejects_bad_targets(queue_client):
+    with FakeAutopilot(rates=RATES) as fake:
+        client = queue_client(fake)
+        assert client.post("/queue/targets", json={"targets": []}).status_code == 422
+        assert client.post("/queue/targets", json={"targets": [{"x": 1, "y": 2}]}).status_code == 422
+        assert client.post("/queue/targets", json={"targets": [{"x": 1, "y": 2, "z": 3}],
+                                                   "accuracy": 0}).status_code == 422
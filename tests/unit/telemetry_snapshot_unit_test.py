@@ -0,0 +1,108 @@
+"""Unit tests for GET /telemetry/snapshot.
+
+A real Vehicle with a stand-in `mav` whose message cache is filled by hand:
+the endpoint only reads the cache, so no connection or receiver is needed.
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import GPS, NED, SYSID, assert_envelope, stamped
+
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.vehicle import Vehicle
+
+mavlink = mavutil.mavlink
+
+GPS_BIT = mavlink.MAV_SYS_STATUS_SENSOR_GPS
+
+
+def cache(now, **ages):
+    """mav.messages with each given type received `age` seconds before now."""
+    build = {
+        "GLOBAL_POSITION_INT": lambda: mavlink.MAVLink_global_position_int_message(
+            0, GPS.lat, GPS.lon, GPS.alt, GPS.relative_alt, GPS.vx, GPS.vy, GPS.vz, GPS.hdg),
+        "LOCAL_POSITION_NED": lambda: mavlink.MAVLink_local_position_ned_message(
+            0, NED.x, NED.y, NED.z, NED.vx, NED.vy, NED.vz),
+        "VFR_HUD": lambda: mavlink.MAVLink_vfr_hud_message(12.5, 11.0, 90, 55, 1042.5, 0.0),
+        "SYS_STATUS": lambda: mavlink.MAVLink_sys_status_message(
+            GPS_BIT, GPS_BIT, GPS_BIT, 0, 12600, 500, 87, 0, 0, 0, 0, 0, 0),
+        "HEARTBEAT": lambda: mavlink.MAVLink_heartbeat_message(
+            mavlink.MAV_TYPE_QUADROTOR, mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+            mavlink.MAV_MODE_FLAG_SAFETY_ARMED | mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
+            4, mavlink.MAV_STATE_ACTIVE, 3),  # custom_mode 4 = GUIDED
+    }
+    return {mtype: stamped(build[mtype](), now - age) for mtype, age in ages.items()}
+
+
+def fill(vehicle, messages):
+    """Install `messages` as the receiver would: HEARTBEAT as the autopilot's."""
+    vehicle.autopilot_heartbeat = messages.pop("HEARTBEAT", None)
+    vehicle.mav.messages = messages
+
+
+@pytest.fixture
+def vehicle():
+    vehicle = Vehicle()
+    vehicle.mav = SimpleNamespace(messages={})
+    return vehicle
+
+
+def test_snapshot_returns_every_field_with_its_age(vehicle, vehicle_client):
+    now = time.time()
+    fill(vehicle, cache(now, GLOBAL_POSITION_INT=0.2, LOCAL_POSITION_NED=0.2,
+                        VFR_HUD=0.3, SYS_STATUS=1.0, HEARTBEAT=0.5))
+    body = vehicle_client(vehicle).get("/telemetry/snapshot").json()
+    assert_envelope(body, "Success")
+    info = body["info"]
+    assert info["gps"]["info"]["position"]["lat"] == -15.840081
+    assert info["ned"]["info"]["velocity"] == {"vx": NED.vx, "vy": NED.vy, "vz": NED.vz}
+    assert info["general"]["info"]["groundspeed"] == 11.0
+    assert info["battery"]["info"]["battery_remaining"] == 87
+    assert info["sensors"]["info"]["gps"] == {"present": True, "enabled": True, "health": True}
+    assert info["state"]["info"] == {"mode": "GUIDED", "armed": True}
+    # Ages are measured against the response timestamp.
+    for name, age in {"gps": 0.2, "general": 0.3, "battery": 1.0, "sensors": 1.0, "state": 0.5}.items():
+        assert info[name]["age"] == pytest.approx(age + body["timestamp"] - now, abs=1e-6)
+
+
+def test_snapshot_reports_missing_types_as_null(vehicle, vehicle_client):
+    fill(vehicle, cache(time.time(), HEARTBEAT=0.0))
+    info = vehicle_client(vehicle).get("/telemetry/snapshot").json()["info"]
+    assert info["gps"] == {"age": None, "info": None}
+    assert info["sensors"] == {"age": None, "info": None}
+    assert info["state"]["info"]["armed"] is True
+
+
+def test_snapshot_is_registered_for_plane(plane_args, vehicle, vehicle_client):
+    fill(vehicle, cache(time.time(), GLOBAL_POSITION_INT=0.0))
+    body = vehicle_client(vehicle, args=plane_args).get("/telemetry/snapshot").json()
+    assert body["id"] == SYSID
+    assert body["info"]["ned"]["info"] is None
+
+
+def test_snapshot_failure_maps_to_500(vehicle, vehicle_client):
+    vehicle.mav.messages = {"VFR_HUD": SimpleNamespace(_timestamp=0.0)}  # missing every field
+    r = vehicle_client(vehicle).get("/telemetry/snapshot")
+    assert r.status_code == 500
+    assert "GET_SNAPSHOT FAIL" in r.json()["detail"]
+
+
+def test_snapshot_state_ignores_other_heartbeats(connected, vehicle_client):
+    with FakeAutopilot() as fake:  # disarmed, STABILIZE
+        vehicle = connected(fake)
+        fake.drop("HEARTBEAT")  # so the companion's stays the last one received
+        # A companion computer on the same system announces armed bits in GUIDED.
+        companion = mavlink.MAVLink(fake, srcSystem=fake.sysid, srcComponent=mavlink.MAV_COMP_ID_ONBOARD_COMPUTER)
+        with vehicle.subscribe(types={'SYSTEM_TIME'}, predicate=lambda m: not vehicle._from_autopilot(m)) as sub:
+            companion.heartbeat_send(mavlink.MAV_TYPE_ONBOARD_CONTROLLER, mavlink.MAV_AUTOPILOT_INVALID,
+                                     mavlink.MAV_MODE_FLAG_SAFETY_ARMED | mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED,
+                                     4, mavlink.MAV_STATE_ACTIVE)
+            companion.system_time_send(0, 0)  # sent after it, marks that it was received
+            sub.get(timeout=2)
+        assert vehicle.mav.messages["HEARTBEAT"].type == mavlink.MAV_TYPE_ONBOARD_CONTROLLER
+        info = vehicle_client(vehicle).get("/telemetry/snapshot").json()["info"]
+        assert info["state"]["info"] == {"mode": "STABILIZE", "armed": False}
@@ -0,0 +1,95 @@
+"""Unit tests for the push telemetry stream (SSE and WebSocket).
+
+Unlike the other router tests, these need a real Vehicle: the stream is a
+subscription, so messages are dispatched into it from a background thread the
+way the receiver would, with no MAVLink connection.
+"""
+
+import json
+import threading
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import GPS, NED, SYSID, feed_when_subscribed, stamped
+
+from uav_api.api_app import create_app
+from uav_api.vehicles.vehicle import Vehicle
+
+mavlink = mavutil.mavlink
+
+
+def gps_msg(t):
+    return stamped(mavlink.MAVLink_global_position_int_message(
+        0, GPS.lat, GPS.lon, GPS.alt, GPS.relative_alt, GPS.vx, GPS.vy, GPS.vz, GPS.hdg), t)
+
+
+def ned_msg(t):
+    return stamped(mavlink.MAVLink_local_position_ned_message(
+        0, NED.x, NED.y, NED.z, NED.vx, NED.vy, NED.vz), t)
+
+
+@pytest.fixture
+def vehicle():
+    return Vehicle()
+
+
+@pytest.fixture
+def stream_client(vehicle, vehicle_client):
+    return vehicle_client(vehicle)
+
+
+def sse_events(text):
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+def test_sse_pushes_converted_samples(stream_client, vehicle):
+    feed_when_subscribed(vehicle, [gps_msg(100.0), ned_msg(100.0)])
+    r = stream_client.get("/telemetry/stream", params={"types": ["gps", "ned"], "count": 2})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    gps, ned = sse_events(r.text)
+    assert (gps["id"], gps["type"], gps["timestamp"]) == (SYSID, "gps", 100.0)
+    assert gps["info"]["position"]["lat"] == -15.840081
+    assert ned["type"] == "ned"
+    assert ned["info"]["velocity"] == {"vx": NED.vx, "vy": NED.vy, "vz": NED.vz}
+    assert vehicle._subs == ()
+
+
+def test_sse_only_receives_requested_types(stream_client, vehicle):
+    feed_when_subscribed(vehicle, [ned_msg(100.0), gps_msg(100.0)])
+    r = stream_client.get("/telemetry/stream", params={"types": "gps", "count": 1})
+    assert [e["type"] for e in sse_events(r.text)] == ["gps"]
+
+
+def test_rate_decimates_per_type(stream_client, vehicle):
+    # 10 Hz of GPS decimated to 2 Hz keeps t=0.0, 0.5 and 1.0.
+    feed_when_subscribed(vehicle, [gps_msg(100.0 + i / 10) for i in range(11)])
+    r = stream_client.get("/telemetry/stream", params={"types": "gps", "rate": 2, "count": 3})
+    assert [e["timestamp"] for e in sse_events(r.text)] == [100.0, 100.5, 101.0]
+
+
+def test_unknown_stream_is_400(stream_client):
+    r = stream_client.get("/telemetry/stream", params={"types": "attitude"})
+    assert r.status_code == 400
+    assert "attitude" in r.json()["detail"]
+
+
+def test_stream_ends_when_link_goes_down(stream_client, vehicle):
+    threading.Timer(0.2, vehicle.close).start()
+    r = stream_client.get("/telemetry/stream", params={"types": "gps"})
+    assert r.status_code == 200
+    assert sse_events(r.text) == []
+
+
+def test_websocket_pushes_samples(stream_client, vehicle):
+    feed_when_subscribed(vehicle, [gps_msg(100.0), gps_msg(100.2)])
+    with stream_client.websocket_connect("/telemetry/stream?types=gps&count=2") as ws:
+        first = ws.receive_json()
+        second = ws.receive_json()
+    assert (first["type"], first["timestamp"]) == ("gps", 100.0)
+    assert second["timestamp"] == 100.2
+
+
+def test_stream_registered_for_plane(plane_args):
+    assert "/telemetry/stream" in create_app(plane_args).openapi()["paths"]
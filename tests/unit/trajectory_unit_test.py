@@ -0,0 +1,195 @@
+"""Unit tests for trajectory interpolation, the setpoint streamer and the
+/trajectory endpoints (streaming to FakeAutopilot)."""
+
+import math
+import time
+
+import pytest
+
+from unit_helpers import assert_envelope
+
+from uav_api.routers.dependencies import get_trajectory_streamer
+from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.fake_autopilot import FakeAutopilot
+from uav_api.vehicles.trajectory import Trajectory, TrajectoryStreamer
+from uav_api.vehicles.vehicle import PreconditionFailedException
+
+pytestmark = pytest.mark.copter
+
+
+def line(duration=1.0, length=10.0, **extra):
+    return [{"t": 0.0, "x": 0.0, "y": 0.0, "z": -10.0, **extra},
+            {"t": duration / 2, "x": length / 2, "y": 0.0, "z": -10.0, **extra},
+            {"t": duration, "x": length, "y": 0.0, "z": -10.0, **extra}]
+
+
+def test_spline_passes_through_samples_at_rest_at_the_ends():
+    trajectory = Trajectory(line(duration=4.0))
+    assert trajectory.duration == 4.0
+    for sample in line(duration=4.0):
+        assert trajectory.sample(sample["t"])[0] == pytest.approx((sample["x"], 0.0, -10.0))
+    assert trajectory.sample(0.0)[1] == (0.0, 0.0, 0.0)
+    assert trajectory.sample(2.0)[1] == pytest.approx((2.5, 0.0, 0.0))  # Catmull-Rom tangent
+    assert trajectory.sample(9.0) == ((10.0, 0.0, -10.0), (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), None)
+
+
+def test_velocity_and_acceleration_are_the_spline_derivatives():
+    trajectory = Trajectory([{"t": 0, "x": 0, "y": 0, "z": 0}, {"t": 2, "x": 10, "y": 3, "z": -4},
+                             {"t": 3, "x": 12, "y": 9, "z": -4}, {"t": 5, "x": 0, "y": 0, "z": 0}])
+    for t in (0.3, 1.7, 2.5, 4.1):
+        e = 1.0e-5
+        before, after = trajectory.sample(t - e), trajectory.sample(t + e)
+        velocity = [(a - b) / (2 * e) for a, b in zip(after[0], before[0])]
+        acceleration = [(a - b) / (2 * e) for a, b in zip(after[1], before[1])]
+        assert trajectory.sample(t)[1] == pytest.approx(velocity, abs=1e-4)
+        assert trajectory.sample(t)[2] == pytest.approx(acceleration, abs=1e-3)
+
+
+def test_given_velocities_accelerations_and_yaw_are_used():
+    samples = [{"t": 0, "x": 0, "y": 0, "z": 0, "vx": 1, "vy": 0, "vz": 0, "ax": 0, "ay": 0, "az": 0, "yaw": 350},
+               {"t": 1, "x": 1, "y": 0, "z": 0, "vx": 1, "vy": 0, "vz": 0, "ax": 2, "ay": 0, "az": 0, "yaw": 10}]
+    trajectory = Trajectory(samples)
+    position, velocity, acceleration, yaw = trajectory.sample(0.5)
+    assert position == pytest.approx((0.5, 0, 0)) and velocity == pytest.approx((1, 0, 0))
+    assert acceleration == pytest.approx((1, 0, 0))
+    # 350 -> 10 degrees turns through north, not back round through south.
+    assert math.degrees(yaw) == pytest.approx(360.0)
+
+
+@pytest.mark.parametrize("samples", [
+    line()[:1],
+    [{"t": 0, "x": 0, "y": 0, "z": 0}, {"t": 0, "x": 1, "y": 0, "z": 0}],
+    [{"t": 0, "x": 0, "y": 0, "z": 0, "vx": 1, "vy": 0, "vz": 0}, {"t": 1, "x": 1, "y": 0, "z": 0}],
+])
+def test_bad_trajectories_raise(samples):
+    with pytest.raises(ValueError):
+        Trajectory(samples)
+
+
+@pytest.fixture
+def streaming(connected):
+    made = []
+
+    def make(fake):
+        streamer = TrajectoryStreamer(connected(fake, Copter))
+        made.append(streamer)
+        return streamer
+
+    yield make
+    for streamer in made:
+        streamer.stop()
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "condition not met in %.1fs" % timeout
+        time.sleep(0.01)
+
+
+def test_streams_at_the_rate_and_holds_the_end(streaming):
+    with FakeAutopilot() as fake:
+        streamer = streaming(fake)
+        before = fake.received["SET_POSITION_TARGET_LOCAL_NED"]
+        streamer.start(Trajectory(line(duration=1.0)), rate=20)
+        wait_until(lambda: streamer.status()["state"] == "completed")
+        status = streamer.status()
+        assert 20 <= status["sent"] + status["skipped"] <= 21
+        jitter = status["jitter"]
+        assert jitter["interval_ms"]["mean"] == pytest.approx(50.0, abs=10.0)
+        assert jitter["lag_ms"]["p50"] < 25.0
+        wait_until(lambda: fake.received["SET_POSITION_TARGET_LOCAL_NED"] - before >= status["sent"] - 2)
+        wait_until(lambda: math.dist(fake.position, (10.0, 0.0, -10.0)) < 0.01)
+
+
+def test_jitter_covers_a_bounded_window(streaming, monkeypatch):
+    monkeypatch.setattr(TrajectoryStreamer, "KEEP", 10)
+    with FakeAutopilot() as fake:
+        streamer = streaming(fake)
+        streamer.start(Trajectory(line(duration=1.0)), rate=50)
+        wait_until(lambda: streamer.status()["state"] == "completed")
+        assert streamer.status()["sent"] > 10
+        assert len(streamer.run["lags"]) == len(streamer.run["intervals"]) == 10
+
+
+def test_start_replaces_or_refuses(streaming):
+    with FakeAutopilot() as fake:
+        streamer = streaming(fake)
+        streamer.start(Trajectory(line(duration=30.0)))
+        first = streamer.run
+        with pytest.raises(PreconditionFailedException):
+            streamer.start(Trajectory(line(duration=30.0)), replace=False)
+        assert streamer.run is first
+        streamer.start(Trajectory(line(duration=0.2)))
+        assert first["state"] == "replaced"
+        wait_until(lambda: streamer.status()["state"] == "completed")
+
+
+def test_cancel_stops_with_zero_velocity(streaming):
+    with FakeAutopilot() as fake:
+        fake.speed = 1.0
+        streamer = streaming(fake)
+        streamer.start(Trajectory(line(duration=30.0, length=300.0)))
+        wait_until(lambda: streamer.status()["sent"] >= 3)
+        assert streamer.cancel() is True
+        assert streamer.status()["state"] == "cancelled"
+        wait_until(lambda: fake.position_target is None)
+        assert streamer.cancel() is False
+
+
+def test_deadline_failsafe(streaming):
+    with FakeAutopilot() as fake:
+        streamer = streaming(fake)
+        streamer.start(Trajectory(line(duration=30.0)), deadline=0.3)
+        wait_until(lambda: streamer.status()["state"] != "streaming")
+        status = streamer.status()
+        assert status["state"] == "failsafe" and "deadline" in status["reason"]
+        assert status["elapsed"] <= 0.35
+
+
+def test_stalled_scheduler_failsafe(streaming, monkeypatch):
+    monkeypatch.setattr(TrajectoryStreamer, "MAX_LAG", 0.1)
+    with FakeAutopilot() as fake:
+        streamer = streaming(fake)
+        streamer.start(Trajectory(line(duration=30.0)), rate=10)
+        wait_until(lambda: streamer.status()["sent"] >= 2)
+        with streamer._lock:
+            time.sleep(0.3)
+        wait_until(lambda: streamer.status()["state"] != "streaming")
+        assert "late" in streamer.status()["reason"]
+
+
+@pytest.fixture
+def trajectory_client(streaming, vehicle_client):
+    def make(fake):
+        streamer = streaming(fake)
+        return vehicle_client(streamer.vehicle, {get_trajectory_streamer: streamer})
+
+    return make
+
+
+def test_trajectory_endpoints(trajectory_client):
+    with FakeAutopilot() as fake:
+        client = trajectory_client(fake)
+        assert client.get("/trajectory").json()["info"] == {"state": "idle"}
+        response = client.post("/trajectory", json={"samples": line(duration=30.0), "rate": 10})
+        assert response.status_code == 200
+        body = response.json()
+        assert_envelope(body)
+        assert body["info"]["state"] == "streaming" and body["info"]["duration"] == 30.0
+        busy = client.post("/trajectory", json={"samples": line(), "replace": False})
+        assert busy.status_code == 409
+        assert client.post("/trajectory/cancel").json()["info"]["state"] == "cancelled"
+        assert client.post("/trajectory/cancel").status_code == 409
+
+
+def test_trajectory_endpoint_rejects_bad_input(trajectory_client):
+    with FakeAutopilot() as fake:
+        client = trajectory_client(fake)
+        unordered = line()
+        unordered[2]["t"] = 0.1
+        response = client.post("/trajectory", json={"samples": unordered})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("TRAJECTORY FAIL")
+        assert client.post("/trajectory", json={"samples": line()[:1]}).status_code == 422
+        assert client.post("/trajectory", json={"samples": line(), "rate": 100}).status_code == 422
@@ -0,0 +1,161 @@
+"""Unit tests for the prioritized transmit thread.
+
+The transmitter writes to a pymavlink MAVLink object over GatedFile, which
+decodes what is written and can hold the first write until released, so
+the queue fills behind it exactly as it would behind a slow radio.
+"""
+
+import threading
+import time
+
+import pytest
+from pymavlink import mavutil
+
+from uav_api.vehicles.transmitter import (
+    TX_BULK, TX_COMMAND, TX_HEARTBEAT, TX_SETPOINT, Transmitter, classify,
+)
+
+mavlink = mavutil.mavlink
+
+
+class GatedFile:
+    def __init__(self, hold_first=False):
+        self.parser = mavlink.MAVLink(None)
+        self.written = []
+        self.released = threading.Event()
+        self.holding = threading.Event()
+        if not hold_first:
+            self.released.set()
+
+    def write(self, buf):
+        if not self.released.is_set():
+            self.holding.set()
+            self.released.wait(5)
+        self.written.extend(self.parser.parse_buffer(buf) or [])
+
+
+@pytest.fixture
+def link():
+    def make(hold_first=False, rate_limit=None, burst=1120):
+        f = GatedFile(hold_first)
+        mav = mavlink.MAVLink(f, srcSystem=250, srcComponent=250)
+        tx = Transmitter(mav, rate_limit=rate_limit, burst=burst)
+        tx.start()
+        made.append(tx)
+        return mav, tx, f
+
+    made = []
+    yield make
+    for tx in made:
+        tx.stop()
+
+
+def _command(command, p1=0):
+    return mavlink.MAVLink_command_long_message(1, 1, command, 0, p1, 0, 0, 0, 0, 0, 0)
+
+
+POSITION_MASK = 0b0000111111111000
+VELOCITY_MASK = 0b0000111111000111
+
+
+def _setpoint(x, frame=mavlink.MAV_FRAME_LOCAL_NED, mask=POSITION_MASK):
+    return mavlink.MAVLink_set_position_target_local_ned_message(0, 1, 1, frame, mask, x, 0, -10,
+                                                                 x, 0, 0, 0, 0, 0, 0, 0)
+
+
+def test_classify():
+    assert classify(mavlink.MAVLink_heartbeat_message(6, 8, 0, 0, 0, 3))[0] == TX_HEARTBEAT
+    assert classify(_command(mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH))[0] == TX_HEARTBEAT
+    assert classify(_command(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 0))[0] == TX_HEARTBEAT
+    assert classify(_command(mavlink.MAV_CMD_COMPONENT_ARM_DISARM, 1))[0] == TX_COMMAND
+    assert classify(_setpoint(1.0)) == (TX_SETPOINT, ("SET_POSITION_TARGET_LOCAL_NED", 1, mavlink.MAV_FRAME_LOCAL_NED,
+                                                      POSITION_MASK))
+    assert classify(_setpoint(1.0, frame=mavlink.MAV_FRAME_LOCAL_OFFSET_NED)) == (TX_SETPOINT, None)
+    assert classify(_setpoint(1.0, frame=mavlink.MAV_FRAME_BODY_OFFSET_NED)) == (TX_SETPOINT, None)
+    assert classify(mavlink.MAVLink_param_set_message(1, 1, b"RTL_ALT", 1500, 9))[0] == TX_BULK
+    assert classify(mavlink.MAVLink_mission_count_message(1, 1, 3))[0] == TX_BULK
+    assert classify(mavlink.MAVLink_request_data_stream_message(1, 1, 0, 5, 1))[0] == TX_COMMAND
+
+
+def test_send_helpers_are_queued_and_written(link):
+    mav, tx, f = link()
+    mav.heartbeat_send(6, 8, 0, 0, 0)
+    mav.param_request_read_send(1, 1, b"RTL_ALT", -1)
+    deadline = time.time() + 2
+    while len(f.written) < 2 and time.time() < deadline:
+        time.sleep(0.005)
+    assert [m.get_type() for m in f.written] == ["HEARTBEAT", "PARAM_REQUEST_READ"]
+    # Sequence numbers are assigned at write time, on the transmit thread.
+    assert [m.get_seq() for m in f.written] == [0, 1]
+    assert tx.sent[TX_HEARTBEAT] == 1 and tx.sent[TX_BULK] == 1
+
+
+def test_bulk_never_delays_setpoints_or_failsafe(link):
+    mav, tx, f = link(hold_first=True)
+    mav.param_set_send(1, 1, b"FIRST", 1, 9)  # on the wire, held
+    assert f.holding.wait(2)
+    for i in range(20):
+        mav.param_set_send(1, 1, b"P%d" % i, i, 9)
+    mav.send(_command(mavlink.MAV_CMD_DO_SET_MODE))
+    mav.send(_setpoint(1.0))
+    mav.send(_command(mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH))
+    f.released.set()
+    tx.stop()
+    types = [m.get_type() for m in f.written]
+    assert types[:4] == ["PARAM_SET", "COMMAND_LONG", "SET_POSITION_TARGET_LOCAL_NED", "COMMAND_LONG"]
+    assert f.written[1].command == mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH
+    assert f.written[3].command == mavlink.MAV_CMD_DO_SET_MODE
+    assert types[4:] == ["PARAM_SET"] * 20
+
+
+def test_superseded_setpoints_are_coalesced(link):
+    mav, tx, f = link(hold_first=True)
+    mav.heartbeat_send(6, 8, 0, 0, 0)
+    assert f.holding.wait(2)
+    for x in (1.0, 2.0, 3.0):
+        mav.send(_setpoint(x))
+    f.released.set()
+    tx.stop()
+    setpoints = [m for m in f.written if m.get_type() == "SET_POSITION_TARGET_LOCAL_NED"]
+    assert [m.x for m in setpoints] == [3.0]
+    assert tx.coalesced[TX_SETPOINT] == 2
+
+
+def test_only_setpoints_of_the_same_kind_are_coalesced(link):
+    mav, tx, f = link(hold_first=True)
+    mav.heartbeat_send(6, 8, 0, 0, 0)
+    assert f.holding.wait(2)
+    mav.send(_setpoint(1.0))  # position
+    mav.send(_setpoint(2.0, mask=VELOCITY_MASK))  # velocity
+    mav.send(_setpoint(3.0, frame=mavlink.MAV_FRAME_LOCAL_OFFSET_NED))
+    mav.send(_setpoint(4.0, frame=mavlink.MAV_FRAME_LOCAL_OFFSET_NED))
+    mav.send(_setpoint(5.0, mask=VELOCITY_MASK))
+    f.released.set()
+    tx.stop()
+    setpoints = [m for m in f.written if m.get_type() == "SET_POSITION_TARGET_LOCAL_NED"]
+    assert [m.x for m in setpoints] == [1.0, 5.0, 3.0, 4.0]
+    assert tx.coalesced[TX_SETPOINT] == 1
+
+
+def test_rate_limit_paces_output(link):
+    mav, tx, f = link(rate_limit=2000, burst=21)
+    tstart = time.monotonic()
+    for _ in range(21):
+        mav.heartbeat_send(6, 8, 0, 0, 0)
+    deadline = tstart + 2
+    while len(f.written) < 21 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    elapsed = time.monotonic() - tstart
+    assert len(f.written) == 21
+    # The last frame goes out once everything before it beyond the burst
+    # has been paid for at 2000 B/s.
+    frame = tx.bytes_sent[TX_HEARTBEAT] / 21
+    assert elapsed >= 0.95 * (20 * frame - 21) / 2000
+
+
+def test_stop_restores_direct_sends(link):
+    mav, tx, f = link()
+    tx.stop()
+    assert "send" not in mav.__dict__
+    mav.heartbeat_send(6, 8, 0, 0, 0)
+    assert f.written[-1].get_type() == "HEARTBEAT"
@@ -9,24 +9,28 @@ Telemetry constants are attribute-bearing objects with numeric fields in raw
 MAVLink units (lat in 1e7 degrees, alt in mm, vel in cm/s, hdg in
 centidegrees): the handlers do the unit conversion arithmetic, which is
 asserted exactly in copter_telemetry_unit_test.py. Values are chosen so the
-converted results are exact in binary floating point.
+converted results are exact in binary floating point. Messages served through
+the response cache also carry the receive `_timestamp` pymavlink sets.
 """
 
+import threading
+import time
 from types import SimpleNamespace
 
 # parse_args default sysid — every response envelope carries it as a string.
 SYSID = "10"
 
-GENERAL = SimpleNamespace(airspeed=12.5, groundspeed=11.0, heading=90, throttle=55, alt=1042.5)
+GENERAL = SimpleNamespace(airspeed=12.5, groundspeed=11.0, heading=90, throttle=55, alt=1042.5,
+                          _timestamp=100.0)
 GPS = SimpleNamespace(
     lat=-158400810, lon=-479266420, alt=1042000, relative_alt=15000,
-    vx=120, vy=-40, vz=10, hdg=9000,
+    vx=120, vy=-40, vz=10, hdg=9000, _timestamp=100.0,
 )
 RAW_GPS = SimpleNamespace(
     lat=-158400810, lon=-479266420, alt=1042000,
-    vel=250, cog=4500, satellites_visible=12,
+    vel=250, cog=4500, satellites_visible=12, _timestamp=100.0,
 )
-NED = SimpleNamespace(x=1.5, y=-2.5, z=-15.0, vx=0.25, vy=0.5, vz=-0.75)
+NED = SimpleNamespace(x=1.5, y=-2.5, z=-15.0, vx=0.25, vy=0.5, vz=-0.75, _timestamp=100.0)
 NED_POSITION = SimpleNamespace(x=1.0, y=2.0, z=-15.0)
 COMPASS = SimpleNamespace(calibration_status=1, autosaved=1, fitness=[0.25, 0.5, 0.75])
 SYS_STATUS = SimpleNamespace(to_dict=lambda: {"onboard_control_sensors_health": 12345})
@@ -42,3 +46,25 @@ def assert_envelope(body, result_contains=None):
     assert body["id"] == SYSID
     if result_contains is not None:
         assert result_contains in body["result"]
+
+
+def stamped(m, timestamp=None):
+    """Give a hand-built pymavlink message the receive time pymavlink's parser
+    would have set."""
+    m._timestamp = time.time() if timestamp is None else timestamp
+    return m
+
+
+def feed_when_subscribed(vehicle, messages, n_subs=1, timeout=2.0):
+    """Dispatch `messages` from a background thread, as the receiver would,
+    once `n_subs` subscriptions are registered on `vehicle`."""
+    def run():
+        deadline = time.time() + timeout
+        while len(vehicle._subs) < n_subs and time.time() < deadline:
+            time.sleep(0.005)
+        for m in messages:
+            vehicle._dispatch(m)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,129 @@
+"""Unit tests for the Vehicle receive plumbing.
+
+No MAVLink connection: messages are pymavlink message objects pushed straight
+into Vehicle._dispatch, the step the receiver thread runs for every parsed
+message.
+"""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from pymavlink import mavutil
+
+from unit_helpers import stamped
+
+from uav_api.vehicles.vehicle import LinkDownException, TimeoutException, Vehicle
+
+mavlink = mavutil.mavlink
+
+
+def ack(command=400, result=0):
+    return mavlink.MAVLink_command_ack_message(command, result)
+
+
+def heartbeat():
+    return mavlink.MAVLink_heartbeat_message(2, 3, 0, 0, 0, 3)
+
+
+def test_dispatch_reaches_only_subscriptions_for_the_type():
+    vehicle = Vehicle()
+    with vehicle.subscribe(types={'COMMAND_ACK'}) as acks, \
+            vehicle.subscribe(types={'HEARTBEAT'}) as beats:
+        vehicle._dispatch(ack())
+        assert acks.get(timeout=0.1).get_type() == 'COMMAND_ACK'
+        assert beats._q.empty()
+
+
+def test_wildcard_subscription_sees_every_type():
+    vehicle = Vehicle()
+    with vehicle.subscribe() as everything:
+        vehicle._dispatch(ack())
+        vehicle._dispatch(heartbeat())
+        assert everything.get(timeout=0.1).get_type() == 'COMMAND_ACK'
+        assert everything.get(timeout=0.1).get_type() == 'HEARTBEAT'
+
+
+def test_predicate_filters_within_the_type_bucket():
+    vehicle = Vehicle()
+    with vehicle.subscribe(types={'COMMAND_ACK'}, predicate=lambda m: m.command == 22) as sub:
+        vehicle._dispatch(ack(command=400))
+        vehicle._dispatch(ack(command=22))
+        assert sub.get(timeout=0.1).command == 22
+        assert sub._q.empty()
+
+
+def test_unsubscribe_removes_every_index_entry():
+    vehicle = Vehicle()
+    with vehicle.subscribe(types={'COMMAND_ACK', 'HEARTBEAT'}):
+        with vehicle.subscribe():
+            assert set(vehicle._sub_index) == {'COMMAND_ACK', 'HEARTBEAT', None}
+        assert set(vehicle._sub_index) == {'COMMAND_ACK', 'HEARTBEAT'}
+    assert vehicle._sub_index == {}
+    assert vehicle._subs == ()
+
+
+def test_close_unblocks_every_subscription():
+    vehicle = Vehicle()
+    with vehicle.subscribe(types={'COMMAND_ACK'}) as acks, vehicle.subscribe() as everything:
+        vehicle.close()
+        for sub in (acks, everything):
+            with pytest.raises(LinkDownException):
+                sub.get(timeout=0.1)
+
+
+def test_async_subscription_wakes_on_dispatch_from_another_thread():
+    vehicle = Vehicle()
+
+    async def scenario():
+        async with vehicle.subscribe_async(types={'COMMAND_ACK'}) as sub:
+            threading.Timer(0.05, vehicle._dispatch, args=(ack(command=22),)).start()
+            return await sub.get(timeout=2)
+
+    assert asyncio.run(scenario()).command == 22
+
+
+def test_async_subscription_timeout_and_link_down():
+    vehicle = Vehicle()
+
+    async def scenario():
+        async with vehicle.subscribe_async(types={'COMMAND_ACK'}) as sub:
+            with pytest.raises(TimeoutException):
+                await sub.get(timeout=0.05)
+            vehicle.close()
+            with pytest.raises(LinkDownException):
+                await sub.get(timeout=2)
+
+    asyncio.run(scenario())
+
+
+def test_run_cmd_async_resolves_on_ack():
+    vehicle = Vehicle()
+
+    def command_long_send(*args):
+        # The autopilot answers from the receiver thread, after the send.
+        threading.Timer(0.05, vehicle._dispatch, args=(ack(command=args[2]),)).start()
+
+    vehicle.tx = SimpleNamespace(command_long_send=command_long_send)
+    asyncio.run(vehicle.run_cmd_async(mavlink.MAV_CMD_DO_SET_SERVO, 9, 1500, 0, 0, 0, 0, 0, timeout=2))
+    assert vehicle._subs == ()
+
+
+def test_wait_fresh_async_serves_cache_or_waits_for_newer():
+    vehicle = Vehicle()
+    cached = stamped(ack(command=1), time.time() - 1.0)
+    vehicle.mav = SimpleNamespace(messages={'COMMAND_ACK': cached})
+    vehicle._rx_thread = threading.current_thread()  # stands in for a live receiver
+
+    async def scenario():
+        assert await vehicle.wait_fresh_async('COMMAND_ACK', max_age=5.0) is cached
+        assert await vehicle.wait_fresh_async('COMMAND_ACK', since=cached._timestamp - 0.5) is cached
+        with pytest.raises(TimeoutException):
+            await vehicle.wait_fresh_async('COMMAND_ACK', max_age=0.5, timeout=0.05)
+        newer = stamped(ack(command=2))
+        threading.Timer(0.05, vehicle._dispatch, args=(newer,)).start()
+        assert await vehicle.wait_fresh_async('COMMAND_ACK', since=cached._timestamp, timeout=2) is newer
+
+    asyncio.run(scenario())
@@ -1,10 +1,11 @@
 from fastapi import FastAPI
 
-from uav_api.routers.copter import command as copter_command, movement as copter_movement, telemetry as copter_telemetry
+from uav_api.routers.copter import command as copter_command, movement as copter_movement, queue as copter_queue, telemetry as copter_telemetry, trajectory as copter_trajectory
 from uav_api.routers.plane import command as plane_command, movement as plane_movement, telemetry as plane_telemetry
-from uav_api.routers.common import mission, peripherical
+from uav_api.routers.common import metrics, mission, mission_items, params, peripherical, telemetry as common_telemetry, telemetry_stream
 from uav_api.routers.dependencies import get_args
 from uav_api.lifespan import lifespan
+from uav_api.metrics import MetricsMiddleware
 
 metadata = [
 {
@@ -18,6 +19,22 @@ metadata = [
 {
     "name": "telemetry",
     "description": "Provides telemetry of the UAV"
+},
+{
+    "name": "queue",
+    "description": "Server-side queue of GUIDED targets, flown one after the other"
+},
+{
+    "name": "trajectory",
+    "description": "Timestamped trajectories streamed as setpoints at a fixed rate"
+},
+{
+    "name": "params",
+    "description": "Provides the autopilot parameter table"
+},
+{
+    "name": "metrics",
+    "description": "Prometheus metrics of the MAVLink link and the HTTP API"
 }
 ]
 
@@ -36,14 +53,24 @@ def create_app(args) -> FastAPI:
         openapi_tags=metadata,
         lifespan=lifespan
     )
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+    app.include_router(params.router)
+    app.include_router(mission_items.router)
     if args.vehicle == "plane":
         app.include_router(plane_command.router)
         app.include_router(plane_movement.router)
         app.include_router(plane_telemetry.router)
+        app.include_router(common_telemetry.router)
+        app.include_router(telemetry_stream.router)
     else:
         app.include_router(copter_command.router)
         app.include_router(copter_telemetry.router)
+        app.include_router(common_telemetry.router)
+        app.include_router(telemetry_stream.router)
         app.include_router(copter_movement.router)
+        app.include_router(copter_queue.router)
+        app.include_router(copter_trajectory.router)
         app.include_router(mission.router)
         app.include_router(peripherical.router)
     return app
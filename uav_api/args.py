@@ -49,6 +49,25 @@ def coerce_bool(key, value):
         f"{sorted(_TRUE_VALUES)} or {sorted(_FALSE_VALUES)}."
     )
 
+def parse_message_rates(entries):
+    """Turn `--message_rates` entries ("NAME=HZ") into {NAME: Hz}.
+
+    Raises on a malformed entry, for the same reason as coerce_bool: a typo in
+    a rate profile should stop startup, not silently leave the default rate.
+    """
+    rates = {}
+    for entry in entries:
+        name, sep, rate = entry.partition("=")
+        try:
+            if not sep or not name.strip():
+                raise ValueError
+            rates[name.strip().upper()] = float(rate)
+        except ValueError:
+            raise ValueError(
+                f"Invalid message rate {entry!r}. Use MESSAGE=HZ, e.g. GLOBAL_POSITION_INT=20."
+            ) from None
+    return rates
+
 def parse_args(raw_args=None):
     parser = argparse.ArgumentParser(description="Welcome to the UAV Runner, this script runs an API that interfaces with Ardupilots instances (real or simulated).")
     parse_mode(parser)
@@ -84,6 +103,7 @@ def parse_args(raw_args=None):
                     setattr(args, key, value)
                 else:
                     print(f"Warning: {key} not found in args")
+    parse_message_rates(args.message_rates)
     return args
     
 # MODE PARSER
@@ -127,7 +147,38 @@ def parse_api(api_parser):
         '--uav_connection',
         dest='uav_connection',
         default='127.0.0.1:17171',
-        help='Address used for copter connection'
+        help="Address used for copter connection. 'replay:<file.tlog>' plays back a recorded tlog instead of connecting"
+    )
+
+    api_parser.add_argument(
+        '--replay_speed',
+        dest='replay_speed',
+        type=float,
+        default=1.0,
+        help="Playback speed for a 'replay:' connection, as a multiple of real time. 0 replays as fast as possible"
+    )
+
+    api_parser.add_argument(
+        '--tx_rate_limit',
+        dest='tx_rate_limit',
+        type=float,
+        default=None,
+        help="Cap on outgoing MAVLink traffic in bytes/s, for low-baud radios. Heartbeats and failsafe commands go first, then setpoints, commands and parameter/mission transfers"
+    )
+
+    api_parser.add_argument(
+        '--param_cache',
+        dest='param_cache',
+        default=None,
+        help="Directory of the parameter table cache, one file per sysid and firmware. Defaults to ~/uav_api_logs/param_cache"
+    )
+
+    api_parser.add_argument(
+        '--no_param_sync',
+        dest='no_param_sync',
+        action='store_true',
+        default=False,
+        help="Do not load or download the parameter table at startup (/params then only holds what the autopilot sends unasked)"
     )
 
     api_parser.add_argument(
@@ -153,6 +204,16 @@ def parse_api(api_parser):
         help='Address for Gradys Ground Station connection'
     )
 
+    api_parser.add_argument(
+        '--message_rates',
+        dest='message_rates',
+        default=[],
+        nargs='*',
+        help="Per-message stream rates applied on connection, as MESSAGE=HZ pairs on top of the default 5 Hz "
+             "MAV_DATA_STREAM_ALL (e.g. GLOBAL_POSITION_INT=20 ATTITUDE=10 SYS_STATUS=1). 0 restores a message's "
+             "default rate, -1 disables it. In a config file: message_rates=[GLOBAL_POSITION_INT=20, SYS_STATUS=1]"
+    )
+
     api_parser.add_argument(
         '--scripts_path',
         dest='scripts_path',
@@ -253,6 +314,37 @@ def parse_logs(logs_parser):
         help="Saves script executed by mission route out and err files to the provided path"
     )
 
+    logs_parser.add_argument(
+        "--tlog",
+        dest="tlog",
+        action="store_true",
+        default=False,
+        help="Record every MAVLink message received from the vehicle to rotating tlog files"
+    )
+
+    logs_parser.add_argument(
+        "--tlog_path",
+        dest="tlog_path",
+        default=None,
+        help="Directory for tlog files (with --tlog). Defaults to ~/uav_api_logs/tlogs"
+    )
+
+    logs_parser.add_argument(
+        "--tlog_max_mb",
+        dest="tlog_max_mb",
+        type=int,
+        default=64,
+        help="Start a new tlog file after this many megabytes of log data"
+    )
+
+    logs_parser.add_argument(
+        "--tlog_compress",
+        dest="tlog_compress",
+        action="store_true",
+        default=False,
+        help="Gzip tlog files as they are written (.tlog.gz)"
+    )
+
 def parse_udp(udp_parser):
 
     udp_parser.add_argument(
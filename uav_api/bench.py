@@ -0,0 +1,301 @@
+"""`uav-api bench`: HTTP load and latency benchmark of the real app.
+
+The API runs unmodified in a subprocess (so its CPU can be read on its own),
+connected over UDP to an in-process FakeAutopilot. Concurrent aiohttp clients
+then drive it in two phases:
+
+  1. each endpoint alone for --endpoint_duration seconds, which gives the
+     API's CPU cost per request of that endpoint;
+  2. the weighted --mix of all of them for --duration seconds, which gives
+     latency and throughput under contention.
+
+Both report p50/p95/p99 latency, throughput and API CPU per endpoint. The
+JSON result goes to stdout or --output; with --budget the result is checked
+against per-endpoint limits and the exit status is 1 on any violation.
+
+    uav-api bench --clients 32 --duration 20 --output bench.json
+    uav-api bench --mix telemetry=90,command=10 --budget benchmarks/http_budgets.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import psutil
+
+from uav_api.vehicles.fake_autopilot import FAKE_HOME, FakeAutopilot
+
+_HOME = {"lat": FAKE_HOME[0], "long": FAKE_HOME[1], "alt": 0}
+
+# Endpoint name -> request. "params" may be a callable, evaluated per request.
+BENCH_ENDPOINTS = {
+    "gps": {"category": "telemetry", "method": "GET", "path": "/telemetry/gps"},
+    "general": {"category": "telemetry", "method": "GET", "path": "/telemetry/general"},
+    "snapshot": {"category": "telemetry", "method": "GET", "path": "/telemetry/snapshot"},
+    "sys_status": {"category": "telemetry", "method": "GET", "path": "/telemetry/sys_status"},
+    "go_to_gps": {"category": "movement", "method": "POST", "path": "/movement/go_to_gps/", "json": _HOME},
+    "set_yaw_rate": {"category": "movement", "method": "GET", "path": "/movement/set_yaw_rate",
+                     "params": {"yaw_rate": 0}},
+    "set_heading": {"category": "command", "method": "GET", "path": "/movement/set_heading",
+                    "params": {"heading": 90}},
+    "gps_next": {"category": "wait", "method": "GET", "path": "/telemetry/gps",
+                 "params": lambda: {"since": time.time()}},
+    "go_to_gps_wait": {"category": "wait", "method": "POST", "path": "/movement/go_to_gps_wait", "json": _HOME},
+}
+
+# Share of requests per category in the mixed phase.
+BENCH_MIX = {"telemetry": 70, "movement": 10, "command": 10, "wait": 10}
+
+
+def parse_mix(text):
+    """"telemetry=70,command=30" -> {"telemetry": 70.0, "command": 30.0}."""
+    mix = {}
+    for entry in text.split(","):
+        name, sep, weight = entry.partition("=")
+        name = name.strip()
+        if not sep or name not in BENCH_MIX:
+            raise ValueError(f"invalid mix entry '{entry}', expected CATEGORY=WEIGHT with CATEGORY in {sorted(BENCH_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(latencies, errors, elapsed, cpu_seconds=None):
+    """Stats for one endpoint (or a whole phase): latencies in seconds."""
+    ordered = sorted(latencies)
+    requests = len(ordered) + sum(errors.values())
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    stats = {
+        "requests": requests,
+        "errors": dict(errors),
+        "rps": round(requests / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1] if ordered else None),
+    }
+    if cpu_seconds is not None:
+        stats["api_cpu_percent"] = round(100 * cpu_seconds / elapsed, 1) if elapsed > 0 else None
+        stats["api_cpu_ms_per_request"] = round(1000 * cpu_seconds / requests, 3) if requests else None
+    return stats
+
+
+def check_budgets(result, budgets):
+    """Violations of {endpoint: {"p95_ms"|"p99_ms"|"p50_ms"|"api_cpu_ms_per_request": max,
+    "min_rps": min}} ("mix" addresses the mixed phase totals)."""
+    violations = []
+    for name, limits in budgets.items():
+        stats = result["mix"]["total"] if name == "mix" else result["endpoints"].get(name)
+        if stats is None:
+            continue
+        for key, limit in limits.items():
+            if key == "min_rps":
+                value, ok = stats.get("rps"), lambda v: v >= limit
+            else:
+                value, ok = stats.get(key), lambda v: v <= limit
+            if value is not None and not ok(value):
+                violations.append({"endpoint": name, "metric": key, "value": value, "budget": limit})
+    return violations
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _request_args(endpoint):
+    params = endpoint.get("params")
+    if callable(params):
+        params = params()
+    return {"params": params, "json": endpoint.get("json")}
+
+
+async def _client(session, base, names, weights, deadline, samples, rng):
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0] if weights else names[0]
+        endpoint = BENCH_ENDPOINTS[name]
+        latencies, errors = samples[name]
+        tstart = time.perf_counter()
+        try:
+            async with session.request(endpoint["method"], base + endpoint["path"],
+                                       **_request_args(endpoint)) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        if status < 400:
+            latencies.append(time.perf_counter() - tstart)
+        else:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+
+async def run_phase(base, names, weights, clients, duration, api_process, seed=0):
+    """Drive `names` (weighted, or a single one) from `clients` concurrent
+    clients for `duration` seconds; returns per-endpoint stats and totals."""
+    samples = {name: ([], {}) for name in names}
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        cpu_start = api_process.cpu_times()
+        tstart = time.perf_counter()
+        deadline = tstart + duration
+        await asyncio.gather(*(
+            _client(session, base, names, weights, deadline, samples, random.Random(seed + i))
+            for i in range(clients)))
+        elapsed = time.perf_counter() - tstart
+        cpu_end = api_process.cpu_times()
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    endpoints = {name: summarize(latencies, errors, elapsed) for name, (latencies, errors) in samples.items()}
+    all_latencies = [t for latencies, _ in samples.values() for t in latencies]
+    all_errors = {}
+    for _, errors in samples.values():
+        for key, count in errors.items():
+            all_errors[key] = all_errors.get(key, 0) + count
+    return {"endpoints": endpoints, "total": summarize(all_latencies, all_errors, elapsed, cpu_seconds)}
+
+
+def start_api(fake, port, workdir, sysid):
+    """The API as a subprocess connected to `fake`; output goes to workdir/api.log."""
+    command = [
+        sys.executable, "-m", "uav_api.run_api",
+        "--port", str(port),
+        "--sysid", str(sysid),
+        "--connection_type", "udpout",
+        "--uav_connection", "127.0.0.1:%d" % fake.port,
+        "--log_path", os.path.join(workdir, "api.log"),
+        "--script_logs", os.path.join(workdir, "script_logs"),
+        "--scripts_path", os.path.join(workdir, "scripts"),
+        "--param_cache", os.path.join(workdir, "param_cache"),
+    ]
+    out = open(os.path.join(workdir, "api.out"), "w")
+    return subprocess.Popen(command, stdout=out, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+
+
+async def wait_ready(base, process, timeout=30):
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"API exited during startup with code {process.returncode}")
+            try:
+                async with session.get(base + "/telemetry/gps") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready within %ss" % timeout)
+
+
+async def bench(args):
+    mix = parse_mix(args.mix) if args.mix else dict(BENCH_MIX)
+    names, weights = [], []
+    for name, endpoint in BENCH_ENDPOINTS.items():
+        share = mix.get(endpoint["category"], 0)
+        if share > 0:
+            in_category = sum(1 for e in BENCH_ENDPOINTS.values() if e["category"] == endpoint["category"])
+            names.append(name)
+            weights.append(share / in_category)
+
+    rates = {"GLOBAL_POSITION_INT": args.position_rate, "GPS_RAW_INT": args.position_rate}
+    port = args.port or _free_port()
+    base = "http://127.0.0.1:%d" % port
+    with tempfile.TemporaryDirectory(prefix="uav-api-bench-") as workdir, \
+            FakeAutopilot(sysid=args.sysid, rates=rates) as fake:
+        process = start_api(fake, port, workdir, args.sysid)
+        try:
+            await wait_ready(base, process)
+            api_process = psutil.Process(process.pid)
+            endpoints = {}
+            if args.endpoint_duration > 0:
+                for name in names:
+                    phase = await run_phase(base, [name], None, args.clients, args.endpoint_duration, api_process)
+                    endpoints[name] = phase["total"]
+            mixed = await run_phase(base, names, weights, args.clients, args.duration, api_process, seed=args.seed)
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    result = {
+        "uav_api": _version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "endpoint_duration": args.endpoint_duration,
+            "mix": mix,
+            "position_rate": args.position_rate,
+        },
+        "endpoints": endpoints,
+        "mix": mixed,
+    }
+    if args.budget:
+        with open(args.budget) as f:
+            result["violations"] = check_budgets(result, json.load(f))
+    return result
+
+
+def _version():
+    try:
+        from importlib.metadata import version
+        return version("uav_api")
+    except Exception:
+        return None
+
+
+def parse_bench_args(argv=None):
+    parser = argparse.ArgumentParser(prog="uav-api bench",
+                                     description="Load-test the API against a local fake autopilot and report JSON.")
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of the mixed phase")
+    parser.add_argument('--endpoint_duration', type=float, default=3.0,
+                        help="Seconds per endpoint in the isolated phase (0 skips it)")
+    parser.add_argument('--mix', default=None,
+                        help="Category weights, e.g. telemetry=70,movement=10,command=10,wait=10 (the default)")
+    parser.add_argument('--position_rate', type=float, default=10.0,
+                        help="GLOBAL_POSITION_INT/GPS_RAW_INT rate of the fake autopilot (Hz); paces the wait endpoints")
+    parser.add_argument('--sysid', type=int, default=1)
+    parser.add_argument('--port', type=int, default=None, help="API port (a free one by default)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', default=None, help="JSON file of per-endpoint limits; exit 1 when one is exceeded")
+    parser.add_argument('--output', default=None, help="Write the JSON result here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_bench_args(argv)
+    result = asyncio.run(bench(args))
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for violation in result.get("violations", []):
+        print("BUDGET EXCEEDED: %(endpoint)s %(metric)s=%(value)s (budget %(budget)s)" % violation, file=sys.stderr)
+    return 1 if result.get("violations") else 0
@@ -0,0 +1,35 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class Mission_item(BaseModel):
+    command: int = Field(16, description="MAV_CMD, default MAV_CMD_NAV_WAYPOINT")
+    frame: int = Field(3, description="MAV_FRAME, default MAV_FRAME_GLOBAL_RELATIVE_ALT")
+    lat: float = 0.0
+    long: float = 0.0
+    alt: float = 0.0
+    param1: float = 0.0
+    param2: float = 0.0
+    param3: float = 0.0
+    param4: float = 0.0
+    autocontinue: bool = True
+
+
+class Mission(BaseModel):
+    items: list[Mission_item]
+
+
+class Survey_vertex(BaseModel):
+    lat: float
+    long: float
+
+
+class Survey(BaseModel):
+    polygon: list[Survey_vertex] = Field(..., min_length=3)
+    spacing: float = Field(..., gt=0, description="Distance between survey lines (m)")
+    alt: float = Field(..., gt=0, description="Survey altitude above home (m)")
+    heading: float = Field(0.0, description="Direction of the survey lines, degrees clockwise from north")
+    overshoot: float = Field(0.0, ge=0, description="Line extension past the polygon at each end, for the turn (m)")
+    takeoff_alt: Optional[float] = Field(None, gt=0, description="Takeoff altitude above home (m), default alt")
+    rtl: bool = Field(True, description="End the mission with RETURN_TO_LAUNCH")
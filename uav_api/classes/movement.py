@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Optional, Union
+
+from pydantic import BaseModel, Field
 
 class Gps_pos(BaseModel):
     lat: float
@@ -16,4 +18,27 @@ class Local_velocity(BaseModel):
     vx: float
     vy: float
     vz: float
-    look_at_target: bool = False
\ No newline at end of file
+    look_at_target: bool = False
+
+class Target_queue(BaseModel):
+    targets: list[Union[Local_pos, Gps_pos]] = Field(..., min_length=1, description="NED (x, y, z) or GPS (lat, long, alt) targets, flown in order")
+    accuracy: Optional[float] = Field(None, gt=0, description="Arrival distance in metres (default 1)")
+
+class Trajectory_sample(BaseModel):
+    t: float = Field(..., description="Seconds, relative to the first sample")
+    x: float
+    y: float
+    z: float
+    vx: Optional[float] = None
+    vy: Optional[float] = None
+    vz: Optional[float] = None
+    ax: Optional[float] = None
+    ay: Optional[float] = None
+    az: Optional[float] = None
+    yaw: Optional[float] = Field(None, description="Degrees")
+
+class Trajectory_plan(BaseModel):
+    samples: list[Trajectory_sample] = Field(..., min_length=2, description="LOCAL_NED samples in time order")
+    rate: float = Field(20.0, ge=1, le=50, description="Setpoints per second")
+    deadline: Optional[float] = Field(None, gt=0, description="Seconds after which a still running trajectory is stopped")
+    replace: bool = Field(True, description="Replace a running trajectory instead of answering 409")
@@ -48,9 +48,13 @@ async def send_location_to_gradys_gs(uav, session, api_port, gradys_gs_address):
             # Fetch location from Gradys Ground Station
             try:
                 _logger.info("Fetching location for Gradys GS...")
-                location = uav.get_gps_info()
-                general_info = uav.get_general_info()
-                battery_info = uav.get_battery_info()
+                # One consistent cache read for every field of the update
+                _, messages = uav.snapshot(("GLOBAL_POSITION_INT", "VFR_HUD", "SYS_STATUS"))
+                location = messages["GLOBAL_POSITION_INT"]
+                general_info = messages["VFR_HUD"]
+                sys_status = messages["SYS_STATUS"]
+                if location is None or general_info is None or sys_status is None:
+                    raise ValueError("telemetry not received yet")
             except Exception:
                 _logger.warning("Failed to fetch location")
                 continue
@@ -63,7 +67,7 @@ async def send_location_to_gradys_gs(uav, session, api_port, gradys_gs_address):
                 "ground_speed": str(general_info.groundspeed),
                 "air_speed": str(general_info.airspeed),
                 "heading": str(general_info.heading),
-                "battery_percent": str(battery_info["battery_remaining"]),
+                "battery_percent": str(sys_status.battery_remaining),
                 "ready_to_arm": uav.sensor_has_state_cached(mavutil.mavlink.MAV_SYS_STATUS_PREARM_CHECK, True, True, True),
                 "device": "uav",
                 "type": 102, # Internal UAV location update message type,
@@ -8,7 +8,10 @@ import subprocess
 from datetime import datetime
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from uav_api.routers.dependencies import get_args, init_copter, init_plane, get_scripts_table
+from uav_api.args import parse_message_rates
+from uav_api.routers.dependencies import get_args, init_copter, init_plane, get_scripts_table, stop_trajectory_streamer
+from uav_api.vehicles.recorder import TlogRecorder
+from uav_api.vehicles.replay import REPLAY_PREFIX
 from uav_api.gradys_gs import send_location_to_gradys_gs
 from uav_api.log import set_log_config
 
@@ -164,19 +167,39 @@ async def lifespan(app: FastAPI):
             raise RuntimeError("SITL failed to initialize")
 
     conn = args.uav_connection if args.connection_type == "usb" else f"{args.connection_type}:{args.uav_connection}"
+    if args.uav_connection.startswith(REPLAY_PREFIX):
+        conn = args.uav_connection
 
     try:
         logger.info("Connecting to vehicle...")
+        message_rates = parse_message_rates(args.message_rates)
+        replay_speed = float(args.replay_speed)
+        tx_rate_limit = float(args.tx_rate_limit) if args.tx_rate_limit else None
         if args.vehicle == "plane":
-            vehicle = init_plane(args.sysid, conn)
+            vehicle = init_plane(args.sysid, conn, message_rates, replay_speed, tx_rate_limit)
         else:
-            vehicle = init_copter(args.sysid, conn)
+            vehicle = init_copter(args.sysid, conn, message_rates, replay_speed, tx_rate_limit)
         logger.info("Vehicle connection established.")
     except Exception as e:
         logger.error(f"Failed to connect to vehicle on {conn}: {e}")
         cleanup_partial_startup(sitl_tag, args)
         raise
 
+    # A replayed log cannot answer parameter requests; its PARAM_VALUEs still
+    # fill the table as they play.
+    if not args.no_param_sync and not args.uav_connection.startswith(REPLAY_PREFIX):
+        logger.info(f"Starting parameter sync (cache in {args.param_cache})...")
+        vehicle.start_param_sync(args.param_cache)
+
+    if args.tlog:
+        logger.info(f"Starting tlog recorder in {args.tlog_path}...")
+        vehicle.start_recording(TlogRecorder(
+            args.tlog_path,
+            prefix=f"uav_{args.sysid}",
+            max_bytes=int(args.tlog_max_mb) * 1024 * 1024,
+            compress=args.tlog_compress,
+        ))
+
 
     # Scripts watcher (copter only — mission router is not registered for plane)
     scripts_watcher_task = None
@@ -222,6 +245,9 @@ async def lifespan(app: FastAPI):
         await session.close()
         logger.info("Gradys GS HTTP session closed.")
 
+    # A trajectory must not outlive the link it streams over.
+    stop_trajectory_streamer()
+
     # Stop the MAVLink receiver thread and unblock any in-flight request
     # handlers before tearing the link (and SITL) down.
     logger.info("Closing MAVLink connection...")
@@ -0,0 +1,364 @@
+"""Prometheus text-exposition metrics for the MAVLink and HTTP hot paths.
+
+No client library: the few instruments needed here are small enough to keep
+in-process and render on demand. Hot-path updates are a dict lookup and a
+couple of integer increments; a scrape walks a few dozen entries, so
+scraping every few seconds costs nothing measurable on the companion
+computer.
+"""
+
+import bisect
+import collections
+import math
+import threading
+import time
+
+from pymavlink import mavutil
+
+# Seconds; HTTP handlers and COMMAND_ACK round trips.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; time an outgoing MAVLink message spends queued for the transmitter.
+QUEUE_WAIT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is safe from any thread."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self):
+        """(cumulative counts per bucket incl. +Inf, sum, count)."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class RxStats:
+    """Per-type receive counts and rate estimates. Written by the receiver
+    thread only (record() is a dict lookup and three list stores)."""
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.types = {}  # type -> [count, last monotonic, smoothed interval]
+
+    def record(self, mtype, now):
+        entry = self.types.get(mtype)
+        if entry is None:
+            self.types[mtype] = [1, now, None]
+            return
+        entry[0] += 1
+        interval = now - entry[1]
+        entry[1] = now
+        entry[2] = interval if entry[2] is None else entry[2] + self.smoothing * (interval - entry[2])
+
+    def count(self, mtype):
+        entry = self.types.get(mtype)
+        return 0 if entry is None else entry[0]
+
+    def rates(self, now):
+        """{type: (count, Hz)}; a type that went quiet decays towards 0."""
+        out = {}
+        for mtype, (count, last, interval) in dict(self.types).items():
+            if interval is None or interval <= 0:
+                out[mtype] = (count, 0.0)
+            else:
+                out[mtype] = (count, 1.0 / max(interval, now - last))
+        return out
+
+
+def _enum_name(enum, value):
+    entry = mavutil.mavlink.enums[enum].get(value)
+    return entry.name if entry is not None else str(value)
+
+
+def command_name(command):
+    return _enum_name("MAV_CMD", command)
+
+
+def result_name(result):
+    return _enum_name("MAV_RESULT", result).replace("MAV_RESULT_", "")
+
+
+class _CommandEntry:
+    def __init__(self, buckets, window):
+        self.latency = Histogram(buckets)
+        self.recent = collections.deque(maxlen=window)
+        self.results = {}
+        self.timeouts = 0
+
+
+class CommandStats:
+    """Per-MAV_CMD COMMAND_ACK round trips, result codes and timeouts.
+
+    Each command keeps a histogram for /metrics plus its last `window` round
+    trips, from which report() gives exact percentiles: what a per-command
+    timeout should be set from, and (compared across commands on the same
+    link) whether the radio or the autopilot is the slow part."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=256):
+        self.buckets = buckets
+        self.window = window
+        self.commands = {}  # MAV_CMD id -> _CommandEntry
+        self._lock = threading.Lock()
+
+    def _entry(self, command):
+        entry = self.commands.get(command)
+        if entry is None:
+            with self._lock:
+                entry = self.commands.setdefault(command, _CommandEntry(self.buckets, self.window))
+        return entry
+
+    def record_ack(self, command, result, seconds):
+        entry = self._entry(command)
+        entry.latency.observe(seconds)
+        with self._lock:
+            entry.recent.append(seconds)
+            entry.results[result] = entry.results.get(result, 0) + 1
+
+    def record_timeout(self, command):
+        entry = self._entry(command)
+        with self._lock:
+            entry.timeouts += 1
+
+    def report(self):
+        """{command name: {acks, timeouts, results, p50_s, p95_s, p99_s, max_s}};
+        the percentiles cover the last `window` acks."""
+        out = {}
+        with self._lock:
+            snapshot = [(command, sorted(entry.recent), dict(entry.results), entry.timeouts)
+                        for command, entry in self.commands.items()]
+        for command, recent, results, timeouts in sorted(snapshot):
+
+            def pct(q):
+                if not recent:
+                    return None
+                return round(recent[min(len(recent) - 1, int(round(q * (len(recent) - 1))))], 4)
+
+            out[command_name(command)] = {
+                "acks": sum(results.values()),
+                "timeouts": timeouts,
+                "results": {result_name(result): count for result, count in sorted(results.items())},
+                "p50_s": pct(0.50),
+                "p95_s": pct(0.95),
+                "p99_s": pct(0.99),
+                "max_s": round(recent[-1], 4) if recent else None,
+            }
+        return out
+
+
+class HttpMetrics:
+    """Per-route request latency and status counts, fed by MetricsMiddleware."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.latency = {}  # (method, route) -> Histogram
+        self.responses = {}  # (method, route, status) -> count
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, status, seconds):
+        key = (method, route)
+        histogram = self.latency.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.latency.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+        with self._lock:
+            rkey = (method, route, status)
+            self.responses[rkey] = self.responses.get(rkey, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.latency = {}
+            self.responses = {}
+
+
+http_metrics = HttpMetrics()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request up to its response start.
+
+    Timing stops at http.response.start so a streaming endpoint (SSE) counts
+    its time to first byte, not its lifetime. The label is the matched route
+    template (/telemetry/gps), never the raw path, so cardinality stays
+    bounded; unmatched requests share the label "unmatched"."""
+
+    def __init__(self, app, metrics=http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tstart = time.perf_counter()
+        observed = False
+
+        async def timed_send(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                route = scope.get("route")
+                self.metrics.observe(scope["method"], getattr(route, "path", "unmatched"),
+                                     str(message["status"]), time.perf_counter() - tstart)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+########################################################################################################################
+# Text exposition ######################################################################################################
+########################################################################################################################
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsWriter:
+    def __init__(self):
+        self.lines = []
+
+    def header(self, name, kind, text):
+        self.lines.append("# HELP %s %s" % (name, text))
+        self.lines.append("# TYPE %s %s" % (name, kind))
+
+    def sample(self, name, value, labels=None):
+        if labels:
+            label_text = ",".join('%s="%s"' % (k, _escape(v)) for k, v in labels.items())
+            self.lines.append("%s{%s} %s" % (name, label_text, _format(value)))
+        else:
+            self.lines.append("%s %s" % (name, _format(value)))
+
+    def histogram(self, name, histogram, labels=None):
+        labels = labels or {}
+        cumulative, total, count = histogram.snapshot()
+        for bound, c in zip(histogram.buckets, cumulative):
+            self.sample(name + "_bucket", c, {**labels, "le": repr(float(bound))})
+        self.sample(name + "_bucket", count, {**labels, "le": "+Inf"})
+        self.sample(name + "_sum", total, labels)
+        self.sample(name + "_count", count, labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def write_vehicle_metrics(w, vehicle):
+    now = time.monotonic()
+    rates = vehicle.rx_stats.rates(now)
+    w.header("uav_mavlink_rx_messages_total", "counter", "MAVLink messages parsed by the receiver, per type")
+    for mtype, (count, _) in sorted(rates.items()):
+        w.sample("uav_mavlink_rx_messages_total", count, {"type": mtype})
+    w.header("uav_mavlink_rx_rate_hz", "gauge", "Smoothed receive rate per message type")
+    for mtype, (_, rate) in sorted(rates.items()):
+        w.sample("uav_mavlink_rx_rate_hz", round(rate, 3), {"type": mtype})
+    w.header("uav_mavlink_bad_data_total", "counter", "Unparseable MAVLink data (BAD_DATA)")
+    w.sample("uav_mavlink_bad_data_total", vehicle.rx_stats.count("BAD_DATA"))
+    w.header("uav_mavlink_last_rx_age_seconds", "gauge", "Seconds since the receiver last parsed a message")
+    last = vehicle._last_rx_monotonic
+    w.sample("uav_mavlink_last_rx_age_seconds", None if last is None else round(now - last, 3))
+    w.header("uav_mavlink_receiver_up", "gauge", "1 while the receiver thread is running")
+    w.sample("uav_mavlink_receiver_up", int(vehicle._rx_thread is not None and vehicle._rx_thread.is_alive()))
+
+    subs = vehicle._subs
+    by_types = {}
+    for sub in subs:
+        entry = by_types.setdefault(sub._describe(), [0, 0])
+        entry[0] += 1
+        entry[1] += sub.dropped
+    w.header("uav_subscriptions", "gauge", "Live message subscriptions, by subscribed types")
+    for types, (count, _) in sorted(by_types.items()):
+        w.sample("uav_subscriptions", count, {"types": types})
+    w.header("uav_subscription_dropped", "gauge", "Messages dropped by live subscriptions (drop-oldest), by subscribed types")
+    for types, (_, dropped) in sorted(by_types.items()):
+        w.sample("uav_subscription_dropped", dropped, {"types": types})
+    w.header("uav_subscription_dropped_total", "counter", "Messages dropped by all subscriptions, live and closed")
+    w.sample("uav_subscription_dropped_total", vehicle.closed_sub_dropped + sum(d for _, d in by_types.values()))
+
+    if vehicle.transmitter is not None:
+        write_transmitter_metrics(w, vehicle.transmitter)
+    write_command_metrics(w, vehicle.command_stats)
+
+    recorder = vehicle.recorder
+    if recorder is not None:
+        w.header("uav_tlog_records_total", "counter", "Messages written by the tlog recorder")
+        w.sample("uav_tlog_records_total", recorder.records)
+        w.header("uav_tlog_dropped_total", "counter", "Messages the tlog recorder dropped because its queue was full")
+        w.sample("uav_tlog_dropped_total", recorder.dropped)
+
+
+def write_transmitter_metrics(w, tx):
+    queued = tx.queued()
+    w.header("uav_mavlink_tx_messages_total", "counter", "MAVLink messages written, per priority class")
+    for i, name in enumerate(tx.CLASSES):
+        w.sample("uav_mavlink_tx_messages_total", tx.sent[i], {"class": name})
+    w.header("uav_mavlink_tx_bytes_total", "counter", "MAVLink bytes written, per priority class")
+    for i, name in enumerate(tx.CLASSES):
+        w.sample("uav_mavlink_tx_bytes_total", tx.bytes_sent[i], {"class": name})
+    w.header("uav_mavlink_tx_coalesced_total", "counter", "Queued setpoints replaced by a newer one of the same kind")
+    for i, name in enumerate(tx.CLASSES):
+        w.sample("uav_mavlink_tx_coalesced_total", tx.coalesced[i], {"class": name})
+    w.header("uav_mavlink_tx_queued", "gauge", "MAVLink messages waiting for the transmitter, per priority class")
+    for i, name in enumerate(tx.CLASSES):
+        w.sample("uav_mavlink_tx_queued", queued[i], {"class": name})
+    w.header("uav_mavlink_tx_queue_seconds", "histogram", "Time from send to write, per priority class")
+    for i, name in enumerate(tx.CLASSES):
+        w.histogram("uav_mavlink_tx_queue_seconds", tx.queue_wait[i], {"class": name})
+    w.header("uav_mavlink_tx_errors_total", "counter", "MAVLink writes that raised")
+    w.sample("uav_mavlink_tx_errors_total", tx.errors)
+
+
+def write_command_metrics(w, stats):
+    with stats._lock:
+        entries = sorted((command_name(command), entry, dict(entry.results), entry.timeouts)
+                         for command, entry in stats.commands.items())
+    w.header("uav_command_ack_seconds", "histogram", "COMMAND_LONG/COMMAND_INT to COMMAND_ACK round trip, per command")
+    for name, entry, _, _ in entries:
+        w.histogram("uav_command_ack_seconds", entry.latency, {"command": name})
+    w.header("uav_command_results_total", "counter", "COMMAND_ACK results, per command")
+    for name, _, results, _ in entries:
+        for result, count in sorted(results.items()):
+            w.sample("uav_command_results_total", count, {"command": name, "result": result_name(result)})
+    w.header("uav_command_timeouts_total", "counter", "Commands that got no COMMAND_ACK in time, per command")
+    for name, _, _, timeouts in entries:
+        w.sample("uav_command_timeouts_total", timeouts, {"command": name})
+
+
+def write_http_metrics(w, metrics=http_metrics):
+    w.header("uav_http_request_duration_seconds", "histogram", "HTTP handler latency up to response start, per route")
+    for (method, route), histogram in sorted(dict(metrics.latency).items()):
+        w.histogram("uav_http_request_duration_seconds", histogram, {"method": method, "route": route})
+    w.header("uav_http_responses_total", "counter", "HTTP responses per route and status")
+    for (method, route, status), count in sorted(dict(metrics.responses).items()):
+        w.sample("uav_http_responses_total", count, {"method": method, "route": route, "status": status})
+
+
+def render_metrics(vehicle, metrics=http_metrics):
+    w = MetricsWriter()
+    write_vehicle_metrics(w, vehicle)
+    write_http_metrics(w, metrics)
+    return w.text()
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from uav_api.metrics import CONTENT_TYPE, render_metrics
+from uav_api.routers.dependencies import get_vehicle_instance
+from uav_api.vehicles.vehicle import Vehicle
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+
+# async: rendering only reads counters, so it runs on the event loop rather
+# than in a threadpool worker. get_vehicle_instance is a sync dependency and
+# is still resolved in the threadpool.
+@router.get("/metrics", tags=["metrics"], summary="Prometheus metrics of the MAVLink link and the HTTP API",
+            response_class=PlainTextResponse)
+async def metrics(uav: Vehicle = Depends(get_vehicle_instance)):
+    return PlainTextResponse(render_metrics(uav), media_type=CONTENT_TYPE)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+from argparse import Namespace
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pymavlink import mavutil
+
+from uav_api.classes.mission import Mission, Survey
+from uav_api.routers.dependencies import get_args, get_vehicle_instance
+from uav_api.vehicles.vehicle import TimeoutException, Vehicle
+
+router = APIRouter(
+    prefix="/mission",
+    tags=["mission"],
+)
+
+# Minimum seconds between two SSE progress events; the final one is always sent.
+PROGRESS_INTERVAL = 0.1
+
+
+def _mission_items(mission):
+    return [mavutil.mavlink.MAVLink_mission_item_int_message(
+        0, 0, seq, item.frame, item.command, 0, int(item.autocontinue),
+        item.param1, item.param2, item.param3, item.param4,
+        int(round(item.lat * 1.0e7)), int(round(item.long * 1.0e7)), item.alt)
+        for seq, item in enumerate(mission.items)]
+
+
+def _item_info(wp):
+    """A downloaded MISSION_ITEM in the shape POST /mission/items takes."""
+    return {"seq": wp.seq, "command": wp.command, "frame": wp.frame, "lat": wp.x, "long": wp.y, "alt": wp.z,
+            "param1": wp.param1, "param2": wp.param2, "param3": wp.param3, "param4": wp.param4,
+            "autocontinue": bool(wp.autocontinue), "current": bool(wp.current)}
+
+
+def _error(e):
+    """(status, detail): 504 when the autopilot stopped answering, 500 when it
+    rejected the mission or the upload failed otherwise."""
+    return (504 if isinstance(e, TimeoutException) else 500), f"UPLOAD_MISSION FAIL: {e}"
+
+
+@router.get("/items", tags=["mission"], summary="Downloads the autopilot's current mission")
+def download_mission(window: Optional[int] = Query(None, ge=1, le=64, description="Item requests kept in flight"),
+                     uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    try:
+        result = uav.download_mission(window=window)
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"DOWNLOAD_MISSION FAIL: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DOWNLOAD_MISSION FAIL: {e}")
+    result["items"] = [_item_info(wp) for wp in result["items"]]
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": result}
+
+
+@router.post("/items", tags=["mission"], summary="Uploads a mission to the autopilot and returns once it acknowledged every item")
+async def upload_mission(mission: Mission,
+                         window: Optional[int] = Query(None, ge=1, le=64, description="Items sent ahead of the autopilot's requests"),
+                         stream: bool = Query(False, description="Answer with Server-Sent Events: progress while uploading, then the result"),
+                         incremental: bool = Query(True, description="Send only the items that differ from the last mission uploaded or downloaded"),
+                         uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    items = _mission_items(mission)
+    upload = uav.update_mission if incremental else uav.upload_mission
+    if not stream:
+        try:
+            result = await asyncio.to_thread(upload, items, window=window)
+        except Exception as e:
+            status, detail = _error(e)
+            raise HTTPException(status_code=status, detail=detail)
+        return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": result}
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    last_progress = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if done < total and now - last_progress[0] < PROGRESS_INTERVAL:
+            return
+        last_progress[0] = now
+        loop.call_soon_threadsafe(events.put_nowait, ("progress", {"done": done, "total": total}))
+
+    def run():
+        try:
+            result = upload(items, window=window, progress=progress)
+        except Exception as e:
+            status, detail = _error(e)
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"status": status, "detail": detail}))
+            return
+        loop.call_soon_threadsafe(events.put_nowait, ("result", {
+            "device": "uav", "id": str(args.sysid), "result": "Success", "info": result}))
+
+    async def sse():
+        task = asyncio.create_task(asyncio.to_thread(run))
+        try:
+            while True:
+                event, data = await events.get()
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event != "progress":
+                    break
+        finally:
+            await task
+
+    return StreamingResponse(sse(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/survey", tags=["mission"], summary="Plans a lawnmower survey of a polygon and uploads it as the AUTO mission")
+def upload_survey(survey: Survey,
+                  window: Optional[int] = Query(None, ge=1, le=64, description="Items sent ahead of the autopilot's requests"),
+                  uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    polygon = [(vertex.lat, vertex.long) for vertex in survey.polygon]
+    try:
+        items, result = uav.load_survey(polygon, survey.spacing, survey.alt, heading=survey.heading,
+                                        overshoot=survey.overshoot, takeoff_alt=survey.takeoff_alt, rtl=survey.rtl)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"SURVEY FAIL: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SURVEY FAIL: {e}")
+    if result["waypoints"] == 0:
+        raise HTTPException(status_code=400, detail="SURVEY FAIL: The polygon has no inside to cover")
+    try:
+        result["upload"] = uav.update_mission(items, window=window)
+    except Exception as e:
+        status, detail = _error(e)
+        raise HTTPException(status_code=status, detail=detail)
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": result}
@@ -0,0 +1,84 @@
+import threading
+import time
+from argparse import Namespace
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+
+from uav_api.routers.dependencies import get_args, get_vehicle_instance
+from uav_api.vehicles.params import parse_param_file
+from uav_api.vehicles.vehicle import NotAchievedException, Vehicle
+
+router = APIRouter(
+    prefix="/params",
+    tags=["params"],
+)
+
+# Seconds to wait for the autopilot when a parameter is not in the table yet.
+DIRECT_READ_TIMEOUT = 5
+
+# One apply at a time; GET /params/apply reports on the running or last one.
+_apply_lock = threading.Lock()
+_apply_state = {"running": False, "done": 0, "total": 0, "started": None, "finished": None, "result": None}
+
+
+@router.get("", tags=["params"], summary="Returns the parameter table (optionally only names starting with a prefix) and its sync state")
+async def list_params(prefix: str = Query("", description="Only parameters whose name starts with this, e.g. WPNAV_"),
+                      uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    table = uav.param_table
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "table": table.info(),
+            "info": table.with_prefix(prefix.upper())}
+
+
+@router.get("/apply", tags=["params"], summary="Returns the progress of the running parameter apply, or the result of the last one")
+async def apply_status(args: Namespace = Depends(get_args)):
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": dict(_apply_state)}
+
+
+@router.post("/apply", tags=["params"], summary="Sets every parameter in a .param file and returns what changed")
+def apply_params(file: UploadFile = File(..., description=".param file, one NAME VALUE (or NAME,VALUE) per line"),
+                 window: int = Query(16, ge=1, le=64, description="PARAM_SETs kept in flight"),
+                 uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    try:
+        parameters = parse_param_file(file.file.read().decode("utf-8", errors="replace"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not _apply_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A parameter apply is already running")
+    try:
+        _apply_state.update(running=True, done=0, total=len(parameters), started=time.time(), finished=None,
+                            result=None)
+
+        def progress(done, total):
+            _apply_state.update(done=done, total=total)
+
+        try:
+            result = uav.apply_parameters(parameters, window=window, progress=progress)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"APPLY_PARAMS FAIL: {e}")
+        _apply_state["result"] = result
+        return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": result}
+    finally:
+        _apply_state.update(running=False, finished=time.time())
+        _apply_lock.release()
+
+
+@router.get("/{name}", tags=["params"], summary="Returns one parameter's value, MAV_PARAM_TYPE and index")
+def get_param(name: str, uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    name = name.upper()
+    table = uav.param_table
+    entry = table.get(name)
+    if (entry is None and not table.complete) or (table.source == "cache" and not table.verified):
+        # Still syncing, or serving a cache not yet refreshed: ask the
+        # autopilot; the reply lands in the table.
+        try:
+            uav.get_parameter_direct(name, timeout=DIRECT_READ_TIMEOUT, verbose=False)
+        except NotAchievedException:
+            pass
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"GET_PARAM FAIL: {e}")
+        entry = table.get(name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Parameter {name} not found")
+    value, param_type, index = entry
+    return {"device": "uav", "id": str(args.sysid), "result": "Success",
+            "info": {"name": name, "value": value, "type": param_type, "index": index}}
@@ -0,0 +1,136 @@
+import time
+from argparse import Namespace
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+
+from uav_api.routers import formatters
+from uav_api.routers.dependencies import get_args, get_vehicle_instance
+from uav_api.vehicles.history import HISTORY_FIELDS
+from uav_api.vehicles.vehicle import Vehicle, message_id
+
+router = APIRouter(
+    prefix="/telemetry",
+    tags=["telemetry"],
+)
+
+# Snapshot field -> (MAVLink type, info formatter). battery and sensors both
+# come from SYS_STATUS, so they always share an age. Vehicle.snapshot()
+# answers HEARTBEAT with the autopilot's own, not the last from any source.
+SNAPSHOT_FIELDS = {
+    "gps": ("GLOBAL_POSITION_INT", formatters.gps_info),
+    "ned": ("LOCAL_POSITION_NED", formatters.ned_info),
+    "general": ("VFR_HUD", formatters.general_info),
+    "battery": ("SYS_STATUS", formatters.battery_info),
+    "sensors": ("SYS_STATUS", formatters.sensor_status),
+    "state": ("HEARTBEAT", formatters.state_info),
+}
+
+
+def build_snapshot(uav):
+    """Every SNAPSHOT_FIELDS entry as {"age", "info"}, from one cache read.
+
+    A type that was never received yields {"age": None, "info": None}."""
+    now, messages = uav.snapshot({mtype for mtype, _ in SNAPSHOT_FIELDS.values()})
+    fields = {}
+    for name, (mtype, formatter) in SNAPSHOT_FIELDS.items():
+        m = messages[mtype]
+        if m is None:
+            fields[name] = {"age": None, "info": None}
+        else:
+            fields[name] = {"age": now - m._timestamp, "info": formatter(m)}
+    return now, fields
+
+
+@router.get("/snapshot", tags=["telemetry"], summary="Returns position, NED, VFR_HUD, battery, sensor health, mode and armed state in one response, each with its cache age in seconds")
+def snapshot(uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    try:
+        now, fields = build_snapshot(uav)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"GET_SNAPSHOT FAIL: {e}")
+    return {
+        "device": "uav",
+        "id": str(args.sysid),
+        "result": "Success",
+        "timestamp": now,
+        "info": fields,
+    }
+
+
+@router.get("/history", tags=["telemetry"], summary="Returns recorded samples of one message type in a time window, as columns in converted units")
+def history(message: str = Query(..., alias="type", description=f"One of {', '.join(HISTORY_FIELDS)}"),
+            since: Optional[float] = Query(None, description="Window start: a receive timestamp, or a negative number of seconds before now"),
+            until: Optional[float] = Query(None, description="Window end (receive timestamp); omit for the latest sample"),
+            step: Optional[float] = Query(None, gt=0, description="Thin the result to about one sample per this many seconds"),
+            uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    mtype = message.upper()
+    if mtype not in HISTORY_FIELDS:
+        raise HTTPException(status_code=400, detail=f"No history for {message}. Recorded: {', '.join(HISTORY_FIELDS)}")
+    if since is not None and since < 0:
+        since = time.time() + since
+    try:
+        columns = uav.history.buffers[mtype].query(since=since, until=until, step=step)
+        units = uav.history.units(mtype)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"GET_HISTORY FAIL: {e}")
+    return {
+        "device": "uav",
+        "id": str(args.sysid),
+        "result": "Success",
+        "type": mtype,
+        "count": len(columns["time"]),
+        "units": units,
+        "columns": columns,
+    }
+
+
+@router.get("/recorder", tags=["telemetry"], summary="Returns the tlog recorder state: current file, records written and records dropped")
+def recorder(uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    info = uav.recorder.stats() if uav.recorder is not None else {"recording": False}
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": info}
+
+
+@router.get("/command_stats", tags=["telemetry"], summary="Returns COMMAND_ACK round-trip percentiles, result counts and timeouts per MAV_CMD")
+def command_stats(uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": uav.command_stats.report()}
+
+
+def _check_message_rates(rates):
+    """400 for an unknown message name or a rate that is neither >0, 0 nor -1."""
+    for name, rate in rates.items():
+        try:
+            message_id(name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if rate < 0 and rate != -1:
+            raise HTTPException(status_code=400, detail=f"Invalid rate {rate} for {name}: use Hz > 0, 0 for the default rate or -1 to disable")
+
+
+@router.get("/message_rates", tags=["telemetry"], summary="Returns the rate (Hz) the autopilot reports for each message, read with MAV_CMD_GET_MESSAGE_INTERVAL")
+def message_rates(messages: Optional[list[str]] = Query(None, description="Message names; defaults to every message given a rate so far"),
+                  uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    names = [name.upper() for name in messages] if messages else list(uav.message_rates)
+    _check_message_rates({name: 0 for name in names})
+    try:
+        rates = {name: uav.send_get_message_interval(name) for name in names}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"GET_MESSAGE_RATES FAIL: {e}")
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": rates}
+
+
+@router.post("/message_rates", tags=["telemetry"], summary="Sets per-message stream rates in Hz (0 restores the default, -1 disables) and reports the rate each message actually got")
+def set_message_rates(rates: Dict[str, float] = Body(..., examples=[{"GLOBAL_POSITION_INT": 20, "ATTITUDE": 10, "SYS_STATUS": 1}]),
+                      uav: Vehicle = Depends(get_vehicle_instance), args: Namespace = Depends(get_args)):
+    rates = {name.upper(): rate for name, rate in rates.items()}
+    _check_message_rates(rates)
+    try:
+        report = uav.apply_message_rates(rates)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"SET_MESSAGE_RATES FAIL: {e}")
+    failed = [name for name, entry in report.items() if entry["error"] is not None]
+    return {
+        "device": "uav",
+        "id": str(args.sysid),
+        "result": "Success" if not failed else f"Not applied: {', '.join(failed)}",
+        "info": report,
+    }
@@ -0,0 +1,135 @@
+import json
+import math
+from argparse import Namespace
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from uav_api.routers import formatters
+from uav_api.routers.dependencies import get_args, get_vehicle_instance
+from uav_api.vehicles.vehicle import LinkDownException, TimeoutException, Vehicle
+
+router = APIRouter(
+    prefix="/telemetry",
+    tags=["telemetry"],
+)
+
+# Stream name -> (MAVLink type, info formatter). Names and info shapes match
+# the GET /telemetry/<name> endpoints.
+STREAMS = {
+    "gps": ("GLOBAL_POSITION_INT", formatters.gps_info),
+    "ned": ("LOCAL_POSITION_NED", formatters.ned_info),
+    "general": ("VFR_HUD", formatters.general_info),
+    "sys_status": ("SYS_STATUS", formatters.sys_status_info),
+}
+_STREAM_NAMES = {mtype: name for name, (mtype, _) in STREAMS.items()}
+
+# Per-client queue depth. A client that falls further behind than this loses
+# its OLDEST samples (drop-oldest): it always resumes on fresh data.
+STREAM_BUFFER = 8
+# Idle interval after which an SSE comment is sent so proxies keep the
+# connection open while the link is quiet.
+KEEPALIVE_S = 15.0
+
+
+class _Decimator:
+    """Subscription predicate limiting each message type to `rate` samples/s.
+
+    Runs on the receiver thread, so samples the client would discard never
+    reach the event loop. Accepts a sample once 90% of the period has passed,
+    so jitter in the autopilot's stream does not halve a matching rate."""
+
+    def __init__(self, rate):
+        self.min_gap = 0.9 / rate if rate else 0.0
+        self.last = {}
+
+    def __call__(self, m):
+        if not self.min_gap:
+            return True
+        mtype = m.get_type()
+        if m._timestamp - self.last.get(mtype, -math.inf) < self.min_gap:
+            return False
+        self.last[mtype] = m._timestamp
+        return True
+
+
+def _unknown_streams(types):
+    return sorted(set(types) - set(STREAMS))
+
+
+def _sample(m, sysid):
+    name = _STREAM_NAMES[m.get_type()]
+    return {
+        "device": "uav",
+        "id": str(sysid),
+        "type": name,
+        "timestamp": m._timestamp,
+        "info": STREAMS[name][1](m),
+    }
+
+
+async def _messages(uav, types, rate, count):
+    """Yield matching messages as the receiver parses them, or None after
+    KEEPALIVE_S of silence. Ends after `count` messages or when the link
+    goes down. A `rate` is also declared to the vehicle's rate arbiter, which
+    raises the autopilot's stream rate to match while the client is attached."""
+    sent = 0
+    try:
+        async with uav.subscribe_async(types={STREAMS[t][0] for t in types},
+                                       predicate=_Decimator(rate),
+                                       maxsize=STREAM_BUFFER,
+                                       rate=rate) as sub:
+            while count is None or sent < count:
+                try:
+                    m = await sub.get(timeout=KEEPALIVE_S)
+                except TimeoutException:
+                    yield None
+                    continue
+                sent += 1
+                yield m
+    except LinkDownException:
+        return
+
+
+@router.get("/stream", tags=["telemetry"], summary="Pushes telemetry samples as Server-Sent Events the moment they are received (also served as a WebSocket)")
+async def telemetry_stream(types: list[str] = Query(list(STREAMS), description="Streams to receive: gps, ned, general, sys_status"),
+                           rate: Optional[float] = Query(None, gt=0, description="Maximum samples per second per stream; omit for every sample"),
+                           count: Optional[int] = Query(None, ge=1, description="Close the stream after this many samples"),
+                           uav: Vehicle = Depends(get_vehicle_instance),
+                           args: Namespace = Depends(get_args)):
+    unknown = _unknown_streams(types)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown stream(s): {', '.join(unknown)}. Available: {', '.join(STREAMS)}")
+
+    async def events():
+        async for m in _messages(uav, types, rate, count):
+            if m is None:
+                yield ": keepalive\n\n"
+                continue
+            sample = _sample(m, args.sysid)
+            yield f"event: {sample['type']}\ndata: {json.dumps(sample)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@router.websocket("/stream")
+async def telemetry_stream_ws(websocket: WebSocket,
+                              types: list[str] = Query(list(STREAMS)),
+                              rate: Optional[float] = Query(None, gt=0),
+                              count: Optional[int] = Query(None, ge=1),
+                              uav: Vehicle = Depends(get_vehicle_instance),
+                              args: Namespace = Depends(get_args)):
+    unknown = _unknown_streams(types)
+    if unknown:
+        await websocket.close(code=1008, reason=f"Unknown stream(s): {', '.join(unknown)}")
+        return
+    await websocket.accept()
+    try:
+        async for m in _messages(uav, types, rate, count):
+            if m is not None:
+                await websocket.send_json(_sample(m, args.sysid))
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
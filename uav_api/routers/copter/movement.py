@@ -18,11 +18,11 @@ def go_to_gps(pos: Gps_pos, uav: Copter = Depends(get_copter_instance), args: Na
     return {"device": "uav", "id": str(args.sysid), "result": f"Going to coord ({pos.lat}, {pos.long}, {pos.alt})"}
 
 @router.post("/go_to_gps_wait", tags=["movement"], summary="Moves and waits for the copter to get to specified GPS position")
-def go_to_gps_wait(pos: Gps_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def go_to_gps_wait(pos: Gps_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
         uav.go_to_gps(pos.lat, pos.long, pos.alt, pos.look_at_target)
         target_loc = uav.mav_location(pos.lat, pos.long, pos.alt)
-        uav.wait_location(target_loc, timeout=60)
+        await uav.wait_location_async(target_loc, timeout=60)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GO_TO FAIL: {e}")
     return {"device": "uav", "id": str(args.sysid), "result": f"Arrived at coord ({pos.lat}, {pos.long}, {pos.alt})"}
@@ -36,10 +36,10 @@ def go_to_ned(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args:
     return {"device": "uav", "id": str(args.sysid), "result": f"Going to NED coord ({pos.x}, {pos.y}, {pos.z})"}
 
 @router.post("/go_to_ned_wait", tags=["movement"], summary="Moves and waits for the copter to get to specified NED position")
-def go_to_ned_wait(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def go_to_ned_wait(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
         uav.go_to_ned(pos.x, pos.y, pos.z, look_at_target=pos.look_at_target)
-        uav.wait_ned_position(pos)
+        await uav.wait_ned_position_async(pos)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GO_TO FAIL: {e}")
@@ -54,12 +54,12 @@ def drive(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args: Name
     return {"device": "uav", "id": str(args.sysid), "result": "Copter is driving"}
 
 @router.post("/drive_wait", tags=["movement"], summary="Drives and waits copter the specified amount in meters")
-def drive_wait(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def drive_wait(pos: Local_pos, uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
-        current_pos = uav.get_ned_position()
+        current_pos = await uav.get_ned_position_async()
         uav.drive_ned(pos.x, pos.y, pos.z, look_at_target=pos.look_at_target)
         target_pos = Local_pos(x=current_pos.x + pos.x, y=current_pos.y + pos.y, z=current_pos.z + pos.z)
-        uav.wait_ned_position(target_pos)
+        await uav.wait_ned_position_async(target_pos)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"DRIVE FAIL: {e}")
     return {"device": "uav", "id": str(args.sysid), "result": f"Copter arrived at ({target_pos.x}, {target_pos.y}, {target_pos.z})"}
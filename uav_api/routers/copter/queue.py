@@ -0,0 +1,45 @@
+from argparse import Namespace
+from fastapi import APIRouter, Depends, HTTPException
+from uav_api.classes.movement import Local_pos, Target_queue
+from uav_api.routers.dependencies import get_args, get_target_queue
+from uav_api.vehicles.target_queue import TargetQueue
+from uav_api.vehicles.vehicle import PreconditionFailedException
+
+router = APIRouter(
+    prefix = "/queue",
+    tags = ["queue"],
+)
+
+def _target(pos):
+    if isinstance(pos, Local_pos):
+        return {"frame": "ned", "x": pos.x, "y": pos.y, "z": pos.z, "look_at_target": pos.look_at_target}
+    return {"frame": "gps", "lat": pos.lat, "long": pos.long, "alt": pos.alt, "look_at_target": pos.look_at_target}
+
+@router.get("", tags=["queue"], summary="Returns the target being flown, the pending targets and the recently finished ones")
+def queue_status(queue: TargetQueue = Depends(get_target_queue), args: Namespace = Depends(get_args)):
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": queue.status()}
+
+@router.post("/targets", tags=["queue"], summary="Appends GUIDED targets; each is flown once the one before it is reached")
+def enqueue_targets(body: Target_queue, queue: TargetQueue = Depends(get_target_queue), args: Namespace = Depends(get_args)):
+    try:
+        ids = queue.enqueue([_target(pos) for pos in body.targets], accuracy=body.accuracy)
+    except PreconditionFailedException as e:
+        raise HTTPException(status_code=409, detail=f"QUEUE FAIL: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"QUEUE FAIL: {e}")
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": {"ids": ids, **queue.status()}}
+
+@router.post("/skip", tags=["queue"], summary="Abandons the current target and flies to the next one")
+def skip_target(queue: TargetQueue = Depends(get_target_queue), args: Namespace = Depends(get_args)):
+    try:
+        skipped = queue.skip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"QUEUE FAIL: {e}")
+    if skipped is None:
+        raise HTTPException(status_code=409, detail="QUEUE FAIL: No target is being flown")
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": {"skipped": skipped, **queue.status()}}
+
+@router.post("/clear", tags=["queue"], summary="Drops the current and pending targets; the copter keeps its last setpoint")
+def clear_queue(queue: TargetQueue = Depends(get_target_queue), args: Namespace = Depends(get_args)):
+    dropped = queue.clear()
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": {"dropped": dropped, **queue.status()}}
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from uav_api.vehicles.copter import Copter
+from uav_api.vehicles.vehicle import TimeoutException
 from uav_api.routers.dependencies import get_copter_instance, get_args
+from uav_api.routers import formatters
+from uav_api.routers.freshness import MaxAge, Since, Wait, read_message
+from uav_api.routers.response_cache import cached_response
 from argparse import Namespace
 router = APIRouter(
     prefix="/telemetry",
@@ -8,59 +12,49 @@ router = APIRouter(
 )
 
 @router.get("/general", tags=["telemetry"], summary="Returns Copter general information such as velocities, heading, throttle percentage and altitude")
-def general_info(uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def general_info(request: Request, since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                       uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_general_info()
+        info = await read_message(uav, "VFR_HUD", uav.get_general_info, since, max_age, timeout)
+        return cached_response(request, "VFR_HUD", info, lambda: {
+            "device": "uav",
+            "id": str(args.sysid),
+            "result": "Success",
+            "timestamp": info._timestamp,
+            "info": formatters.general_info(info),
+        })
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_GENERAL_INFO TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_GENERAL_INFO FAIL: {e}")
-    return {
-        "device": "uav",
-        "id": str(args.sysid),
-        "result": "Success",
-        "info": {
-            "airspeed": info.airspeed,
-            "groundspeed": info.groundspeed,
-            "heading": info.heading,
-            "throttle": info.throttle,
-            "alt": info.alt
-        }
-    }
 
 @router.get("/gps", tags=["telemetry"], summary="Returns the copter current GPS information (the information provided by this endpoint is generated by the fusion of multiple sensor data such as GPS and accelerometers)")
-def gps_info(uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def gps_info(request: Request, since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                   uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_gps_info()
-        res_obj = {
+        info = await read_message(uav, "GLOBAL_POSITION_INT", uav.get_gps_info, since, max_age, timeout)
+        return cached_response(request, "GLOBAL_POSITION_INT", info, lambda: {
             "device": "uav",
             "id": str(args.sysid),
-            "result": "Success", 
-            "info": {
-                "position": {
-                    "lat": info.lat / 1.0e7, # to degrees
-                    "lon": info.lon / 1.0e7, # to degrees
-                    "alt": info.alt / 1000, # to meters
-                    "relative_alt": info.relative_alt / 1000, # to meters
-                },
-                "velocity": {
-                    "vx": info.vx / 100, # to meters per second
-                    "vy": info.vy / 100, # to meters per second
-                    "vz": info.vz / 100, # to meters per second
-                },
-                "heading": info.hdg / 100 # to degrees
-            }
-        }
+            "result": "Success",
+            "timestamp": info._timestamp,
+            "info": formatters.gps_info(info),
+        })
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_GPS_POSITION TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_GPS_POSITION FAIL: {e}")
-    return res_obj
 
 @router.get("/gps_raw", tags=["telemetry"], summary="Returns the copter current raw GPS information (the information provided by this endpoint is generated directly by the GPS sensor)")
-def gps_raw(uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def gps_raw(since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                  uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_raw_gps()
+        info = await read_message(uav, "GPS_RAW_INT", uav.get_raw_gps, since, max_age, timeout)
         res_obj = {
             "device": "uav",
             "id": str(args.sysid),
             "result": "success",
+            "timestamp": info._timestamp,
             "info": {
                 "position": {
                     "lat": info.lat / 1.0e7, # to degrees
@@ -74,34 +68,28 @@ def gps_raw(uav: Copter = Depends(get_copter_instance), args: Namespace = Depend
                 "satelites": info.satellites_visible
             }
         }
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_GPS_RAW TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_GPS_RAW FAIL: {e}")
     return res_obj
 
 @router.get("/ned", tags=["telemetry"], summary="Returns the copter current NED information (the information provided by this endpoint is generated by the fusion of multiple sensor data such as GPS and accelerometers)")
-def ned_info(uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
+async def ned_info(request: Request, since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                   uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_ned_info()
-        res_obj = {
+        info = await read_message(uav, "LOCAL_POSITION_NED", uav.get_ned_info, since, max_age, timeout)
+        return cached_response(request, "LOCAL_POSITION_NED", info, lambda: {
             "device": "uav",
             "id": str(args.sysid),
-            "result": "Success", 
-            "info": {
-            "position": {
-                "x": info.x,
-                "y": info.y,
-                "z": info.z,
-            },
-            "velocity": {
-                "vx": info.vx,
-                "vy": info.vy,
-                "vz": info.vz
-            }
-        }
-    }
+            "result": "Success",
+            "timestamp": info._timestamp,
+            "info": formatters.ned_info(info),
+        })
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_NED_INFO TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_NED_INFO FAIL: {e}")
-    return res_obj
 
 @router.get("/compass", tags=["telemetry"], summary="Returns compass calibration information")
 def compass_info(uav: Copter = Depends(get_copter_instance), args: Namespace = Depends(get_args)):
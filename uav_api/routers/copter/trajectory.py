@@ -0,0 +1,39 @@
+from argparse import Namespace
+from fastapi import APIRouter, Depends, HTTPException
+from uav_api.classes.movement import Trajectory_plan
+from uav_api.routers.dependencies import get_args, get_trajectory_streamer
+from uav_api.vehicles.trajectory import Trajectory, TrajectoryStreamer
+from uav_api.vehicles.vehicle import PreconditionFailedException
+
+router = APIRouter(
+    prefix = "/trajectory",
+    tags = ["trajectory"],
+)
+
+@router.get("", tags=["trajectory"], summary="Returns the running or last trajectory with its setpoint jitter statistics")
+def trajectory_status(streamer: TrajectoryStreamer = Depends(get_trajectory_streamer), args: Namespace = Depends(get_args)):
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": streamer.status()}
+
+@router.post("", tags=["trajectory"], summary="Streams a timestamped LOCAL_NED trajectory as setpoints at a fixed rate")
+def start_trajectory(plan: Trajectory_plan, streamer: TrajectoryStreamer = Depends(get_trajectory_streamer), args: Namespace = Depends(get_args)):
+    try:
+        trajectory = Trajectory([sample.model_dump() for sample in plan.samples])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"TRAJECTORY FAIL: {e}")
+    try:
+        info = streamer.start(trajectory, rate=plan.rate, deadline=plan.deadline, replace=plan.replace)
+    except PreconditionFailedException as e:
+        raise HTTPException(status_code=409, detail=f"TRAJECTORY FAIL: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"TRAJECTORY FAIL: {e}")
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": info}
+
+@router.post("/cancel", tags=["trajectory"], summary="Stops the running trajectory with a zero-velocity setpoint")
+def cancel_trajectory(streamer: TrajectoryStreamer = Depends(get_trajectory_streamer), args: Namespace = Depends(get_args)):
+    try:
+        cancelled = streamer.cancel()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"TRAJECTORY FAIL: {e}")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail="TRAJECTORY FAIL: No trajectory is streaming")
+    return {"device": "uav", "id": str(args.sysid), "result": "Success", "info": streamer.status()}
@@ -1,26 +1,32 @@
 from uav_api.args import read_args_from_env
 from uav_api.vehicles.copter import Copter
 from uav_api.vehicles.plane import Plane
+from uav_api.vehicles.target_queue import TargetQueue
+from uav_api.vehicles.trajectory import TrajectoryStreamer
 
 copter = None
 plane = None
 args = None
 scripts_table = None
+target_queue = None
+trajectory_streamer = None
 
-def init_copter(sysid, connection):
+def init_copter(sysid, connection, message_rates=None, replay_speed=1.0, tx_rate_limit=None):
     """Builds and connects the copter singleton. Called from the lifespan only."""
     global copter
     if copter is None:
         copter = Copter(sysid=int(sysid))
-        copter.connect(connection_string=connection)
+        copter.connect(connection_string=connection, message_rates=message_rates, replay_speed=replay_speed,
+                       tx_rate_limit=tx_rate_limit)
     return copter
 
-def init_plane(sysid, connection):
+def init_plane(sysid, connection, message_rates=None, replay_speed=1.0, tx_rate_limit=None):
     """Builds and connects the plane singleton. Called from the lifespan only."""
     global plane
     if plane is None:
         plane = Plane(sysid=int(sysid))
-        plane.connect(connection_string=connection)
+        plane.connect(connection_string=connection, message_rates=message_rates, replay_speed=replay_speed,
+                      tx_rate_limit=tx_rate_limit)
     return plane
 
 def get_copter_instance():
@@ -33,6 +39,13 @@ def get_plane_instance():
         raise RuntimeError("Plane not initialized. init_plane must run first (lifespan).")
     return plane
 
+def get_vehicle_instance():
+    """Whichever vehicle the lifespan built; for routers shared by copter and plane."""
+    vehicle = copter if copter is not None else plane
+    if vehicle is None:
+        raise RuntimeError("Vehicle not initialized. init_copter/init_plane must run first (lifespan).")
+    return vehicle
+
 def get_args():
     global args
     if args is None:
@@ -43,4 +56,29 @@ def get_scripts_table():
     global scripts_table
     if scripts_table is None:
         scripts_table = {}
-    return scripts_table
\ No newline at end of file
+    return scripts_table
+
+def get_target_queue():
+    """The copter's GUIDED target queue, built on first use. Its executor
+    thread ends when the copter is closed. Linked both ways to the trajectory
+    streamer, so the two never fly the copter at the same time."""
+    global target_queue
+    if target_queue is None:
+        streamer = get_trajectory_streamer()
+        target_queue = TargetQueue(get_copter_instance(), trajectory=streamer)
+        streamer.queue = target_queue
+    return target_queue
+
+def get_trajectory_streamer():
+    """The copter's trajectory setpoint streamer, built on first use."""
+    global trajectory_streamer
+    if trajectory_streamer is None:
+        trajectory_streamer = TrajectoryStreamer(get_copter_instance())
+    return trajectory_streamer
+
+def stop_trajectory_streamer():
+    """Cancel a running trajectory (sending its failsafe stop) and end the
+    scheduler thread. Called from the lifespan before the link closes."""
+    if trajectory_streamer is not None:
+        trajectory_streamer.cancel()
+        trajectory_streamer.stop()
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""MAVLink message -> telemetry "info" dict conversions.
+
+Shared by the copter and plane telemetry routers and by the push stream, so a
+sample has the same shape and units whether it was polled or pushed.
+"""
+
+from pymavlink import mavutil
+
+from uav_api.vehicles.vehicle import sensor_states
+
+
+def gps_info(m):
+    """GLOBAL_POSITION_INT: degrees, meters, m/s and degrees."""
+    return {
+        "position": {
+            "lat": m.lat / 1.0e7,  # to degrees
+            "lon": m.lon / 1.0e7,  # to degrees
+            "alt": m.alt / 1000,  # to meters
+            "relative_alt": m.relative_alt / 1000,  # to meters
+        },
+        "velocity": {
+            "vx": m.vx / 100,  # to meters per second
+            "vy": m.vy / 100,  # to meters per second
+            "vz": m.vz / 100,  # to meters per second
+        },
+        "heading": m.hdg / 100  # to degrees
+    }
+
+
+def ned_info(m):
+    """LOCAL_POSITION_NED: already in meters and m/s."""
+    return {
+        "position": {
+            "x": m.x,
+            "y": m.y,
+            "z": m.z,
+        },
+        "velocity": {
+            "vx": m.vx,
+            "vy": m.vy,
+            "vz": m.vz
+        }
+    }
+
+
+def general_info(m):
+    """VFR_HUD."""
+    return {
+        "airspeed": m.airspeed,
+        "groundspeed": m.groundspeed,
+        "heading": m.heading,
+        "throttle": m.throttle,
+        "alt": m.alt
+    }
+
+
+def sys_status_info(m):
+    """SYS_STATUS, raw, as served by /telemetry/sys_status."""
+    return m.to_dict()
+
+
+def battery_info(m):
+    """SYS_STATUS battery fields, as served by /telemetry/battery_info."""
+    return {
+        "voltage": m.voltage_battery,
+        "current": m.current_battery,
+        "battery_remaining": m.battery_remaining
+    }
+
+
+def sensor_status(m):
+    """SYS_STATUS sensor flags, as served by /telemetry/sensor_status."""
+    return sensor_states(m)
+
+
+def state_info(m):
+    """HEARTBEAT: flight mode name and armed state."""
+    return {
+        "mode": mavutil.mode_string_v10(m),
+        "armed": bool(m.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED),
+    }
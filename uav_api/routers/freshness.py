@@ -0,0 +1,25 @@
+"""`since` / `max_age` long-poll parameters shared by the telemetry routers.
+
+Without them a telemetry endpoint returns whatever the cache holds. With them
+the handler awaits the receiver until a sample meeting the bounds arrives, so
+a follower can poll back-to-back and be paced by the stream rate itself.
+"""
+
+from typing import Annotated, Optional
+
+from fastapi import Query
+
+Since = Annotated[Optional[float], Query(
+    description="Only return a sample received after this time: pass the `timestamp` of the sample you already have to wait for the next one")]
+MaxAge = Annotated[Optional[float], Query(
+    ge=0, description="Accept a cached sample at most this many seconds old; otherwise wait for the next one")]
+Wait = Annotated[float, Query(
+    gt=0, le=60, description="Longest time to wait for a qualifying sample, in seconds (504 when it runs out)")]
+
+
+async def read_message(uav, mtype, getter, since, max_age, timeout):
+    """`getter()` (a plain cache read) when no bound is given, else the
+    first `mtype` message meeting `since`/`max_age`."""
+    if since is None and max_age is None:
+        return getter()
+    return await uav.wait_fresh_async(mtype, since=since, max_age=max_age, timeout=timeout)
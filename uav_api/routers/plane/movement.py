@@ -23,11 +23,11 @@ def go_to_gps(pos: Gps_pos,
 
 
 @router.post("/go_to_gps_wait", tags=["movement"], summary="Sends the plane to the specified GPS position and blocks until arrival")
-def go_to_gps_wait(pos: Gps_pos,
-                   uav: Plane = Depends(get_plane_instance),
-                   args: Namespace = Depends(get_args)):
+async def go_to_gps_wait(pos: Gps_pos,
+                         uav: Plane = Depends(get_plane_instance),
+                         args: Namespace = Depends(get_args)):
     try:
-        uav.go_to_gps_wait(pos.lat, pos.long, pos.alt)
+        await uav.go_to_gps_wait_async(pos.lat, pos.long, pos.alt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GO_TO FAIL: {e}")
     return {"device": "uav", "id": str(args.sysid),
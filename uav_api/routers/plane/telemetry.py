@@ -1,7 +1,11 @@
 from argparse import Namespace
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from uav_api.vehicles.plane import Plane
+from uav_api.vehicles.vehicle import TimeoutException
 from uav_api.routers.dependencies import get_plane_instance, get_args
+from uav_api.routers import formatters
+from uav_api.routers.freshness import MaxAge, Since, Wait, read_message
+from uav_api.routers.response_cache import cached_response
 
 router = APIRouter(
     prefix="/telemetry",
@@ -10,51 +14,39 @@ router = APIRouter(
 
 
 @router.get("/general", tags=["telemetry"], summary="Returns plane general information from VFR_HUD: airspeed, groundspeed, heading, throttle, altitude")
-def general_info(uav: Plane = Depends(get_plane_instance), args: Namespace = Depends(get_args)):
+async def general_info(request: Request, since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                       uav: Plane = Depends(get_plane_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_general_info()
+        info = await read_message(uav, "VFR_HUD", uav.get_general_info, since, max_age, timeout)
+        return cached_response(request, "VFR_HUD", info, lambda: {
+            "device": "uav",
+            "id": str(args.sysid),
+            "result": "Success",
+            "timestamp": info._timestamp,
+            "info": formatters.general_info(info),
+        })
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_GENERAL_INFO TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_GENERAL_INFO FAIL: {e}")
-    return {
-        "device": "uav",
-        "id": str(args.sysid),
-        "result": "Success",
-        "info": {
-            "airspeed": info.airspeed,
-            "groundspeed": info.groundspeed,
-            "heading": info.heading,
-            "throttle": info.throttle,
-            "alt": info.alt,
-        },
-    }
 
 
 @router.get("/gps", tags=["telemetry"], summary="Returns the plane current GPS information (sensor-fused position from GLOBAL_POSITION_INT)")
-def gps_info(uav: Plane = Depends(get_plane_instance), args: Namespace = Depends(get_args)):
+async def gps_info(request: Request, since: Since = None, max_age: MaxAge = None, timeout: Wait = 10.0,
+                   uav: Plane = Depends(get_plane_instance), args: Namespace = Depends(get_args)):
     try:
-        info = uav.get_gps_info()
-        res_obj = {
+        info = await read_message(uav, "GLOBAL_POSITION_INT", uav.get_gps_info, since, max_age, timeout)
+        return cached_response(request, "GLOBAL_POSITION_INT", info, lambda: {
             "device": "uav",
             "id": str(args.sysid),
             "result": "Success",
-            "info": {
-                "position": {
-                    "lat": info.lat / 1.0e7,
-                    "lon": info.lon / 1.0e7,
-                    "alt": info.alt / 1000,
-                    "relative_alt": info.relative_alt / 1000,
-                },
-                "velocity": {
-                    "vx": info.vx / 100,
-                    "vy": info.vy / 100,
-                    "vz": info.vz / 100,
-                },
-                "heading": info.hdg / 100,
-            },
-        }
+            "timestamp": info._timestamp,
+            "info": formatters.gps_info(info),
+        })
+    except TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"GET_GPS_POSITION TIMEOUT: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"GET_GPS_POSITION FAIL: {e}")
-    return res_obj
 
 
 @router.get("/battery_info", tags=["telemetry"], summary="Returns battery information extracted from SYS_STATUS message")
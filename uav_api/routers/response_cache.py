@@ -0,0 +1,59 @@
+"""Serialize-once cache for telemetry responses.
+
+A telemetry response only changes when the receiver parses a newer message of
+its type, but every GET used to rebuild and JSON-encode it. Bodies are cached
+per message type together with the `_timestamp` of the message they were built
+from: until a newer message arrives, every reader gets the same bytes, and
+clients revalidating with If-None-Match get a bodyless 304.
+"""
+
+import json
+
+from fastapi import Request, Response
+
+
+class ResponseCache:
+    """Latest serialized body and ETag per message type.
+
+    Entries are replaced whole (one dict assignment), so readers on the
+    threadpool need no lock; two readers racing on a new message both build
+    it, and either result is correct."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, mtype, m, build):
+        """(body, etag) for message `m` of `mtype`; `build()` makes the
+        response dict on a miss."""
+        entry = self._entries.get(mtype)
+        if entry is not None and entry[0] == m._timestamp:
+            return entry[1], entry[2]
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(build(), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        etag = '"%s-%x"' % (mtype.lower(), int(m._timestamp * 1e6))
+        self._entries[mtype] = (m._timestamp, body, etag)
+        return body, etag
+
+    def clear(self):
+        self._entries = {}
+
+
+telemetry_cache = ResponseCache()
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def cached_response(request: Request, mtype, m, build, cache=telemetry_cache):
+    """JSON response for message `m`, served from `cache`, or 304 when the
+    client's If-None-Match already names it."""
+    body, etag = cache.get(mtype, m, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
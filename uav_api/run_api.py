@@ -1,4 +1,6 @@
 import multiprocessing
+import sys
+
 import uvicorn
 
 from uav_api.args import parse_args, write_args_to_env
@@ -51,6 +53,9 @@ def spawn_with_args(raw_args=None):
     return process
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from uav_api.bench import main as bench_main
+        sys.exit(bench_main(sys.argv[2:]))
     try:
         run_with_args()
     except KeyboardInterrupt:
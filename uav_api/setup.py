@@ -142,6 +142,15 @@ def setup(args):
 
     args.scripts_path = ensure_dir_exists(args.scripts_path)
 
+    if args.param_cache is None:
+        args.param_cache = _resolve_home_path(os.path.join("uav_api_logs", "param_cache"))
+    args.param_cache = ensure_dir_exists(args.param_cache)
+
+    if args.tlog:
+        if args.tlog_path is None:
+            args.tlog_path = _resolve_home_path(os.path.join("uav_api_logs", "tlogs"))
+        args.tlog_path = ensure_dir_exists(args.tlog_path)
+
     args = ensure_dev_certs(args)
 
     return args
\ No newline at end of file
@@ -261,6 +261,21 @@ class Copter(Vehicle):
             accuracy=1
         )
 
+    async def wait_ned_position_async(self, target: Local_pos, timeout=60):
+        """Coroutine counterpart of wait_ned_position()."""
+
+        async def ned_distance():
+            pos1 = await self.get_ned_position_async(allow_cached_age=None)
+            return (abs(pos1.x - target.x) + abs(pos1.y - target.y) + abs(pos1.z - target.z)) / 3
+
+        await self.wait_and_maintain_async(
+            value_name="NED Position",
+            target=0,
+            current_value_getter=ned_distance,
+            timeout=timeout,
+            accuracy=1
+        )
+
     def drive_ned(self, north: float, east: float, down: float, look_at_target: bool = False, timeout=60):
         self.tx.set_position_target_local_ned_send(
             0,  # timestamp
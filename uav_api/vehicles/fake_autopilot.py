@@ -0,0 +1,554 @@
+"""Pure-Python MAVLink autopilot on a local UDP port, for hardware-free tests.
+
+FakeAutopilot speaks just enough of ArduPilot's side of the protocol for
+Vehicle to run end to end against it in milliseconds: periodic HEARTBEAT,
+SYSTEM_TIME, GLOBAL_POSITION_INT, LOCAL_POSITION_NED, GPS_RAW_INT, VFR_HUD
+and SYS_STATUS;
+COMMAND_LONG/COMMAND_INT answered with COMMAND_ACK (arming, mode, message
+intervals and REQUEST_MESSAGE, AUTOPILOT_VERSION included, are honoured); the PARAM read/list/set
+protocol; the MISSION upload (partial writes included)/download protocols, re-requesting items
+like ArduPilot does; and GUIDED position targets (SET_POSITION_TARGET_LOCAL_NED
+and _GLOBAL_INT), flown in a straight line at `speed` m/s (a velocity
+setpoint stops it).
+
+Faults are injected per outgoing message type: delay(mtype, s) holds every
+such message back, drop(mtype, probability, count) loses them. Everything
+runs on one "fake-autopilot" thread.
+
+    with FakeAutopilot(rates={"HEARTBEAT": 50}) as fake:
+        vehicle.connect(fake.connection_string)
+
+or, against an API listening with the default udpin connection:
+
+    python -m uav_api.vehicles.fake_autopilot --out 127.0.0.1:17171 --sysid 10
+"""
+
+import argparse
+import collections
+import heapq
+import itertools
+import logging
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+
+from pymavlink import mavutil
+
+# Abra DF, the default SITL home (lat, lon in degrees, alt in metres AMSL).
+FAKE_HOME = (-15.840081, -47.926642, 1042.0)
+
+# Stream rates in Hz; override per instance with rates={...}.
+FAKE_RATES = {
+    "HEARTBEAT": 1,
+    "SYSTEM_TIME": 5,
+    "GLOBAL_POSITION_INT": 5,
+    "LOCAL_POSITION_NED": 5,
+    "GPS_RAW_INT": 5,
+    "VFR_HUD": 5,
+    "SYS_STATUS": 2,
+}
+
+# A small ArduCopter-like parameter table.
+FAKE_PARAMS = {
+    "SYSID_THISMAV": 1.0,
+    "WPNAV_SPEED": 500.0,
+    "WPNAV_SPEED_UP": 250.0,
+    "WPNAV_SPEED_DN": 150.0,
+    "RTL_ALT": 1500.0,
+    "FENCE_ENABLE": 0.0,
+    "BATT_MONITOR": 4.0,
+    "SERVO9_FUNCTION": 0.0,
+}
+
+# AUTOPILOT_VERSION of the fake: ArduCopter 4.5.6 (official), and the first
+# eight bytes of the git hash it claims to be built from.
+FAKE_FLIGHT_SW_VERSION = 0x040506FF
+FAKE_GIT_HASH = [0x7b, 0x8c, 0x9d, 0x0e, 0, 0, 0, 0]
+
+# Seconds without the next item before an upload request is repeated, and
+# before the stalled upload is abandoned (ArduPilot's MissionItemProtocol
+# timings).
+MISSION_REQUEST_RETRY = 1.0
+MISSION_UPLOAD_TIMEOUT = 8.0
+
+# Ground speed (m/s) toward a position target; override per instance.
+FAKE_SPEED = 10.0
+EARTH_RADIUS = 6378137.0
+
+_SENSORS = 0x3FFF  # gyro ... GPS, all present, enabled and healthy
+
+
+class FakeAutopilot:
+    """One simulated vehicle bound to `bind` (UDP).
+
+    With `peer` set it streams to that address from the start (the API in
+    udpin mode); otherwise it waits for the first packet and answers its
+    sender (the API in udpout mode, see connection_string)."""
+
+    def __init__(self, bind=("127.0.0.1", 0), peer=None, sysid=1, compid=1,
+                 vehicle_type=mavutil.mavlink.MAV_TYPE_QUADROTOR,
+                 rates=None, params=None, home=FAKE_HOME, seed=None):
+        os.environ['MAVLINK20'] = '1'
+        mavutil.set_dialect("ardupilotmega")
+        self.mavlink = mavutil.mavlink
+        self.logger = logging.getLogger("FAKE_AUTOPILOT")
+        self.mav = self.mavlink.MAVLink(self, srcSystem=sysid, srcComponent=compid)
+        self.mav.robust_parsing = True
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(bind)
+        self.peer = peer
+        self.sysid = sysid
+        self.compid = compid
+        self.vehicle_type = vehicle_type
+        self.home = home
+        self.rates = dict(FAKE_RATES)
+        self.rates.update(rates or {})
+        self.default_rates = dict(self.rates)
+        self.params = dict(FAKE_PARAMS if params is None else params)
+        self.params["SYSID_THISMAV"] = float(sysid)
+        self.armed = False
+        self.custom_mode = 0
+        self.mission = []
+        # Ask for upload items with MISSION_REQUEST_INT instead of MISSION_REQUEST.
+        self.mission_request_int = False
+        # Position north/east/down of home (m), and the target it flies to
+        self.position = [0.0, 0.0, 0.0]
+        self.position_target = None
+        self.speed = FAKE_SPEED
+        self._moved = time.time()
+        # Overrides for COMMAND_ACK results, {MAV_CMD: MAV_RESULT}
+        self.command_results = {}
+        self.received = collections.Counter()
+        self.commands = []
+        self.dropped = collections.Counter()
+        self._faults = {}
+        self._rng = random.Random(seed)
+        self._delayed = []
+        self._order = itertools.count()
+        self._next_due = {}
+        self._upload = None
+        self._boot = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+        self._builders = {
+            "HEARTBEAT": self._heartbeat,
+            "SYSTEM_TIME": self._system_time,
+            "GLOBAL_POSITION_INT": self._global_position_int,
+            "LOCAL_POSITION_NED": self._local_position_ned,
+            "GPS_RAW_INT": self._gps_raw_int,
+            "VFR_HUD": self._vfr_hud,
+            "SYS_STATUS": self._sys_status,
+            "HOME_POSITION": self._home_position,
+            "AUTOPILOT_VERSION": self._autopilot_version,
+        }
+
+    @property
+    def port(self):
+        return self.sock.getsockname()[1]
+
+    @property
+    def connection_string(self):
+        """What Vehicle.connect() needs to reach this autopilot."""
+        host, port = self.sock.getsockname()
+        return "udpout:%s:%d" % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="fake-autopilot", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, join_timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(join_timeout)
+        self.sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    ####################################################################################################################
+    # Fault injection ##################################################################################################
+    ####################################################################################################################
+    def delay(self, mtype, seconds):
+        """Hold back every outgoing `mtype` by `seconds` (0 clears)."""
+        fault = self._faults.setdefault(mtype, {"delay": 0.0, "probability": 0.0, "count": None})
+        fault["delay"] = seconds
+
+    def drop(self, mtype, probability=1.0, count=None):
+        """Lose outgoing `mtype` with `probability`; with `count`, only the
+        next `count` of them. drop(mtype, 0) clears."""
+        fault = self._faults.setdefault(mtype, {"delay": 0.0, "probability": 0.0, "count": None})
+        fault["probability"] = probability
+        fault["count"] = count
+
+    ####################################################################################################################
+    # Transport ########################################################################################################
+    ####################################################################################################################
+    def write(self, buf):
+        """MAVLink encoder output; sent to the current peer."""
+        if self.peer is not None:
+            self.sock.sendto(buf, self.peer)
+
+    def send(self, m):
+        """Send m subject to the faults set for its type."""
+        mtype = m.get_type()
+        delay = 0.0
+        fault = self._faults.get(mtype)
+        if fault is not None:
+            if fault["count"] != 0 and fault["probability"] > 0 and self._rng.random() < fault["probability"]:
+                if fault["count"] is not None:
+                    fault["count"] -= 1
+                self.dropped[mtype] += 1
+                return
+            delay = fault["delay"]
+        if delay > 0:
+            heapq.heappush(self._delayed, (time.time() + delay, next(self._order), m))
+        else:
+            self.mav.send(m)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.time()
+            wake = now + 0.05
+            if self.peer is not None:
+                wake = min(wake, self._emit_streams(now))
+            while self._delayed and self._delayed[0][0] <= now:
+                self.mav.send(heapq.heappop(self._delayed)[2])
+            if self._delayed:
+                wake = min(wake, self._delayed[0][0])
+            self._service_upload(now)
+            self._fly(now)
+            try:
+                ready, _, _ = select.select([self.sock], [], [], max(0.0, wake - time.time()))
+                if not ready:
+                    continue
+                buf, addr = self.sock.recvfrom(65535)
+            except OSError:
+                if self._stop.is_set():
+                    break
+                raise
+            if self.peer is None:
+                self.peer = addr
+            for m in self.mav.parse_buffer(buf) or []:
+                if m.get_type() != 'BAD_DATA':
+                    self.received[m.get_type()] += 1
+                    try:
+                        self._handle(m)
+                    except Exception:
+                        self.logger.exception("fake autopilot failed to handle %s" % m.get_type())
+
+    ####################################################################################################################
+    # Periodic messages ################################################################################################
+    ####################################################################################################################
+    def _emit_streams(self, now):
+        """Send every stream that is due; return when the next one is."""
+        wake = now + 1.0
+        for mtype, rate in self.rates.items():
+            if not rate or rate <= 0:
+                continue
+            due = self._next_due.get(mtype, now)
+            if due <= now:
+                self.send(self._builders[mtype]())
+                due = max(due + 1.0 / rate, now)
+                self._next_due[mtype] = due
+            wake = min(wake, due)
+        return wake
+
+    def _time_boot_ms(self):
+        return int((time.time() - self._boot) * 1000) & 0xFFFFFFFF
+
+    def _heartbeat(self):
+        base_mode = self.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED
+        if self.armed:
+            base_mode |= self.mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+        status = self.mavlink.MAV_STATE_ACTIVE if self.armed else self.mavlink.MAV_STATE_STANDBY
+        return self.mav.heartbeat_encode(self.vehicle_type, self.mavlink.MAV_AUTOPILOT_ARDUPILOTMEGA,
+                                         base_mode, self.custom_mode, status)
+
+    def _system_time(self):
+        return self.mav.system_time_encode(int(time.time() * 1.0e6), self._time_boot_ms())
+
+    def _global_position_int(self):
+        lat, lon, alt = self.home
+        north, east, down = self.position
+        lat += math.degrees(north / EARTH_RADIUS)
+        lon += math.degrees(east / (EARTH_RADIUS * math.cos(math.radians(self.home[0]))))
+        return self.mav.global_position_int_encode(self._time_boot_ms(), int(lat * 1.0e7), int(lon * 1.0e7),
+                                                   int((alt - down) * 1000), int(-down * 1000), 0, 0, 0, 0)
+
+    def _local_position_ned(self):
+        return self.mav.local_position_ned_encode(self._time_boot_ms(), *self.position, 0, 0, 0)
+
+    def _gps_raw_int(self):
+        lat, lon, alt = self.home
+        return self.mav.gps_raw_int_encode(int(time.time() * 1.0e6), self.mavlink.GPS_FIX_TYPE_3D_FIX,
+                                           int(lat * 1.0e7), int(lon * 1.0e7), int(alt * 1000),
+                                           80, 120, 0, 0, 14)
+
+    def _vfr_hud(self):
+        return self.mav.vfr_hud_encode(0, 0, 0, 0, self.home[2], 0)
+
+    def _sys_status(self):
+        return self.mav.sys_status_encode(_SENSORS, _SENSORS, _SENSORS, 100, 12600, 500, 90,
+                                          0, 0, 0, 0, 0, 0)
+
+    def _home_position(self):
+        lat, lon, alt = self.home
+        return self.mav.home_position_encode(int(lat * 1.0e7), int(lon * 1.0e7), int(alt * 1000),
+                                             0, 0, 0, [1, 0, 0, 0], 0, 0, 0)
+
+    def _autopilot_version(self):
+        return self.mav.autopilot_version_encode(0, FAKE_FLIGHT_SW_VERSION, 0, 0, 0, FAKE_GIT_HASH,
+                                                 [0] * 8, [0] * 8, 0, 0, 0)
+
+    ####################################################################################################################
+    # Request handling #################################################################################################
+    ####################################################################################################################
+    def _handle(self, m):
+        mtype = m.get_type()
+        if getattr(m, "target_system", self.sysid) not in (0, self.sysid):
+            return
+        handler = getattr(self, "_on_" + mtype.lower(), None)
+        if handler is not None:
+            handler(m)
+
+    def _on_command_long(self, m):
+        self._command(m.command, [m.param1, m.param2, m.param3, m.param4, m.param5, m.param6, m.param7])
+
+    def _on_command_int(self, m):
+        self._command(m.command, [m.param1, m.param2, m.param3, m.param4, m.x, m.y, m.z])
+
+    def _command(self, command, params):
+        self.commands.append((command, params))
+        mavlink = self.mavlink
+        result = mavlink.MAV_RESULT_ACCEPTED
+        followup = None
+        if command == mavlink.MAV_CMD_COMPONENT_ARM_DISARM:
+            self.armed = params[0] == 1
+        elif command == mavlink.MAV_CMD_DO_SET_MODE:
+            self.custom_mode = int(params[1])
+        elif command == mavlink.MAV_CMD_SET_MESSAGE_INTERVAL:
+            result = self._set_interval(int(params[0]), params[1])
+        elif command == mavlink.MAV_CMD_GET_MESSAGE_INTERVAL:
+            followup = self.mav.message_interval_encode(int(params[0]), self._interval_us(int(params[0])))
+        elif command == mavlink.MAV_CMD_GET_HOME_POSITION:
+            followup = self._home_position()
+        elif command == mavlink.MAV_CMD_REQUEST_MESSAGE:
+            builder = self._builder_for(int(params[0]))
+            if builder is None:
+                result = mavlink.MAV_RESULT_FAILED
+            else:
+                followup = builder()
+        result = self.command_results.get(command, result)
+        self.send(self.mav.command_ack_encode(command, result))
+        if followup is not None and result == mavlink.MAV_RESULT_ACCEPTED:
+            self.send(followup)
+
+    def _builder_for(self, msg_id):
+        m = self.mavlink.mavlink_map.get(msg_id)
+        return None if m is None else self._builders.get(m.msgname)
+
+    def _set_interval(self, msg_id, interval_us):
+        builder = self._builder_for(msg_id)
+        if builder is None:
+            return self.mavlink.MAV_RESULT_FAILED
+        name = self.mavlink.mavlink_map[msg_id].msgname
+        if interval_us == 0:
+            self.rates[name] = self.default_rates.get(name, 0)
+        elif interval_us < 0:
+            self.rates[name] = 0
+        else:
+            self.rates[name] = 1.0e6 / interval_us
+        self._next_due.pop(name, None)
+        return self.mavlink.MAV_RESULT_ACCEPTED
+
+    def _interval_us(self, msg_id):
+        m = self.mavlink.mavlink_map.get(msg_id)
+        rate = self.rates.get(m.msgname) if m is not None else None
+        if rate is None:
+            return 0
+        if rate <= 0:
+            return -1
+        return int(1.0e6 / rate)
+
+    def _on_set_mode(self, m):
+        self.custom_mode = m.custom_mode
+
+    # GUIDED position targets
+    def _on_set_position_target_local_ned(self, m):
+        if m.type_mask & self.mavlink.POSITION_TARGET_TYPEMASK_X_IGNORE:
+            # Velocity setpoints are modelled as a stop.
+            self.position_target = None
+            return
+        target = [m.x, m.y, m.z]
+        if m.coordinate_frame == self.mavlink.MAV_FRAME_LOCAL_OFFSET_NED:
+            target = [p + d for p, d in zip(self.position, target)]
+        self.position_target = target
+
+    def _on_set_position_target_global_int(self, m):
+        if m.type_mask & self.mavlink.POSITION_TARGET_TYPEMASK_X_IGNORE:
+            return
+        lat, lon, _ = self.home
+        north = math.radians(m.lat_int * 1.0e-7 - lat) * EARTH_RADIUS
+        east = math.radians(m.lon_int * 1.0e-7 - lon) * EARTH_RADIUS * math.cos(math.radians(lat))
+        self.position_target = [north, east, -m.alt]
+
+    def _fly(self, now):
+        dt, self._moved = now - self._moved, now
+        target = self.position_target
+        if target is None:
+            return
+        delta = [t - p for t, p in zip(target, self.position)]
+        distance = math.sqrt(sum(d * d for d in delta))
+        step = self.speed * dt
+        if distance <= step:
+            self.position = list(target)
+            self.position_target = None
+        else:
+            self.position = [p + d * step / distance for p, d in zip(self.position, delta)]
+
+    # Parameters
+    def _param_value(self, name):
+        names = list(self.params)
+        return self.mav.param_value_encode(name.encode("ascii"), self.params[name],
+                                           self.mavlink.MAV_PARAM_TYPE_REAL32, len(names), names.index(name))
+
+    def _on_param_request_read(self, m):
+        names = list(self.params)
+        if m.param_index >= 0:
+            if m.param_index < len(names):
+                self.send(self._param_value(names[m.param_index]))
+        elif m.param_id in self.params:
+            self.send(self._param_value(m.param_id))
+
+    def _on_param_request_list(self, m):
+        for name in list(self.params):
+            self.send(self._param_value(name))
+
+    def _on_param_set(self, m):
+        if m.param_id in self.params:
+            self.params[m.param_id] = m.param_value
+            self.send(self._param_value(m.param_id))
+
+    # Mission download
+    def _on_mission_request_list(self, m):
+        count = len(self.mission) if m.mission_type == self.mavlink.MAV_MISSION_TYPE_MISSION else 0
+        self.send(self.mav.mission_count_encode(m.get_srcSystem(), m.get_srcComponent(), count, m.mission_type))
+
+    def _on_mission_request_int(self, m):
+        if m.mission_type != self.mavlink.MAV_MISSION_TYPE_MISSION or m.seq >= len(self.mission):
+            self.send(self.mav.mission_ack_encode(m.get_srcSystem(), m.get_srcComponent(),
+                                                  self.mavlink.MAV_MISSION_INVALID_SEQUENCE, m.mission_type))
+            return
+        item = self.mission[m.seq]
+        self.send(self.mav.mission_item_int_encode(
+            m.get_srcSystem(), m.get_srcComponent(), item.seq, item.frame, item.command, item.current,
+            item.autocontinue, item.param1, item.param2, item.param3, item.param4, item.x, item.y, item.z))
+
+    _on_mission_request = _on_mission_request_int
+
+    # Mission upload
+    def _on_mission_clear_all(self, m):
+        self.mission = []
+        self._upload = None
+        self.send(self.mav.mission_ack_encode(m.get_srcSystem(), m.get_srcComponent(),
+                                              self.mavlink.MAV_MISSION_ACCEPTED, m.mission_type))
+
+    def _on_mission_count(self, m):
+        src = (m.get_srcSystem(), m.get_srcComponent())
+        if m.count == 0:
+            self.mission = []
+            self.send(self.mav.mission_ack_encode(*src, self.mavlink.MAV_MISSION_ACCEPTED))
+            return
+        self._upload = {"src": src, "count": m.count, "items": [], "tail": [], "requested": 0.0,
+                        "active": time.time()}
+        self._request_next(time.time())
+
+    def _on_mission_write_partial_list(self, m):
+        src = (m.get_srcSystem(), m.get_srcComponent())
+        if not 0 <= m.start_index <= m.end_index < len(self.mission):
+            self.send(self.mav.mission_ack_encode(*src, self.mavlink.MAV_MISSION_ERROR))
+            return
+        self._upload = {"src": src, "count": m.end_index + 1, "items": list(self.mission[:m.start_index]),
+                        "tail": self.mission[m.end_index + 1:], "requested": 0.0, "active": time.time()}
+        self._request_next(time.time())
+
+    def _request_next(self, now):
+        upload = self._upload
+        upload["requested"] = now
+        request = self.mav.mission_request_int_encode if self.mission_request_int else self.mav.mission_request_encode
+        self.send(request(*upload["src"], len(upload["items"])))
+
+    def _on_mission_item_int(self, m):
+        upload = self._upload
+        if upload is None:
+            return
+        if m.seq != len(upload["items"]):
+            # Duplicate or out of order: ArduPilot refuses it and keeps the
+            # transfer open, its next request covers the item it wants.
+            self.send(self.mav.mission_ack_encode(*upload["src"], self.mavlink.MAV_MISSION_INVALID_SEQUENCE))
+            return
+        upload["items"].append(m)
+        upload["active"] = time.time()
+        if len(upload["items"]) < upload["count"]:
+            self._request_next(time.time())
+            return
+        self.mission = upload["items"] + upload["tail"]
+        self._upload = None
+        self.send(self.mav.mission_ack_encode(*upload["src"], self.mavlink.MAV_MISSION_ACCEPTED))
+
+    def _on_mission_item(self, m):
+        self._on_mission_item_int(self.mav.mission_item_int_encode(
+            m.target_system, m.target_component, m.seq, m.frame, m.command, m.current, m.autocontinue,
+            m.param1, m.param2, m.param3, m.param4, int(m.x * 1.0e7), int(m.y * 1.0e7), m.z))
+
+    def _service_upload(self, now):
+        upload = self._upload
+        if upload is None or now - upload["requested"] < MISSION_REQUEST_RETRY:
+            return
+        if now - upload["active"] > MISSION_UPLOAD_TIMEOUT:
+            self._upload = None
+            self.send(self.mav.mission_ack_encode(*upload["src"], self.mavlink.MAV_MISSION_OPERATION_CANCELLED))
+            return
+        self._request_next(now)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake MAVLink autopilot for hardware-free API tests.")
+    parser.add_argument('--bind', default="127.0.0.1:0", help="Local UDP address (host:port)")
+    parser.add_argument('--out', default=None,
+                        help="Stream to this address (an API started with --connection_type udpin)")
+    parser.add_argument('--sysid', type=int, default=1)
+    parser.add_argument('--rate', action='append', default=[], metavar="MESSAGE=HZ",
+                        help="Stream rate override, repeatable (e.g. --rate GLOBAL_POSITION_INT=20)")
+    args = parser.parse_args(argv)
+
+    def address(text):
+        host, port = text.rsplit(":", 1)
+        return host, int(port)
+
+    rates = {}
+    for entry in args.rate:
+        name, hz = entry.split("=", 1)
+        rates[name.strip().upper()] = float(hz)
+    fake = FakeAutopilot(bind=address(args.bind), peer=address(args.out) if args.out else None,
+                         sysid=args.sysid, rates=rates)
+    with fake:
+        print("Fake autopilot sysid %d on udp %s:%d (connect with %s)" % (
+            args.sysid, *fake.sock.getsockname(), fake.connection_string), flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Fixed-size telemetry history, recorded by the receiver thread.
+
+Each recorded message type has one ring buffer: a receive-time column plus
+one column per field, all `array('d')` preallocated at capacity, holding
+values already converted to display units. Appending overwrites one slot per
+column (O(1), no allocation), so memory is fixed for the life of the process.
+Queries copy contiguous slices of the columns and turn them into lists in C;
+no per-sample Python object is built.
+"""
+
+import threading
+from array import array
+
+# Recorded types -> ((field, scale, unit), ...); value = raw field * scale.
+HISTORY_FIELDS = {
+    "GLOBAL_POSITION_INT": (
+        ("lat", 1.0e-7, "deg"),
+        ("lon", 1.0e-7, "deg"),
+        ("alt", 1.0e-3, "m"),
+        ("relative_alt", 1.0e-3, "m"),
+        ("vx", 1.0e-2, "m/s"),
+        ("vy", 1.0e-2, "m/s"),
+        ("vz", 1.0e-2, "m/s"),
+        ("hdg", 1.0e-2, "deg"),
+    ),
+    "LOCAL_POSITION_NED": (
+        ("x", 1.0, "m"),
+        ("y", 1.0, "m"),
+        ("z", 1.0, "m"),
+        ("vx", 1.0, "m/s"),
+        ("vy", 1.0, "m/s"),
+        ("vz", 1.0, "m/s"),
+    ),
+    "VFR_HUD": (
+        ("airspeed", 1.0, "m/s"),
+        ("groundspeed", 1.0, "m/s"),
+        ("heading", 1.0, "deg"),
+        ("throttle", 1.0, "%"),
+        ("alt", 1.0, "m"),
+        ("climb", 1.0, "m/s"),
+    ),
+    "ATTITUDE": (
+        ("roll", 1.0, "rad"),
+        ("pitch", 1.0, "rad"),
+        ("yaw", 1.0, "rad"),
+        ("rollspeed", 1.0, "rad/s"),
+        ("pitchspeed", 1.0, "rad/s"),
+        ("yawspeed", 1.0, "rad/s"),
+    ),
+}
+
+# Samples kept per type: about 2 minutes at 25 Hz, ~200 KB per type.
+HISTORY_CAPACITY = 3000
+
+
+class RingBuffer:
+    """Columns of one message type, oldest sample overwritten first.
+
+    Written by the receiver thread only; the lock makes a query see either
+    all of an append or none of it."""
+
+    def __init__(self, fields, capacity=HISTORY_CAPACITY):
+        self.fields = fields
+        self.capacity = capacity
+        self.time = array('d', bytes(8 * capacity))
+        self.columns = {name: array('d', bytes(8 * capacity)) for name, _, _ in fields}
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, m):
+        with self._lock:
+            i = self._next
+            self.time[i] = m._timestamp
+            for name, scale, _ in self.fields:
+                self.columns[name][i] = getattr(m, name) * scale
+            self._next = (i + 1) % self.capacity
+            if self._count < self.capacity:
+                self._count += 1
+
+    def _time_at(self, start, logical):
+        return self.time[(start + logical) % self.capacity]
+
+    def _bisect(self, start, t):
+        """First logical index whose time is >= t (times are in receive order)."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(start, mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slice(self, column, start, lo, hi, stride):
+        a = (start + lo) % self.capacity
+        b = a + (hi - lo)
+        if b <= self.capacity:
+            return column[a:b:stride].tolist()
+        return (column[a:] + column[:b - self.capacity])[::stride].tolist()
+
+    def query(self, since=None, until=None, step=None):
+        """Columnar samples received in [since, until].
+
+        step (seconds) thins the result to about one sample per step, by
+        taking every n-th sample with n from the window's mean sample period,
+        so it stays a slice operation."""
+        with self._lock:
+            start = (self._next - self._count) % self.capacity
+            lo = 0 if since is None else self._bisect(start, since)
+            hi = self._count if until is None else self._bisect(start, until + 1e-9)
+            stride = 1
+            if step and hi - lo > 1:
+                period = (self._time_at(start, hi - 1) - self._time_at(start, lo)) / (hi - lo - 1)
+                if period > 0:
+                    stride = max(1, int(round(step / period)))
+            columns = {"time": self._slice(self.time, start, lo, hi, stride) if hi > lo else []}
+            for name, _, _ in self.fields:
+                columns[name] = self._slice(self.columns[name], start, lo, hi, stride) if hi > lo else []
+        return columns
+
+
+class TelemetryHistory:
+    """One RingBuffer per HISTORY_FIELDS type; record() is called by the
+    receiver for every parsed message."""
+
+    def __init__(self, capacity=HISTORY_CAPACITY, fields=HISTORY_FIELDS):
+        self.buffers = {mtype: RingBuffer(f, capacity) for mtype, f in fields.items()}
+
+    def record(self, m):
+        buf = self.buffers.get(m.get_type())
+        if buf is not None:
+            buf.append(m)
+
+    def units(self, mtype):
+        return {name: unit for name, _, unit in self.buffers[mtype].fields}
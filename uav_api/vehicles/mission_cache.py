@@ -0,0 +1,57 @@
+"""What the API last knew to be on the autopilot's mission, item by item.
+
+The cache is replaced after every successful upload or download, and
+Vehicle.update_mission() diffs a new mission against it so that only the
+changed items are sent (MISSION_WRITE_PARTIAL_LIST). Items are compared by
+key, their fields in MISSION_ITEM_INT units with the float fields rounded
+to float32 as on the wire, so a mission read back from the autopilot
+matches the one that was uploaded.
+"""
+
+import hashlib
+import struct
+import time
+
+# Unchanged items between two changed ranges that are re-sent rather than
+# paying for another partial-write handshake.
+MERGE_GAP = 4
+
+
+def _float32(value):
+    return struct.unpack('<f', struct.pack('<f', value))[0]
+
+
+def item_key(m):
+    """(frame, command, autocontinue, param1..4, x, y, z) of a MISSION_ITEM or
+    MISSION_ITEM_INT, with x/y as the integer degrees * 1e7 of the latter and
+    the params and z as the float32 they are sent as."""
+    x, y = m.x, m.y
+    if m.get_type() != 'MISSION_ITEM_INT':
+        x, y = int(round(x * 1.0e7)), int(round(y * 1.0e7))
+    return (m.frame, m.command, m.autocontinue, _float32(m.param1), _float32(m.param2), _float32(m.param3),
+            _float32(m.param4), x, y, _float32(m.z))
+
+
+def changed_ranges(old, new, merge_gap=MERGE_GAP):
+    """Inclusive [start, end] ranges of the indices where two equally long
+    key lists differ, merging ranges at most merge_gap items apart."""
+    ranges = []
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a == b:
+            continue
+        if ranges and i - ranges[-1][1] - 1 <= merge_gap:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return ranges
+
+
+class MissionCache:
+    def __init__(self, keys, source):
+        self.keys = list(keys)
+        self.source = source  # "upload" or "download"
+        self.updated = time.time()
+        self.digest = hashlib.sha1(repr(self.keys).encode()).hexdigest()
+
+    def info(self):
+        return {"count": len(self.keys), "digest": self.digest, "source": self.source, "updated": self.updated}
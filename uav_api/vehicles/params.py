@@ -0,0 +1,176 @@
+"""Indexed copy of the autopilot's parameter table, with an on-disk cache.
+
+The receiver records every PARAM_VALUE it parses, solicited or not, so the
+table follows changes made by any GCS without polling. A cache file per
+sysid and firmware lets a restart skip the full PARAM_REQUEST_LIST download
+(about 1000 parameters on ArduPilot, minutes over a slow radio).
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import time
+
+# param_index of a PARAM_VALUE that answers a PARAM_SET rather than a list or
+# indexed read.
+PARAM_INDEX_NONE = 65535
+
+CACHE_VERSION = 1
+
+
+def firmware_id(m):
+    """Cache key part from an AUTOPILOT_VERSION message: the release number
+    plus the git hash it was built from, e.g. '04050600-7b8c9d0e'."""
+    return "%08x-%s" % (m.flight_sw_version, bytes(bytearray(m.flight_custom_version)).hex())
+
+
+def cache_file(cache_dir, sysid, firmware):
+    return os.path.join(cache_dir, "params_%s_%s.json" % (sysid, firmware))
+
+
+def parse_param_file(text):
+    """{NAME: value} from a .param file (MAVProxy "NAME VALUE" or Mission
+    Planner "NAME,VALUE" lines; '#' starts a comment). Raises ValueError
+    naming the first malformed line."""
+    params = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        fields = line.replace(",", " ").replace("\t", " ").split()
+        try:
+            if len(fields) < 2 or len(fields[0]) > 16:
+                raise ValueError
+            params[fields[0].upper()] = float(fields[1])
+        except ValueError:
+            raise ValueError("Line %d is not NAME VALUE: %r" % (number, line)) from None
+    return params
+
+
+class ParamTable:
+    """Name -> (value, MAV_PARAM_TYPE, index).
+
+    record() is called by the receiver thread only; every read is a dict
+    lookup, except with_prefix(), which bisects a sorted name list rebuilt
+    only after a new name appears."""
+
+    def __init__(self):
+        self.values = {}
+        self.names = {}  # index -> name
+        self.count = None  # param_count reported by the autopilot
+        self.source = None  # "cache" or "autopilot" once loaded or fetched
+        self.verified = False  # every value read from the autopilot since loading
+        self.updated = None  # wall time of the last recorded PARAM_VALUE
+        self.dirty = False  # changed since loaded from or saved to disk
+        self._sorted = None
+
+    def record(self, m):
+        name = m.param_id
+        if name not in self.values:
+            self._sorted = None
+        index = m.param_index
+        if index == PARAM_INDEX_NONE:
+            previous = self.values.get(name)
+            index = previous[2] if previous is not None else index
+        else:
+            self.names[index] = name
+        entry = (m.param_value, m.param_type, index)
+        if self.values.get(name) != entry:
+            self.dirty = True
+        self.values[name] = entry
+        self.count = m.param_count
+        self.updated = time.time()
+
+    def get(self, name):
+        return self.values.get(name)
+
+    @property
+    def complete(self):
+        return self.count is not None and len(self.names) >= self.count
+
+    def missing(self):
+        """Indices not received yet (empty when the count is unknown)."""
+        if self.count is None:
+            return []
+        return [i for i in range(self.count) if i not in self.names]
+
+    def with_prefix(self, prefix=""):
+        names = self._sorted
+        if names is None:
+            names = self._sorted = sorted(self.values)
+        start = bisect.bisect_left(names, prefix)
+        out = {}
+        for name in names[start:]:
+            if not name.startswith(prefix):
+                break
+            entry = self.values.get(name)
+            if entry is not None:
+                out[name] = entry[0]
+        return out
+
+    def clear(self):
+        self.values = {}
+        self.names = {}
+        self.count = None
+        self.source = None
+        self.verified = False
+        self._sorted = None
+        self.dirty = False
+
+    def info(self):
+        return {
+            "count": self.count,
+            "received": len(self.values),
+            "complete": self.complete,
+            "source": self.source,
+            "verified": self.verified,
+            "updated": self.updated,
+        }
+
+    def save(self, path, sysid, firmware):
+        """Write the table atomically (temp file + rename)."""
+        data = {
+            "version": CACHE_VERSION,
+            "sysid": sysid,
+            "firmware": firmware,
+            "count": self.count,
+            "saved": time.time(),
+            "params": {name: list(entry) for name, entry in dict(self.values).items()},
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".params-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        self.dirty = False
+
+    def load(self, path, sysid, firmware):
+        """Replace the table with a complete cache file written for this sysid
+        and firmware. Returns False (table untouched) otherwise."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get("version") != CACHE_VERSION or data.get("sysid") != sysid
+                or data.get("firmware") != firmware):
+            return False
+        params = data.get("params", {})
+        count = data.get("count")
+        names = {entry[2]: name for name, entry in params.items() if entry[2] != PARAM_INDEX_NONE}
+        if count is None or len(names) < count:
+            return False
+        self.values = {name: tuple(entry) for name, entry in params.items()}
+        self.names = names
+        self.count = count
+        self.source = "cache"
+        self.verified = False
+        self.updated = data.get("saved")
+        self.dirty = False
+        self._sorted = None
+        return True
@@ -67,6 +67,13 @@ class Plane(Vehicle):
                                      target_altitude=target_altitude,
                                      height_accuracy=height_accuracy, **kwargs)
 
+    async def wait_location_async(self, loc, accuracy=50.0, timeout=180,
+                                  target_altitude=None, height_accuracy=-1, **kwargs):
+        """Coroutine counterpart of wait_location(), with the same plane defaults."""
+        return await super().wait_location_async(loc, accuracy=accuracy, timeout=timeout,
+                                                 target_altitude=target_altitude,
+                                                 height_accuracy=height_accuracy, **kwargs)
+
     def wait_for_alt(self, alt_min=30, timeout=60, max_err=5):
         """Wait for minimum (relative) altitude to be reached."""
         return super().wait_for_alt(alt_min=alt_min, timeout=timeout, max_err=max_err)
@@ -162,9 +169,11 @@ class Plane(Vehicle):
         mode switch to AUTO succeeds — does NOT wait for the landing to
         complete; poll telemetry to track the landing.
         """
-        self.init_wp()
-        self.add_wp_land(lat, long, alt, vtol=vtol)
-        self.send_all_waypoints()
+        with self._mission_lock:
+            self.init_wp()
+            self.add_wp_land(lat, long, alt, vtol=vtol)
+            items = [self.wploader.wp(i) for i in range(self.wploader.count())]
+        self.update_mission(items)
         if not self.change_mode("AUTO"):
             raise Exception("Failed to switch to AUTO mode")
 
@@ -255,6 +264,19 @@ class Plane(Vehicle):
                            height_accuracy=height_accuracy,
                            timeout=timeout)
 
+    async def go_to_gps_wait_async(self, lat: float, long: float, alt: float,
+                                   accuracy: float = 120.0, height_accuracy: float = 10.0,
+                                   timeout: int = 180):
+        """Coroutine counterpart of go_to_gps_wait()."""
+        self.go_to_gps(lat, long, alt)
+        home = await self.get_home_position_async()
+        target_alt_amsl = home["altitude"] / 1000.0 + alt
+        await self.wait_location_async(self.mav_location(lat, long, alt),
+                                       accuracy=accuracy,
+                                       target_altitude=target_alt_amsl,
+                                       height_accuracy=height_accuracy,
+                                       timeout=timeout)
+
     def set_attitude(self, roll: float, pitch: float, yaw: float,
                      throttle: float, body_rates: bool = False):
         """Send a SET_ATTITUDE_TARGET in GUIDED mode.
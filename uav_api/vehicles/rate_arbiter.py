@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+
+class RateArbiter:
+    """Drives per-message stream rates from subscriber demand.
+
+    A Subscription may carry the rate (Hz) it wants for its message types, as
+    the telemetry stream does for its clients. The arbiter keeps, per type,
+    the highest rate demanded by live subscriptions and asks the autopilot for
+    it with MAV_CMD_SET_MESSAGE_INTERVAL, from its own thread so subscribing
+    never waits on the link. When the demand goes away the type falls back to
+    its baseline: the rate profile entry if there is one (see
+    Vehicle.apply_message_rates), else the autopilot default.
+
+    Demand only ever raises a rate above the baseline, never lowers one, so
+    other consumers of the default stream are unaffected. Raises are applied
+    at once; a lower demand must hold for `hold` seconds first, so clients
+    reconnecting or short-lived waits do not make a slow link churn.
+
+    demand is swapped in by the subscribing threads and applied is also
+    reset from the HTTP thread (Vehicle.apply_message_rates), so both are
+    read and written under _lock; the autopilot is never waited on with it
+    held.
+    """
+
+    def __init__(self, vehicle, hold=5.0, tolerance=0.1, max_rate=50.0, logger_name="VEHICLE"):
+        self.vehicle = vehicle
+        self.hold = hold
+        self.tolerance = tolerance  # relative change below which a rate is left alone
+        self.max_rate = max_rate
+        self.logger = logging.getLogger(logger_name)
+        self.demand = {}      # type -> highest Hz wanted by a live subscription
+        self.applied = {}     # type -> Hz this arbiter set; absent = baseline
+        self._lower_since = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def update(self, subs):
+        """Recompute demand from the live subscription set. Called by the
+        vehicle whenever it changes (with its subscription lock held), so it
+        only swaps a dict in and wakes the worker."""
+        demand = {}
+        for sub in subs:
+            if sub.rate is None or sub.types is None:
+                continue
+            rate = min(sub.rate, self.max_rate)
+            for mtype in sub.types:
+                if rate > demand.get(mtype, 0.0):
+                    demand[mtype] = rate
+        with self._lock:
+            if demand == self.demand:
+                return
+            self.demand = demand
+        self._wake.set()
+
+    def reset(self, types):
+        """Forget what was applied for `types` (their rate was just set from
+        elsewhere) and re-evaluate them."""
+        with self._lock:
+            for mtype in types:
+                self.applied.pop(mtype, None)
+                self._lower_since.pop(mtype, None)
+        self._wake.set()
+
+    def baseline(self, mtype):
+        """Rate (Hz) the type streams at without demand; the floor below
+        which demand is ignored."""
+        profile = self.vehicle.message_rates.get(mtype)
+        if profile is None or profile["requested"] == 0:
+            return float(self.vehicle.streamrate)
+        if profile["requested"] < 0:
+            return 0.0
+        return float(profile["requested"])
+
+    def plan(self, now):
+        """[(type, Hz or None for baseline)] due for sending at `now`."""
+        with self._lock:
+            return self._plan(now)
+
+    def _plan(self, now):
+        due = []
+        for mtype in set(self.demand) | set(self.applied):
+            want = self.demand.get(mtype)
+            target = want if want is not None and want > self.baseline(mtype) * (1 + self.tolerance) else None
+            current = self.applied.get(mtype)
+            if target == current or (target is not None and current is not None
+                                     and abs(target - current) <= current * self.tolerance):
+                self._lower_since.pop(mtype, None)
+                continue
+            if target is not None and (current is None or target > current):
+                self._lower_since.pop(mtype, None)
+                due.append((mtype, target))
+                continue
+            since = self._lower_since.setdefault(mtype, now)
+            if now - since >= self.hold:
+                self._lower_since.pop(mtype, None)
+                due.append((mtype, target))
+        return due
+
+    def apply(self, mtype, target):
+        """Send one planned change and record it, even if the autopilot
+        refuses it, so a rejected type is not retried on every wake."""
+        with self._lock:
+            if target is None:
+                profile = self.vehicle.message_rates.get(mtype)
+                rate = profile["requested"] if profile is not None else 0
+                self.applied.pop(mtype, None)
+            else:
+                rate = target
+                self.applied[mtype] = target
+        try:
+            self.vehicle.set_message_rate_hz(mtype, rate, timeout=5)
+            self.logger.info("Demand rate %s: %s Hz" % (mtype, rate))
+        except Exception as e:
+            self.logger.warning("Demand rate %s=%s not applied: %s" % (mtype, rate, e))
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="mavlink-rates", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout=2.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(join_timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # The timeout is what lets a pending lowering come due
+            self._wake.wait(timeout=self.hold / 2)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                return
+            for mtype, target in self.plan(time.time()):
+                self.apply(mtype, target)
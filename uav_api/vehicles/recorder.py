@@ -0,0 +1,115 @@
+"""Flight data recorder: every received MAVLink message, as tlog files.
+
+The receiver thread only enqueues (timestamp, raw bytes) with put_nowait; a
+writer thread owns the files. When the queue is full — the card stalled
+longer than the queue covers — the record is dropped and counted instead of
+blocking the receiver. Files use the standard tlog layout (big-endian uint64
+microseconds, then the raw packet), which MAVExplorer and mavlogdump.py read
+directly; compressed files are the same stream gzipped.
+"""
+
+import gzip
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+_STOP = object()
+
+
+class TlogRecorder:
+    """Bounded-queue tlog writer with size-based rotation.
+
+    Files are named <prefix>_<start time>_<n>.tlog[.gz] in `directory`; a
+    new one is started when the current one reaches `max_bytes`."""
+
+    def __init__(self, directory, prefix="flight", max_bytes=64 * 1024 * 1024,
+                 compress=False, queue_size=10000, logger_name="VEHICLE"):
+        self.directory = os.path.expanduser(directory)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.logger = logging.getLogger(logger_name)
+        self._q = queue.Queue(queue_size)
+        self._thread = None
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.files = []
+        self.error = None
+
+    # Called from the receiver thread only.
+    def record(self, m):
+        try:
+            self._q.put_nowait((m._timestamp, m.get_msgbuf()))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="tlog-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout=5.0):
+        """Write out what is queued and close the current file."""
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._q.put(_STOP, timeout=0.5)
+                break
+            except queue.Full:
+                if not self._thread.is_alive():
+                    break
+        self._thread.join(join_timeout)
+
+    def stats(self):
+        return {
+            "recording": self._thread is not None and self._thread.is_alive(),
+            "file": self.files[-1] if self.files else None,
+            "files": len(self.files),
+            "records": self.records,
+            "bytes": self.bytes_written,
+            "dropped": self.dropped,
+            "queued": self._q.qsize(),
+            "error": self.error,
+        }
+
+    def _open(self):
+        name = "%s_%s_%d.tlog" % (self.prefix, self._started, len(self.files))
+        path = os.path.join(self.directory, name + (".gz" if self.compress else ""))
+        self.files.append(path)
+        self.logger.info("Recording tlog to %s" % path)
+        if self.compress:
+            return gzip.open(path, "wb", compresslevel=6)
+        return open(path, "wb")
+
+    def _run(self):
+        f = None
+        size = 0
+        try:
+            while True:
+                item = self._q.get()
+                if item is _STOP:
+                    return
+                timestamp, buf = item
+                if f is None or size >= self.max_bytes:
+                    if f is not None:
+                        f.close()
+                    f = self._open()
+                    size = 0
+                record = struct.pack(">Q", int(timestamp * 1.0e6)) + buf
+                f.write(record)
+                size += len(record)
+                self.bytes_written += len(record)
+                self.records += 1
+        except Exception as e:
+            # A dead card must not take the API down; stop recording and say so.
+            self.error = str(e)
+            self.logger.exception("tlog recorder stopped")
+        finally:
+            if f is not None:
+                f.close()
@@ -0,0 +1,76 @@
+"""Recorded tlog played back as a live MAVLink link (`replay:<file>`).
+
+ReplayConnection is a pymavlink log reader that Vehicle uses in place of a
+socket, so every message goes through the normal receiver: mav.messages,
+history buffers, subscriptions, recorder. Messages are released on the log's
+own clock scaled by `speed` and re-stamped with the wall-clock time they are
+released at, so freshness checks, long-polls and /telemetry/history behave
+as they would against a live vehicle. Anything sent to the vehicle is
+discarded; the recorded autopilot cannot hear us.
+"""
+
+import gzip
+import logging
+import threading
+import time
+
+from pymavlink import mavutil
+
+REPLAY_PREFIX = "replay:"
+
+
+class ReplayConnection(mavutil.mavlogfile):
+    """Read-only tlog (.tlog or .tlog.gz) paced at `speed` times real time.
+
+    speed=0 releases messages as fast as they parse, for read-path
+    throughput runs. At the end of the log the link simply goes quiet."""
+
+    def __init__(self, filename, speed=1.0, logger_name="VEHICLE"):
+        if speed < 0:
+            raise ValueError("replay speed must be >= 0, got %s" % speed)
+        self.speed = speed
+        self.logger = logging.getLogger(logger_name)
+        self.log_time = None
+        self.finished = False
+        self._log_start = None
+        self._wall_start = None
+        self._closed = threading.Event()
+        mavutil.mavlogfile.__init__(self, filename, robust_parsing=True)
+        if filename.endswith(".gz"):
+            self.f.close()
+            self.f = gzip.open(filename, "rb")
+
+    def write(self, buf):
+        pass
+
+    def close(self):
+        self._closed.set()
+        mavutil.mavlogfile.close(self)
+
+    def pre_message(self):
+        """Read the record timestamp, wait until it is due, re-stamp it."""
+        pos = self.f.tell()
+        mavutil.mavlogfile.pre_message(self)
+        if self.f.tell() - pos < 8:
+            if not self.finished:
+                self.finished = True
+                self.logger.info("Replay of %s finished" % self.filename)
+            return
+        self.log_time = self._timestamp
+        if self._log_start is None:
+            self._log_start, self._wall_start = self.log_time, time.time()
+        if self.speed == 0:
+            self._timestamp = time.time()
+            return
+        due = self._wall_start + (self.log_time - self._log_start) / self.speed
+        delay = due - time.time()
+        if delay > 0:
+            self._closed.wait(delay)
+        self._timestamp = due
+
+    def post_message(self, msg):
+        mavutil.mavlogfile.post_message(self, msg)
+        # mavlogfile resynchronises corrupt records against the last LOG
+        # timestamp; keep that on the log's clock, not ours.
+        if msg.get_type() != "BAD_DATA":
+            self._last_timestamp = self.log_time
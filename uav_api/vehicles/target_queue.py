@@ -0,0 +1,190 @@
+import collections
+import itertools
+import logging
+import math
+import threading
+import time
+
+from pymavlink import mavutil
+
+from uav_api.vehicles.vehicle import LinkDownException, PreconditionFailedException, TimeoutException
+
+# Position messages the executor checks arrival against, per target frame.
+POSITION_TYPES = {"ned": "LOCAL_POSITION_NED", "gps": "GLOBAL_POSITION_INT"}
+
+
+class TargetQueue:
+    """GUIDED targets flown one after the other, server-side.
+
+    enqueue() appends NED or GPS targets; the head of the queue is sent as
+    soon as nothing else is being flown. The executor thread holds a
+    Subscription on the position messages while a target is current and
+    checks every one for arrival (3D distance within the target's accuracy),
+    so the next target is sent on the message that shows the arrival instead
+    of on a client's next poll. While flying it asks for `rate` Hz of both
+    position messages through the vehicle's RateArbiter.
+
+    Targets go out through Copter.go_to_ned()/go_to_gps(), so the copter
+    must be armed and in GUIDED for them to be flown; the queue changes
+    neither. skip() and clear() only stop the queue: the copter keeps flying
+    to the last target it was sent. A target whose send fails is finished
+    as "failed" and the next one is sent.
+
+    The queue and a TrajectoryStreamer never command the copter together:
+    with `trajectory` set, enqueue() is refused while it streams, and the
+    streamer clears the queue when a trajectory starts.
+    """
+
+    def __init__(self, vehicle, accuracy=1.0, rate=10.0, keep=50, trajectory=None, logger_name="VEHICLE"):
+        self.vehicle = vehicle
+        self.trajectory = trajectory  # the TrajectoryStreamer flying the same copter
+        self.accuracy = accuracy  # metres, unless a target brings its own
+        self.rate = rate
+        self.logger = logging.getLogger(logger_name)
+        self.pending = collections.deque()
+        self.current = None
+        self.done = collections.deque(maxlen=keep)  # most recent finished targets
+        self.counts = collections.Counter()  # finished targets by outcome
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def enqueue(self, targets, accuracy=None):
+        """Append targets, each {"frame": "ned", "x", "y", "z"} or {"frame":
+        "gps", "lat", "long", "alt"} (relative altitude) plus an optional
+        "look_at_target". `accuracy` (m) defaults to the queue's. Returns
+        the ids given to the targets; PreconditionFailedException while a
+        trajectory is streaming."""
+        accuracy = self.accuracy if accuracy is None else accuracy
+        with self._lock:
+            if self.trajectory is not None and self.trajectory.streaming:
+                raise PreconditionFailedException("A trajectory is streaming")
+            ids = []
+            for target in targets:
+                target = dict(target, id=next(self._ids), accuracy=accuracy, state="pending",
+                              enqueued=time.time(), started=None, finished=None, distance=None, error=None)
+                self.pending.append(target)
+                ids.append(target["id"])
+            if self.current is None:
+                self._start_next()
+        self._ensure_thread()
+        self._wake.set()
+        return ids
+
+    def skip(self):
+        """Abandon the current target and send the next one. Returns the
+        skipped target, None when nothing was being flown."""
+        with self._lock:
+            skipped = self.current
+            if skipped is not None:
+                self._finish("skipped")
+                self._start_next()
+        return skipped
+
+    def clear(self):
+        """Drop every pending target and the current one. Returns how many
+        targets were dropped."""
+        with self._lock:
+            dropped = len(self.pending) + (self.current is not None)
+            for target in self.pending:
+                target["state"] = "cleared"
+            self.counts["cleared"] += len(self.pending)
+            self.pending.clear()
+            if self.current is not None:
+                self._finish("cleared")
+        return dropped
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": "idle" if self.current is None else "flying",
+                "current": dict(self.current) if self.current is not None else None,
+                "pending": [dict(target) for target in self.pending],
+                "done": [dict(target) for target in self.done],
+                "counts": {state: self.counts[state] for state in ("arrived", "skipped", "cleared", "failed")},
+            }
+
+    def stop(self, join_timeout=2.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(join_timeout)
+
+    # Called with _lock held.
+    def _start_next(self):
+        """Send pending targets until one goes out; it becomes current only
+        once sent."""
+        while self.pending:
+            target = self.pending.popleft()
+            target["started"] = time.time()
+            look = target.get("look_at_target", False)
+            try:
+                if target["frame"] == "ned":
+                    self.vehicle.go_to_ned(target["x"], target["y"], target["z"], look_at_target=look)
+                else:
+                    self.vehicle.go_to_gps(target["lat"], target["long"], target["alt"], look_at_target=look)
+            except Exception as e:
+                self.logger.warning("Target %d not sent: %s" % (target["id"], e))
+                target["error"] = str(e)
+                self.current = target
+                self._finish("failed")
+                continue
+            target["state"] = "flying"
+            self.current = target
+            return
+        self.current = None
+
+    def _finish(self, state):
+        target, self.current = self.current, None
+        target["state"] = state
+        target["finished"] = time.time()
+        self.counts[state] += 1
+        self.done.append(target)
+
+    def _distance(self, target, m):
+        if target["frame"] == "ned":
+            return math.sqrt((m.x - target["x"]) ** 2 + (m.y - target["y"]) ** 2 + (m.z - target["z"]) ** 2)
+        here = mavutil.location(m.lat * 1.0e-7, m.lon * 1.0e-7)
+        ground = self.vehicle.get_distance(here, mavutil.location(target["lat"], target["long"]))
+        return math.hypot(ground, m.relative_alt * 1.0e-3 - target["alt"])
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="target-queue", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop_event.is_set():
+                return
+            try:
+                with self.vehicle.subscribe(types=set(POSITION_TYPES.values()), maxsize=64, rate=self.rate) as sub:
+                    self._follow(sub)
+            except LinkDownException:
+                return
+            except Exception:
+                self.logger.exception("Target queue executor failed")
+
+    def _follow(self, sub):
+        """Check position messages against the current target until the
+        queue runs dry, sending the next target on each arrival."""
+        while not self._stop_event.is_set():
+            try:
+                m = sub.get(timeout=0.5)
+            except TimeoutException:
+                m = None
+            with self._lock:
+                target = self.current
+                if target is None:
+                    return
+                if m is None or m.get_type() != POSITION_TYPES[target["frame"]]:
+                    continue
+                target["distance"] = round(self._distance(target, m), 2)
+                if target["distance"] <= target["accuracy"]:
+                    self._finish("arrived")
+                    self._start_next()
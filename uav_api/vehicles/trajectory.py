@@ -0,0 +1,303 @@
+import bisect
+import collections
+import logging
+import math
+import statistics
+import threading
+import time
+
+from pymavlink import mavutil
+
+from uav_api.vehicles.vehicle import PreconditionFailedException
+
+mavlink = mavutil.mavlink
+
+AXES = ("x", "y", "z")
+
+# SET_POSITION_TARGET_LOCAL_NED masks: full position/velocity/acceleration
+# setpoint (yaw optional), and the zero-velocity stop sent on a failsafe.
+TRAJECTORY_MASK = mavlink.POSITION_TARGET_TYPEMASK_YAW_RATE_IGNORE
+STOP_MASK = (mavlink.POSITION_TARGET_TYPEMASK_X_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_Y_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_Z_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_AX_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_AY_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_AZ_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_YAW_IGNORE |
+             mavlink.POSITION_TARGET_TYPEMASK_YAW_RATE_IGNORE)
+
+
+def _given(samples, keys, what):
+    """True when every sample has `keys`, False when none has; ValueError
+    for a mix."""
+    count = sum(all(sample.get(key) is not None for key in keys) for sample in samples)
+    if count not in (0, len(samples)):
+        raise ValueError("Give %s for every sample or for none" % what)
+    return count == len(samples)
+
+
+class Trajectory:
+    """A time-parameterized LOCAL_NED path through timestamped samples.
+
+    Each sample is {"t", "x", "y", "z"} (seconds, metres) with optional
+    velocity "vx", "vy", "vz" (m/s), acceleration "ax", "ay", "az" (m/s/s) and
+    "yaw" (degrees); each optional group must be given for every sample or
+    for none. Times are taken relative to the first sample.
+
+    Positions follow a cubic Hermite spline through the samples, using the
+    given velocities or, without them, Catmull-Rom tangents with the path
+    at rest at both ends. Velocity and acceleration are the spline's
+    derivatives unless accelerations are given, which are then interpolated
+    linearly. Yaw is interpolated along the shorter way round.
+    """
+
+    def __init__(self, samples):
+        if len(samples) < 2:
+            raise ValueError("A trajectory needs at least 2 samples")
+        t0 = samples[0]["t"]
+        self.times = [sample["t"] - t0 for sample in samples]
+        if any(b <= a for a, b in zip(self.times, self.times[1:])):
+            raise ValueError("Sample times must be strictly increasing")
+        self.positions = [tuple(float(sample[axis]) for axis in AXES) for sample in samples]
+        if _given(samples, ("vx", "vy", "vz"), "velocity"):
+            self.velocities = [(sample["vx"], sample["vy"], sample["vz"]) for sample in samples]
+        else:
+            self.velocities = self._catmull_rom()
+        self.accelerations = None
+        if _given(samples, ("ax", "ay", "az"), "acceleration"):
+            self.accelerations = [(sample["ax"], sample["ay"], sample["az"]) for sample in samples]
+        self.yaws = None
+        if _given(samples, ("yaw",), "yaw"):
+            self.yaws = [math.radians(sample["yaw"]) for sample in samples]
+
+    @property
+    def duration(self):
+        return self.times[-1]
+
+    def _catmull_rom(self):
+        t, p = self.times, self.positions
+        velocities = [(0.0, 0.0, 0.0)]
+        for i in range(1, len(t) - 1):
+            dt = t[i + 1] - t[i - 1]
+            velocities.append(tuple((p[i + 1][k] - p[i - 1][k]) / dt for k in range(3)))
+        velocities.append((0.0, 0.0, 0.0))
+        return velocities
+
+    def sample(self, t):
+        """(position, velocity, acceleration, yaw in radians or None) at t
+        seconds. From `duration` on, the last position is held at rest."""
+        if t >= self.duration:
+            return self.positions[-1], (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), None if self.yaws is None else self.yaws[-1]
+        t = max(t, 0.0)
+        i = bisect.bisect_right(self.times, t) - 1
+        h = self.times[i + 1] - self.times[i]
+        s = (t - self.times[i]) / h
+        p0, p1 = self.positions[i], self.positions[i + 1]
+        v0, v1 = self.velocities[i], self.velocities[i + 1]
+        s2, s3 = s * s, s * s * s
+        position = tuple((2 * s3 - 3 * s2 + 1) * p0[k] + (s3 - 2 * s2 + s) * h * v0[k] +
+                         (-2 * s3 + 3 * s2) * p1[k] + (s3 - s2) * h * v1[k] for k in range(3))
+        velocity = tuple((6 * s2 - 6 * s) / h * (p0[k] - p1[k]) + (3 * s2 - 4 * s + 1) * v0[k] +
+                         (3 * s2 - 2 * s) * v1[k] for k in range(3))
+        if self.accelerations is not None:
+            a0, a1 = self.accelerations[i], self.accelerations[i + 1]
+            acceleration = tuple(a0[k] + s * (a1[k] - a0[k]) for k in range(3))
+        else:
+            acceleration = tuple((12 * s - 6) / (h * h) * (p0[k] - p1[k]) + (6 * s - 4) / h * v0[k] +
+                                 (6 * s - 2) / h * v1[k] for k in range(3))
+        yaw = None
+        if self.yaws is not None:
+            y0, y1 = self.yaws[i], self.yaws[i + 1]
+            turn = (y1 - y0 + math.pi) % (2 * math.pi) - math.pi
+            yaw = y0 + s * turn
+        return position, velocity, acceleration, yaw
+
+
+class TrajectoryStreamer:
+    """Streams a Trajectory as SET_POSITION_TARGET_LOCAL_NED setpoints at a
+    fixed rate from its own scheduler thread.
+
+    Ticks are scheduled on the monotonic clock from the start of the run, so
+    a late tick does not push the later ones back; each setpoint samples the
+    trajectory at the time it is actually sent, and ticks already missed are
+    skipped rather than sent in a burst. Setpoints go through the vehicle's
+    transmitter like go_to_ned(), where a newer one replaces one still
+    queued. The last setpoint holds the final position.
+
+    A run stops with a zero-velocity setpoint (the failsafe) when it is
+    cancelled, when it is still streaming `deadline` seconds after it
+    started, or when a tick is more than MAX_LAG seconds late (the process
+    stalled, so the path is no longer being followed). start() replaces a
+    running trajectory at once, and clears `queue` (the TargetQueue flying
+    the same copter) so its targets are not sent between the setpoints.
+    """
+
+    MAX_LAG = 0.5
+    # The most recent setpoints the jitter statistics are computed over
+    # (100 s at 20 Hz); status() copies them under the scheduler's lock.
+    KEEP = 2000
+
+    def __init__(self, vehicle, logger_name="VEHICLE"):
+        self.vehicle = vehicle
+        self.logger = logging.getLogger(logger_name)
+        self.queue = None
+        self.run = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def streaming(self):
+        run = self.run
+        return run is not None and run["state"] == "streaming"
+
+    def start(self, trajectory, rate=20.0, deadline=None, replace=True):
+        """Stream `trajectory` at `rate` Hz. A running trajectory is replaced,
+        or with replace=False refused with PreconditionFailedException."""
+        with self._lock:
+            if self.streaming:
+                if not replace:
+                    raise PreconditionFailedException("A trajectory is already streaming")
+                self._finish(self.run, "replaced")
+            self.run = {
+                "trajectory": trajectory, "rate": float(rate), "deadline": deadline,
+                "state": "streaming", "reason": None, "started": time.time(), "finished": None,
+                "duration": trajectory.duration, "elapsed": 0.0, "sent": 0, "skipped": 0,
+                "lags": collections.deque(maxlen=self.KEEP), "intervals": collections.deque(maxlen=self.KEEP),
+            }
+            # After the run is streaming, so the queue refuses new targets
+            # from here on.
+            if self.queue is not None and self.queue.clear():
+                self.logger.info("Target queue cleared for the trajectory")
+        self._ensure_thread()
+        self._wake.set()
+        return self.status()
+
+    def cancel(self):
+        """Stop the running trajectory with the failsafe stop. Returns False
+        when nothing was streaming."""
+        with self._lock:
+            if not self.streaming:
+                return False
+            self._failsafe(self.run, "cancelled")
+        self._wake.set()
+        return True
+
+    def status(self):
+        with self._lock:
+            run = self.run
+            if run is None:
+                return {"state": "idle"}
+            info = {key: value for key, value in run.items() if key not in ("trajectory", "lags", "intervals")}
+            lags, intervals = list(run["lags"]), list(run["intervals"])
+        # Sorted outside the lock, so a status poll never delays a tick.
+        info["jitter"] = self._jitter(lags, intervals, info["rate"])
+        return info
+
+    def stop(self, join_timeout=2.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(join_timeout)
+
+    @staticmethod
+    def _jitter(lags, intervals, rate):
+        """Milliseconds each setpoint went out after its tick, and the spread
+        of the intervals between consecutive setpoints."""
+        lags = sorted(lags)
+        if not lags:
+            return None
+
+        def pick(q):
+            return round(lags[min(len(lags) - 1, int(q * len(lags)))] * 1000.0, 3)
+
+        jitter = {"lag_ms": {"mean": round(statistics.fmean(lags) * 1000.0, 3), "p50": pick(0.5), "p99": pick(0.99),
+                             "max": round(lags[-1] * 1000.0, 3)}}
+        if len(intervals) >= 2:
+            period = 1.0 / rate
+            jitter["interval_ms"] = {"mean": round(statistics.fmean(intervals) * 1000.0, 3),
+                                     "stdev": round(statistics.stdev(intervals) * 1000.0, 3),
+                                     "max_error": round(max(abs(i - period) for i in intervals) * 1000.0, 3)}
+        return jitter
+
+    # Called with _lock held.
+    def _finish(self, run, state, reason=None):
+        run["state"] = state
+        run["reason"] = reason
+        run["finished"] = time.time()
+
+    def _failsafe(self, run, state, reason=None):
+        self._finish(run, state, reason)
+        self.vehicle.tx.set_position_target_local_ned_send(
+            0, self.vehicle.target_system, self.vehicle.target_component, mavlink.MAV_FRAME_LOCAL_NED, STOP_MASK,
+            0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        if reason is not None:
+            self.logger.warning("Trajectory failsafe: %s" % reason)
+
+    def _send(self, t, trajectory):
+        position, velocity, acceleration, yaw = trajectory.sample(t)
+        mask = TRAJECTORY_MASK | (mavlink.POSITION_TARGET_TYPEMASK_YAW_IGNORE if yaw is None else 0)
+        self.vehicle.tx.set_position_target_local_ned_send(
+            0, self.vehicle.target_system, self.vehicle.target_component, mavlink.MAV_FRAME_LOCAL_NED, mask,
+            *position, *velocity, *acceleration, yaw or 0.0, 0)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="trajectory", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            run = self.run
+            if run is None or run["state"] != "streaming":
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            try:
+                self._stream(run)
+            except Exception as e:
+                self.logger.exception("Trajectory streamer failed")
+                with self._lock:
+                    if run["state"] == "streaming":
+                        self._finish(run, "failed", str(e))
+
+    def _stream(self, run):
+        trajectory = run["trajectory"]
+        period = 1.0 / run["rate"]
+        t0 = time.monotonic()
+        tick = 0
+        last = None
+        while not self._stop_event.is_set():
+            scheduled = t0 + tick * period
+            delay = scheduled - time.monotonic()
+            if delay > 0 and self._wake.wait(delay):
+                self._wake.clear()
+            with self._lock:
+                if self.run is not run or run["state"] != "streaming":
+                    return
+                now = time.monotonic()
+                if now < scheduled:
+                    continue  # woken early by something else
+                elapsed = now - t0
+                run["elapsed"] = round(elapsed, 3)
+                if now - scheduled > self.MAX_LAG:
+                    self._failsafe(run, "failsafe", "setpoint %.2fs late" % (now - scheduled))
+                    return
+                if run["deadline"] is not None and elapsed > run["deadline"]:
+                    self._failsafe(run, "failsafe", "deadline of %.1fs passed" % run["deadline"])
+                    return
+                self._send(elapsed, trajectory)
+                run["sent"] += 1
+                run["lags"].append(now - scheduled)
+                if last is not None:
+                    run["intervals"].append(now - last)
+                last = now
+                if elapsed >= trajectory.duration:
+                    self._finish(run, "completed")
+                    return
+            # Resume at the next tick still ahead, skipping those already missed.
+            next_tick = max(tick + 1, int((time.monotonic() - t0) / period) + 1)
+            run["skipped"] += next_tick - tick - 1
+            tick = next_tick
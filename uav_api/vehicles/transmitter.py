@@ -0,0 +1,195 @@
+"""Prioritized MAVLink transmit thread.
+
+Every outgoing message is queued by class and written by one thread, the
+only one that packs and writes (so pymavlink's sequence counter and tx
+buffer need no lock). Classes are served in strict priority order:
+
+  heartbeat  our GCS heartbeat and failsafe commands (RTL, land, disarm,
+             flight termination)
+  setpoint   movement setpoints (SET_POSITION_TARGET_*, SET_ATTITUDE_TARGET,
+             RC overrides); a newer setpoint of the same kind (message,
+             target, frame and type mask) replaces one still queued,
+             keeping its place in line. Offset and body-frame setpoints
+             are relative to the vehicle, so none of them is dropped.
+  command    COMMAND_LONG/COMMAND_INT, mode and stream-rate requests
+  bulk       PARAM_* and MISSION_* transfers
+
+so a parameter sync or mission upload can delay a stop or a setpoint by at
+most the one message already on the wire. With rate_limit (bytes/s) a token
+bucket shapes the output for low-baud radios; whatever waits for tokens is
+re-ordered by priority when they become available.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from pymavlink import mavutil
+
+from uav_api.metrics import QUEUE_WAIT_BUCKETS, Histogram
+
+mavlink = mavutil.mavlink
+
+TX_HEARTBEAT, TX_SETPOINT, TX_COMMAND, TX_BULK = range(4)
+TX_CLASSES = ("heartbeat", "setpoint", "command", "bulk")
+
+SETPOINT_TYPES = frozenset({
+    "SET_POSITION_TARGET_LOCAL_NED",
+    "SET_POSITION_TARGET_GLOBAL_INT",
+    "SET_ATTITUDE_TARGET",
+    "RC_CHANNELS_OVERRIDE",
+    "MANUAL_CONTROL",
+})
+# Frames whose setpoints are relative to where the vehicle is (drive_ned()
+# offsets add up), so a later one does not make an earlier one obsolete.
+RELATIVE_FRAMES = frozenset({
+    mavlink.MAV_FRAME_LOCAL_OFFSET_NED,
+    mavlink.MAV_FRAME_BODY_NED,
+    mavlink.MAV_FRAME_BODY_OFFSET_NED,
+    mavlink.MAV_FRAME_BODY_FRD,
+})
+BULK_PREFIXES = ("PARAM_", "MISSION_")
+FAILSAFE_COMMANDS = frozenset({
+    mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH,
+    mavlink.MAV_CMD_NAV_LAND,
+    mavlink.MAV_CMD_NAV_VTOL_LAND,
+    mavlink.MAV_CMD_DO_FLIGHTTERMINATION,
+})
+
+# Token bucket depth when rate_limit is set: about four full-size MAVLink2
+# frames, enough for a heartbeat plus a command without waiting.
+DEFAULT_BURST = 1120
+
+
+def classify(m):
+    """(class, coalescing key or None) of an outgoing message."""
+    mtype = m.get_type()
+    if mtype == "HEARTBEAT":
+        return TX_HEARTBEAT, None
+    if mtype in SETPOINT_TYPES:
+        frame = getattr(m, "coordinate_frame", None)
+        if frame in RELATIVE_FRAMES:
+            return TX_SETPOINT, None
+        return TX_SETPOINT, (mtype, getattr(m, "target_system", None), frame, getattr(m, "type_mask", None))
+    if mtype in ("COMMAND_LONG", "COMMAND_INT"):
+        if m.command in FAILSAFE_COMMANDS or (
+                m.command == mavlink.MAV_CMD_COMPONENT_ARM_DISARM and m.param1 == 0):
+            return TX_HEARTBEAT, None
+        return TX_COMMAND, None
+    if mtype.startswith(BULK_PREFIXES):
+        return TX_BULK, None
+    return TX_COMMAND, None
+
+
+class Transmitter:
+    """Owns the write side of a pymavlink connection.
+
+    start() routes the MAVLink object's send() - which every *_send helper
+    and mavfile helper goes through - into the queue, so existing callers
+    keep calling self.tx.foo_send(...) and simply return once the message is
+    queued. Write errors are logged and counted, not raised to the caller."""
+
+    CLASSES = TX_CLASSES
+
+    def __init__(self, link, rate_limit=None, burst=DEFAULT_BURST, logger_name="VEHICLE"):
+        self.link = link
+        self.rate_limit = rate_limit or None
+        self.burst = burst
+        self.logger = logging.getLogger(logger_name)
+        self._write = link.send
+        self._queues = tuple(collections.deque() for _ in TX_CLASSES)
+        self._pending = {}  # coalescing key -> queued entry
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._tokens = burst
+        self._refilled = time.monotonic()
+
+        self.sent = [0] * len(TX_CLASSES)
+        self.bytes_sent = [0] * len(TX_CLASSES)
+        self.coalesced = [0] * len(TX_CLASSES)
+        self.errors = 0
+        self.queue_wait = tuple(Histogram(QUEUE_WAIT_BUCKETS) for _ in TX_CLASSES)
+
+    def start(self):
+        self.link.send = self.submit
+        self._thread = threading.Thread(target=self._run, name="mavlink-tx", daemon=True)
+        self._thread.start()
+
+    def stop(self, join_timeout=2.0):
+        """Write out what is queued (within join_timeout) and stop."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(join_timeout)
+        self.link.__dict__.pop("send", None)
+
+    def submit(self, m, force_mavlink1=False):
+        """Queue m; signature of pymavlink's MAVLink.send()."""
+        priority, key = classify(m)
+        with self._cond:
+            if self._stopping:
+                return
+            if key is not None:
+                entry = self._pending.get(key)
+                if entry is not None:
+                    entry[0] = m
+                    entry[1] = force_mavlink1
+                    self.coalesced[priority] += 1
+                    return
+            entry = [m, force_mavlink1, time.monotonic(), key]
+            self._queues[priority].append(entry)
+            if key is not None:
+                self._pending[key] = entry
+            self._cond.notify()
+
+    def queued(self):
+        return [len(q) for q in self._queues]
+
+    def _next(self):
+        for priority, q in enumerate(self._queues):
+            if q:
+                entry = q.popleft()
+                if entry[3] is not None:
+                    del self._pending[entry[3]]
+                return priority, entry
+        return None, None
+
+    def _run(self):
+        while True:
+            if self.rate_limit is not None:
+                self._wait_for_tokens()
+            with self._cond:
+                priority, entry = self._next()
+                while entry is None:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                    priority, entry = self._next()
+            before = self.link.total_bytes_sent
+            try:
+                self._write(entry[0], force_mavlink1=entry[1])
+            except Exception:
+                self.errors += 1
+                self.logger.exception("MAVLink send of %s failed" % entry[0].get_type())
+            size = self.link.total_bytes_sent - before
+            self.queue_wait[priority].observe(time.monotonic() - entry[2])
+            self.sent[priority] += 1
+            self.bytes_sent[priority] += size
+            self._tokens -= size
+
+    def _wait_for_tokens(self):
+        """Block until the bucket is out of debt. Runs before picking the next
+        message, so whatever arrived meanwhile is served in priority order."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens >= 0:
+                return
+            if self._stop_event.wait(-self._tokens / self.rate_limit):
+                return
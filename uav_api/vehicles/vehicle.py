@@ -1,3 +1,5 @@
+import asyncio
+import collections
 import copy
 import math
 import os
@@ -7,7 +9,7 @@ import threading
 import time
 import logging
 
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 
 from pymavlink import mavwp
 from MAVProxy.modules.lib import mp_util
@@ -16,6 +18,14 @@ from pymavlink.rotmat import Vector3
 from pymavlink.mavutil import location
 
 from uav_api.classes.movement import Local_pos
+from uav_api.metrics import CommandStats, RxStats
+from uav_api.vehicles.history import TelemetryHistory
+from uav_api.vehicles.mission_cache import MissionCache, changed_ranges, item_key
+from uav_api.vehicles.params import PARAM_INDEX_NONE, ParamTable, cache_file, firmware_id
+from uav_api.vehicles.rate_arbiter import RateArbiter
+from uav_api.vehicles.replay import REPLAY_PREFIX, ReplayConnection
+from uav_api.vehicles.survey import lawnmower, path_length
+from uav_api.vehicles.transmitter import Transmitter
 
 
 ########################################################################################################################
@@ -129,6 +139,43 @@ class MovementException(ErrorException):
 # Receive plumbing #####################################################################################################
 ########################################################################################################################
 
+# Sensors reported by get_sensor_status() / sensor_states(), by SYS_STATUS bit.
+SYS_STATUS_SENSORS = {
+    "gyro": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_3D_GYRO,
+    "accelerometer": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_3D_ACCEL,
+    "gps": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_GPS,
+    "altitude_control": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_Z_ALTITUDE_CONTROL,
+    "position_control": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_XY_POSITION_CONTROL,
+    "radio_receiver": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_RC_RECEIVER,
+    "motor_output": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_MOTOR_OUTPUTS,
+    "battery": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_BATTERY,
+    "pre_arm_check": mavutil.mavlink.MAV_SYS_STATUS_PREARM_CHECK,
+}
+
+
+def message_id(name):
+    """MAVLink message id for a message name such as "GLOBAL_POSITION_INT";
+    ValueError for an unknown name."""
+    try:
+        return getattr(mavutil.mavlink, "MAVLINK_MSG_ID_%s" % name.upper())
+    except AttributeError:
+        raise ValueError("Unknown MAVLink message %s" % name) from None
+
+
+def sensor_states(sys_msg, sensor_dict=None):
+    """Present/enabled/health flags of each sensor in a SYS_STATUS message."""
+    if sensor_dict is None:
+        sensor_dict = SYS_STATUS_SENSORS
+    s_data = {}
+    for key, value in sensor_dict.items():
+        s_data[key] = {
+            "present": bool(sys_msg.onboard_control_sensors_present & value),
+            "enabled": bool(sys_msg.onboard_control_sensors_enabled & value),
+            "health": bool(sys_msg.onboard_control_sensors_health & value),
+        }
+    return s_data
+
+
 # Sentinel pushed into every subscription queue when the receiver stops, so
 # blocked waiters unblock immediately instead of running out their timeouts.
 _STOP = object()
@@ -140,11 +187,16 @@ class Subscription:
     Created only through Vehicle.subscribe(). Receives every message matching
     (types, predicate) parsed AFTER registration — which is why waiters must
     subscribe BEFORE sending the request whose response they wait for.
+
+    A `rate` (Hz) declares how often the subscriber wants its types; the
+    vehicle's RateArbiter raises the autopilot's stream rate to match while
+    the subscription is live.
     """
 
-    def __init__(self, types=None, predicate=None, maxsize=512):
+    def __init__(self, types=None, predicate=None, maxsize=512, rate=None):
         self.types = frozenset(types) if types is not None else None
         self.predicate = predicate  # runs on the receiver thread; keep it trivial
+        self.rate = rate
         self._q = queue.Queue(maxsize)
         self.dropped = 0
 
@@ -205,26 +257,72 @@ class Subscription:
             self.dropped += 1
 
 
-class _LockedSender:
-    """Proxy that serializes every call on `target` behind `lock`.
+class AsyncSubscription(Subscription):
+    """A Subscription consumed by coroutines on one asyncio event loop.
 
-    pymavlink has no internal locking: concurrent *_send calls corrupt the tx
-    buffer and sequence counter. All sends must go through this proxy."""
+    Created only through Vehicle.subscribe_async(). The receiver thread never
+    touches the asyncio queue: _offer() hands each message to the loop with
+    call_soon_threadsafe, and delivery (including drop-oldest) runs on the
+    loop thread, waking the awaiting coroutine without tying up a worker
+    thread for the length of the wait.
+    """
 
-    def __init__(self, target, lock):
-        self._target = target
-        self._lock = lock
+    def __init__(self, loop, types=None, predicate=None, maxsize=512, rate=None):
+        super().__init__(types=types, predicate=predicate, maxsize=maxsize, rate=rate)
+        self._loop = loop
+        self._q = asyncio.Queue(maxsize)
 
-    def __getattr__(self, name):
-        attr = getattr(self._target, name)
-        if not callable(attr):
-            return attr
+    async def get(self, timeout=10.0):
+        """Await the next matching message.
 
-        def locked_call(*args, **kwargs):
-            with self._lock:
-                return attr(*args, **kwargs)
+        Raises TimeoutException on timeout and LinkDownException if the
+        receiver has stopped."""
+        try:
+            m = await asyncio.wait_for(self._q.get(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(
+                "Timed out waiting %.1fs for %s" % (timeout, self._describe()))
+        if m is _STOP:
+            raise LinkDownException("MAVLink receiver stopped")
+        return m
+
+    async def wait_for(self, predicate=None, timeout=10.0):
+        """Await a message satisfying predicate (any message if predicate is
+        None)."""
+        deadline = self._loop.time() + timeout
+        while True:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                raise TimeoutException(
+                    "Timed out waiting %.1fs for %s" % (timeout, self._describe()))
+            m = await self.get(timeout=remaining)
+            if predicate is None or predicate(m):
+                return m
 
-        return locked_call
+    def clear(self):
+        """Discard everything queued so far. Call from the loop thread."""
+        while True:
+            try:
+                self._q.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+    # Called from the receiver thread only.
+    def _offer(self, m):
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, m)
+        except RuntimeError:
+            # Loop already closed: nobody can be awaiting this subscription.
+            pass
+
+    # Runs on the event loop thread.
+    def _deliver(self, m):
+        try:
+            self._q.put_nowait(m)
+        except asyncio.QueueFull:
+            self._q.get_nowait()
+            self._q.put_nowait(m)
+            self.dropped += 1
 
 
 ########################################################################################################################
@@ -241,20 +339,50 @@ class Vehicle:
     the instant a matching message is parsed.
 
     All sends go through self.tx (dialect-level *_send) or self.txc
-    (mavfile-level helpers), which serialize on one lock.
+    (mavfile-level helpers) into the Transmitter's priority queue; one
+    transmit thread does every write.
     """
 
     # Overridable per-vehicle constants
     LAND_MIN_ALT = 6
     LAND_TIMEOUT = 60
+    # Mission upload: items sent ahead of the autopilot's requests, and
+    # seconds without a request or ack before the transfer counts as stalled
+    MISSION_UPLOAD_WINDOW = 8
+    MISSION_ITEM_TIMEOUT = 5.0
+    # Mission download: MISSION_REQUEST_INTs kept in flight, and seconds before
+    # an unanswered one is repeated
+    MISSION_DOWNLOAD_WINDOW = 16
+    MISSION_RETRY_TIMEOUT = 1.0
 
     def __init__(self, default_stream_rate=5, sysid=1, logger_name="VEHICLE"):
         self.mav = None
         self.tx = None
         self.txc = None
+        self.transmitter = None
         self.streamrate = default_stream_rate
+        # Last apply_message_rates() outcome per message name
+        self.message_rates = {}
+        self.rate_arbiter = RateArbiter(self, logger_name=logger_name)
+        # Bounded per-type history of hot telemetry, appended by the receiver
+        self.history = TelemetryHistory()
+        # Optional TlogRecorder fed by the receiver (start_recording())
+        self.recorder = None
+        # Parameter table kept current by the receiver (sync_parameters())
+        self.param_table = ParamTable()
+        self.firmware = None
+        self.param_cache_path = None
+        self._param_thread = None
+        # Counters read by the /metrics endpoint
+        self.rx_stats = RxStats()
+        self.command_stats = CommandStats()
+        self.closed_sub_dropped = 0
         self.target_system = sysid
         self.target_component = 1
+        # Latest HEARTBEAT from the autopilot itself; mav.messages['HEARTBEAT']
+        # holds the last one from ANY component of its system (a companion
+        # computer, a camera, a GCS sharing the sysid)
+        self.autopilot_heartbeat = None
         self.heartbeat_interval_ms = 1000
         self.last_heartbeat_time_ms = None
         self.last_heartbeat_time_wc_s = 0
@@ -264,11 +392,16 @@ class Vehicle:
         self.wp_received = {}
         self.wp_requested = {}
         self.wp_expected_count = 0
+        # Mission the autopilot is known to hold (update_mission())
+        self.mission_cache = None
         self.logger = logging.getLogger(logger_name)
 
-        self._subs = []
+        # Copy-on-write dispatch index: message type -> tuple of subscriptions,
+        # with the wildcard (types=None) bucket under the None key. Rebuilt
+        # under _sub_lock by subscribe(); the receiver reads it lock-free.
+        self._subs = ()
+        self._sub_index = {}
         self._sub_lock = threading.Lock()
-        self._send_lock = threading.RLock()
         self._mission_lock = threading.Lock()
         self._stop_event = threading.Event()
         self._rx_thread = None
@@ -340,10 +473,30 @@ class Vehicle:
     ####################################################################################################################
     # Connection / receiver thread #####################################################################################
     ####################################################################################################################
-    def connect(self, connection_string='udpin:0.0.0.0:14550'):
+    def connect(self, connection_string='udpin:0.0.0.0:14550', message_rates=None, replay_speed=1.0,
+                tx_rate_limit=None):
         """Open the MAVLink connection, enforce MAVLink2, start the single
-        receiver thread and set a default streamrate."""
+        receiver thread and set a default streamrate.
+
+        message_rates ({name: Hz}) is applied on top of the default
+        streamrate; a message the autopilot refuses is logged, not fatal.
+
+        'replay:<file.tlog>' plays a recorded log through the receiver at
+        replay_speed times real time (0: as fast as possible) instead of
+        opening a link; nothing is requested from the recorded vehicle.
+
+        tx_rate_limit (bytes/s) shapes everything sent for a low-baud radio;
+        None sends as fast as the link accepts."""
         os.environ['MAVLINK20'] = '1'
+        if connection_string.startswith(REPLAY_PREFIX):
+            mavutil.set_dialect("ardupilotmega")
+            self.mav = ReplayConnection(connection_string[len(REPLAY_PREFIX):], speed=replay_speed,
+                                        logger_name=self.logger.name)
+            self._start_transmitter(tx_rate_limit)
+            if message_rates:
+                self.logger.warning("Message rates are ignored when replaying a log")
+            self._start_receiver()
+            return
         self.mav = mavutil.mavlink_connection(
             connection_string,
             retries=1000,
@@ -353,14 +506,24 @@ class Vehicle:
             autoreconnect=True,
             dialect="ardupilotmega",
         )
-        self.tx = _LockedSender(self.mav.mav, self._send_lock)
-        self.txc = _LockedSender(self.mav, self._send_lock)
+        self._start_transmitter(tx_rate_limit)
         self._start_receiver()
         try:
             self.set_streamrate(self.streamrate)
         except Exception:
             self.close()
             raise
+        if message_rates:
+            for name, entry in self.apply_message_rates(message_rates).items():
+                if entry["error"] is not None:
+                    self.logger.warning("Message rate %s=%s not applied: %s" % (name, entry["requested"], entry["error"]))
+        self.rate_arbiter.start()
+
+    def _start_transmitter(self, rate_limit=None):
+        self.transmitter = Transmitter(self.mav.mav, rate_limit=rate_limit, logger_name=self.logger.name)
+        self.transmitter.start()
+        self.tx = self.mav.mav
+        self.txc = self.mav
 
     def _start_receiver(self):
         self._stop_event.clear()
@@ -371,15 +534,34 @@ class Vehicle:
     def close(self, join_timeout=2.0):
         """Stop the receiver thread, unblock every waiter and close the link."""
         self._stop_event.set()
+        self.rate_arbiter.stop()
         if self._rx_thread is not None and self._rx_thread.is_alive():
             self._rx_thread.join(join_timeout)
-        with self._sub_lock:
-            subs = list(self._subs)
-        for sub in subs:
+        for sub in self._subs:
             sub._offer(_STOP)
+        self.stop_recording()
+        if self.param_cache_path is not None and self.param_table.dirty and self.param_table.complete:
+            try:
+                self.save_param_cache()
+            except Exception:
+                self.logger.exception("Could not save the parameter cache")
+        if self.transmitter is not None:
+            self.transmitter.stop(join_timeout)
         if self.mav is not None:
             self.mav.close()
 
+    def start_recording(self, recorder):
+        """Hand every message the receiver parses to `recorder` (a
+        TlogRecorder) from now on."""
+        recorder.start()
+        self.recorder = recorder
+
+    def stop_recording(self):
+        """Detach the recorder and let it write out what it has queued."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
     def link_healthy(self, max_silence=5.0):
         """True if the receiver thread is alive and has parsed a message recently."""
         if self._rx_thread is None or not self._rx_thread.is_alive():
@@ -393,7 +575,8 @@ class Vehicle:
 
         Parses every incoming message (keeping pymavlink's mav.messages,
         flightmode, motors_armed() etc. consistent, since no other thread
-        parses) and dispatches it to registered subscriptions."""
+        parses), records hot types in the history and dispatches it to
+        registered subscriptions."""
         while not self._stop_event.is_set():
             try:
                 # The timeout only bounds idle iterations (shutdown/heartbeat
@@ -401,7 +584,17 @@ class Vehicle:
                 m = self.mav.recv_match(blocking=True, timeout=0.25)
                 if m is not None:
                     self._last_rx_monotonic = time.monotonic()
-                    if m.get_type() != 'BAD_DATA':
+                    mtype = m.get_type()
+                    self.rx_stats.record(mtype, self._last_rx_monotonic)
+                    if mtype != 'BAD_DATA':
+                        recorder = self.recorder
+                        if recorder is not None:
+                            recorder.record(m)
+                        self.history.record(m)
+                        if mtype == 'PARAM_VALUE' and self._from_autopilot(m):
+                            self.param_table.record(m)
+                        elif mtype == 'HEARTBEAT' and self._from_autopilot(m):
+                            self.autopilot_heartbeat = m
                         self._dispatch(m)
                 self._maybe_send_heartbeat()
             except Exception:
@@ -409,28 +602,45 @@ class Vehicle:
                     break
                 self.logger.exception("MAVLink receiver iteration failed")
                 time.sleep(0.5)
-        with self._sub_lock:
-            subs = list(self._subs)
-        for sub in subs:
+        for sub in self._subs:
             sub._offer(_STOP)
 
     def _dispatch(self, m):
-        if m.get_type() == 'STATUSTEXT':
-            self.progress("AP: %s" % m.text)
+        """Offer m to the subscriptions registered for its type.
+
+        Cost is proportional to the number of INTERESTED subscriptions, not to
+        the total number of waiters: one lock-free read of the index snapshot,
+        two dict lookups, then only matching subscriptions are touched."""
         mtype = m.get_type()
-        with self._sub_lock:
-            subs = list(self._subs)
-        for sub in subs:
-            if sub.types is not None and mtype not in sub.types:
+        if mtype == 'STATUSTEXT':
+            self.progress("AP: %s" % m.text)
+        index = self._sub_index
+        for bucket in (index.get(mtype), index.get(None)):
+            if bucket is None:
                 continue
-            if sub.predicate is not None:
-                try:
-                    if not sub.predicate(m):
+            for sub in bucket:
+                if sub.predicate is not None:
+                    try:
+                        if not sub.predicate(m):
+                            continue
+                    except Exception:
+                        self.logger.exception("subscription predicate failed")
                         continue
-                except Exception:
-                    self.logger.exception("subscription predicate failed")
-                    continue
-            sub._offer(m)
+                sub._offer(m)
+
+    def _rebuild_sub_index(self, subs):
+        """Publish a new subscription set. Caller holds _sub_lock.
+
+        Builds fresh containers and swaps them in with plain attribute
+        assignments, so the receiver only ever sees a complete index."""
+        index = {}
+        for sub in subs:
+            keys = (None,) if sub.types is None else sub.types
+            for key in keys:
+                index.setdefault(key, []).append(sub)
+        self._subs = subs
+        self._sub_index = {key: tuple(bucket) for key, bucket in index.items()}
+        self.rate_arbiter.update(subs)
 
     def _maybe_send_heartbeat(self, force=False):
         """Send our GCS heartbeat when due. Runs on the receiver thread each
@@ -459,7 +669,7 @@ class Vehicle:
     # Receive primitives ###############################################################################################
     ####################################################################################################################
     @contextmanager
-    def subscribe(self, types=None, predicate=None, maxsize=512):
+    def subscribe(self, types=None, predicate=None, maxsize=512, rate=None):
         """Register a Subscription and always unregister it on exit.
 
         INVARIANT: for request/response flows, subscribe BEFORE sending the
@@ -468,17 +678,36 @@ class Vehicle:
         impossible."""
         if self._stop_event.is_set():
             raise LinkDownException("MAVLink receiver stopped")
-        sub = Subscription(types=types, predicate=predicate, maxsize=maxsize)
-        with self._sub_lock:
-            self._subs.append(sub)
+        sub = Subscription(types=types, predicate=predicate, maxsize=maxsize, rate=rate)
+        self._register(sub)
         try:
             yield sub
         finally:
-            with self._sub_lock:
-                try:
-                    self._subs.remove(sub)
-                except ValueError:
-                    pass
+            self._unregister(sub)
+
+    @asynccontextmanager
+    async def subscribe_async(self, types=None, predicate=None, maxsize=512, rate=None):
+        """Coroutine counterpart of subscribe(): yields an AsyncSubscription
+        bound to the running event loop. The same subscribe-before-send
+        invariant applies."""
+        if self._stop_event.is_set():
+            raise LinkDownException("MAVLink receiver stopped")
+        sub = AsyncSubscription(asyncio.get_running_loop(), types=types,
+                                predicate=predicate, maxsize=maxsize, rate=rate)
+        self._register(sub)
+        try:
+            yield sub
+        finally:
+            self._unregister(sub)
+
+    def _register(self, sub):
+        with self._sub_lock:
+            self._rebuild_sub_index(self._subs + (sub,))
+
+    def _unregister(self, sub):
+        with self._sub_lock:
+            self._rebuild_sub_index(tuple(s for s in self._subs if s is not sub))
+            self.closed_sub_dropped += sub.dropped
 
     def latest(self, mtype, max_age=None):
         """Latest-by-type cache read; O(1), never blocks.
@@ -494,6 +723,20 @@ class Vehicle:
             return None
         return m
 
+    def snapshot(self, types):
+        """Latest message of each of `types` from ONE read of the cache.
+
+        mav.messages is copied in a single step (atomic under the GIL), so the
+        receiver cannot replace one type while another is being read: every
+        message returned coexisted in the cache at the same instant. Returns
+        (now, {type: message or None}); the age of a message is
+        now - message._timestamp. HEARTBEAT is the autopilot's own
+        (autopilot_heartbeat), never a companion's or a GCS's."""
+        messages = dict(self.mav.messages) if self.mav is not None else {}
+        messages['HEARTBEAT'] = self.autopilot_heartbeat
+        now = time.time()
+        return now, {t: messages.get(t, None) for t in types}
+
     def wait_message(self, types, timeout=10.0, predicate=None, allow_cached_age=None):
         """Return a message of one of `types`.
 
@@ -513,6 +756,35 @@ class Vehicle:
                         return m
             return sub.get(timeout=timeout)
 
+    async def wait_message_async(self, types, timeout=10.0, predicate=None, allow_cached_age=None):
+        """Coroutine counterpart of wait_message(); awaits instead of
+        blocking a thread."""
+        if isinstance(types, str):
+            types = (types,)
+        if self._rx_thread is None or not self._rx_thread.is_alive():
+            raise LinkDownException("MAVLink receiver is not running")
+        async with self.subscribe_async(types=set(types), predicate=predicate) as sub:
+            if allow_cached_age is not None:
+                for t in types:
+                    m = self.latest(t, max_age=allow_cached_age)
+                    if m is not None and (predicate is None or predicate(m)):
+                        return m
+            return await sub.get(timeout=timeout)
+
+    async def wait_fresh_async(self, mtype, since=None, max_age=None, timeout=10.0):
+        """Latest `mtype` satisfying the client's freshness bounds, awaiting
+        the next one from the receiver when the cached message does not.
+
+        since: only a message received after this `_timestamp` qualifies
+            ("the sample after the one I have").
+        max_age: a cached message at most this many seconds old qualifies.
+        With neither given, any cached message qualifies."""
+        predicate = None if since is None else (lambda m: m._timestamp > since)
+        if max_age is None:
+            max_age = math.inf
+        return await self.wait_message_async(mtype, timeout=timeout, predicate=predicate,
+                                             allow_cached_age=max_age)
+
     def location(self, relative_alt=False, timeout=5):
         """Current vehicle location, replacing mavutil.mavfile.location() with
         a cache/subscription implementation (and, unlike it, a timeout).
@@ -536,6 +808,23 @@ class Vehicle:
             alt = m.alt * 0.001
         return mavutil.location(m.lat * 1.0e-7, m.lon * 1.0e-7, alt, hud.heading)
 
+    async def location_async(self, relative_alt=False, timeout=5):
+        """Coroutine counterpart of location()."""
+        await self.wait_message_async(
+            'GPS_RAW_INT',
+            timeout=timeout,
+            predicate=lambda m: m.fix_type >= 3 and m.lat != 0,
+            allow_cached_age=2.0)
+        m = await self.wait_message_async('GLOBAL_POSITION_INT', timeout=timeout)
+        hud = self.latest('VFR_HUD')
+        if hud is None:
+            hud = await self.wait_message_async('VFR_HUD', timeout=timeout)
+        if relative_alt:
+            alt = m.relative_alt * 0.001
+        else:
+            alt = m.alt * 0.001
+        return mavutil.location(m.lat * 1.0e-7, m.lon * 1.0e-7, alt, hud.heading)
+
     def waypoint_current(self, timeout=5):
         """Current mission waypoint sequence number."""
         m = self.wait_message('MISSION_CURRENT', timeout=timeout, allow_cached_age=2.0)
@@ -576,10 +865,10 @@ class Vehicle:
     def rate_to_interval_us(self, rate):
         return 1 / float(rate) * 1000000.0
 
-    def set_message_rate_hz(self, id, rate_hz):
+    def set_message_rate_hz(self, id, rate_hz, timeout=10):
         """set a message rate in Hz; 0 for original, -1 to disable"""
         if isinstance(id, str):
-            id = eval("mavutil.mavlink.MAVLINK_MSG_ID_%s" % id)
+            id = message_id(id)
         if rate_hz == 0 or rate_hz == -1:
             set_interval = rate_hz
         else:
@@ -591,13 +880,19 @@ class Vehicle:
                      0,
                      0,
                      0,
-                     0)
+                     0,
+                     timeout=timeout)
 
     def send_get_message_interval(self, victim_message_id, timeout=5):
-        with self.subscribe(types={'MESSAGE_INTERVAL'}) as sub:
+        """Rate in Hz the autopilot reports for a message (name or id):
+        0.0 when the message is disabled, None when it reports no interval."""
+        if isinstance(victim_message_id, str):
+            victim_message_id = message_id(victim_message_id)
+        with self.subscribe(types={'MESSAGE_INTERVAL'},
+                            predicate=lambda m: m.message_id == victim_message_id) as sub:
             self.tx.command_long_send(
-                1,
-                1,
+                self.target_system,
+                self.target_component,
                 mavutil.mavlink.MAV_CMD_GET_MESSAGE_INTERVAL,
                 1,  # confirmation
                 float(victim_message_id),
@@ -608,17 +903,43 @@ class Vehicle:
                 0,
                 0)
             m = sub.get(timeout=timeout)
+        if m.interval_us == -1:
+            return 0.0
+        if m.interval_us <= 0:
+            return None
         return self.rate_to_interval_us(m.interval_us)
 
+    def apply_message_rates(self, rates, timeout=5):
+        """Set per-message rates ({name: Hz}) and verify each by reading it back.
+
+        Each message is set with MAV_CMD_SET_MESSAGE_INTERVAL, then queried
+        with MAV_CMD_GET_MESSAGE_INTERVAL. Returns, per name,
+        {"requested", "applied", "error"}, where "applied" is the rate the
+        autopilot reports afterwards; the result is also kept in
+        self.message_rates."""
+        report = {}
+        for name, rate_hz in rates.items():
+            entry = {"requested": rate_hz, "applied": None, "error": None}
+            try:
+                self.set_message_rate_hz(name, rate_hz, timeout=timeout)
+                entry["applied"] = self.send_get_message_interval(name, timeout=timeout)
+            except Exception as e:
+                entry["error"] = str(e) or type(e).__name__
+            report[name] = entry
+            self.progress("Message rate %s: %s" % (name, entry))
+        self.message_rates.update(report)
+        self.rate_arbiter.reset(report)
+        return report
+
     ####################################################################################################################
     # Parameters #######################################################################################################
     ####################################################################################################################
-    def send_set_parameter_direct(self, name, value):
+    def send_set_parameter_direct(self, name, value, param_type=mavutil.mavlink.MAV_PARAM_TYPE_REAL32):
         self.tx.param_set_send(self.target_system,
                                1,
                                name.encode('ascii'),
                                value,
-                               mavutil.mavlink.MAV_PARAM_TYPE_REAL32)
+                               param_type)
 
     def send_set_parameter(self, name, value, verbose=False):
         if verbose:
@@ -681,6 +1002,103 @@ class Vehicle:
             return
         raise ValueError("Failed to set parameters (%s)" % want)
 
+    def apply_parameters(self, parameters, window=16, retry_timeout=None, retries=3, epsilon_pct=0.00001,
+                         progress=None):
+        """Set many parameters with up to `window` PARAM_SETs in flight.
+
+        Each PARAM_SET is confirmed by the PARAM_VALUE the autopilot echoes;
+        echoes are matched as they arrive, and only a parameter whose echo is
+        missing after retry_timeout (or carries another value) is sent again,
+        at most `retries` more times. Without retry_timeout it adapts to the
+        link: three times the smoothed round trip of first-attempt echoes
+        (Karn's rule), between 0.1 s and 1 s. Parameters already at the wanted value
+        in self.param_table are not sent, and when the table is complete a
+        name it lacks fails without being sent. progress(done, total) is
+        called after each parameter settles.
+
+        Returns {"changed": {name: [old, new]}, "unchanged": [names],
+        "failed": {name: reason}}; old is None if it was not in the table."""
+        table = self.param_table
+        wanted = {name.upper(): float(value) for name, value in parameters.items()}
+        changed, unchanged, failed = {}, [], {}
+        old = {}
+        types = {}  # MAV_PARAM_TYPE the table knows, sent with each PARAM_SET
+        pending = collections.deque()
+        for name, value in wanted.items():
+            entry = table.get(name)
+            if entry is not None:
+                types[name] = entry[1]
+            if entry is None and table.complete:
+                failed[name] = "unknown parameter"
+            elif entry is not None and abs(entry[0] - value) <= epsilon_pct * 0.01 * abs(value):
+                unchanged.append(name)
+            else:
+                old[name] = entry[0] if entry is not None else None
+                pending.append(name)
+        total = len(wanted)
+
+        def settled():
+            if progress is not None:
+                progress(len(changed) + len(unchanged) + len(failed), total)
+
+        settled()
+        in_flight = {}  # name -> deadline of its last PARAM_SET
+        sent = {}  # name -> when its last PARAM_SET was sent
+        srtt = None
+        timeout = retry_timeout or 1.0
+        attempts = collections.Counter()
+        echoed = {}  # name -> value in its last mismatching echo
+        with self.subscribe(types={'PARAM_VALUE'},
+                            predicate=lambda m: m.param_id in old and self._from_autopilot(m)) as sub:
+            while pending or in_flight:
+                while pending and len(in_flight) < window:
+                    name = pending.popleft()
+                    attempts[name] += 1
+                    sent[name] = time.monotonic()
+                    in_flight[name] = sent[name] + timeout
+                    self.send_set_parameter_direct(
+                        name, wanted[name], types.get(name, mavutil.mavlink.MAV_PARAM_TYPE_REAL32))
+                now = time.monotonic()
+                retry = [name for name, deadline in in_flight.items() if deadline <= now]
+                if not retry:
+                    try:
+                        m = sub.get(timeout=min(in_flight.values()) - now)
+                    except TimeoutException:
+                        continue
+                    name = m.param_id
+                    if name in changed or name in failed:
+                        continue
+                    value = wanted[name]
+                    if abs(m.param_value - value) <= epsilon_pct * 0.01 * abs(value):
+                        # A late echo may confirm a parameter already queued again.
+                        if in_flight.pop(name, None) is None:
+                            pending.remove(name)
+                        elif retry_timeout is None and attempts[name] == 1:
+                            rtt = time.monotonic() - sent[name]
+                            srtt = rtt if srtt is None else 0.875 * srtt + 0.125 * rtt
+                            timeout = min(1.0, max(0.1, 3 * srtt))
+                        changed[name] = [old[name], m.param_value]
+                        settled()
+                        continue
+                    if name not in in_flight:
+                        continue
+                    # Rejected, or an older value still in transit: send again.
+                    echoed[name] = m.param_value
+                    retry = [name]
+                for name in reversed(retry):
+                    del in_flight[name]
+                    if attempts[name] > retries:
+                        failed[name] = ("autopilot reports %s" % echoed[name]) if name in echoed else "no PARAM_VALUE"
+                        settled()
+                    else:
+                        pending.appendleft(name)
+        if changed and self.param_cache_path is not None and table.complete:
+            try:
+                self.save_param_cache()
+            except OSError as e:
+                self.logger.warning("Could not save the parameter cache: %s" % e)
+        return {"changed": changed, "unchanged": unchanged, "failed": failed}
+
     @staticmethod
     def should_fetch_all_for_parameter_change(param_name):
         return False  # FIXME: if we allow MAVProxy then allow this
@@ -720,6 +1138,129 @@ class Vehicle:
                     return m.param_value
         raise NotAchievedException("Failed to retrieve parameter (%s)" % name)
 
+    def _from_autopilot(self, m):
+        """True for a message sent by the autopilot itself, not by a gimbal,
+        camera, companion computer or another vehicle on the same link."""
+        return m.get_srcSystem() == self.target_system and m.get_srcComponent() == self.target_component
+
+    def fetch_parameters(self, timeout=120, quiet_time=1.0, batch=20, keep=False):
+        """Download the whole parameter table into self.param_table.
+
+        Sends PARAM_REQUEST_LIST, then, whenever the stream goes quiet for
+        quiet_time, re-requests up to `batch` missing indices (or the list
+        again while the count is unknown). The receiver records each
+        PARAM_VALUE before it is dispatched, so this only waits and checks
+        for gaps. With keep=True the table is not cleared first: its values
+        keep being served while every index is read again (the refresh after
+        a cache warm start). Returns the parameter count."""
+        table = self.param_table
+        if not keep:
+            table.clear()
+        seen = set()  # indices read during this fetch
+
+        def done():
+            return table.complete and (not keep or len(seen) >= table.count)
+
+        deadline = time.time() + timeout
+        with self.subscribe(types={'PARAM_VALUE'}, predicate=self._from_autopilot, maxsize=2048) as sub:
+            self.tx.param_request_list_send(self.target_system, self.target_component)
+            while not done():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutException("Parameter download incomplete after %.0fs: %d of %s received" % (
+                        timeout, len(seen) if keep else len(table.names), table.count))
+                try:
+                    m = sub.get(timeout=min(quiet_time, remaining))
+                    if m.param_index != PARAM_INDEX_NONE:
+                        seen.add(m.param_index)
+                except TimeoutException:
+                    if table.count is None:
+                        self.tx.param_request_list_send(self.target_system, self.target_component)
+                        continue
+                    missing = [i for i in range(table.count) if i not in seen] if keep else table.missing()
+                    for index in missing[:batch]:
+                        self.tx.param_request_read_send(self.target_system, self.target_component, b"", index)
+        if not keep:
+            table.source = "autopilot"
+        table.verified = True
+        self.progress("Fetched %d parameters" % table.count)
+        return table.count
+
+    def identify_firmware(self, timeout=3):
+        """Firmware id (see params.firmware_id) from AUTOPILOT_VERSION, or None
+        if the autopilot does not answer."""
+        try:
+            with self.subscribe(types={'AUTOPILOT_VERSION'}) as sub:
+                self.send_cmd(mavutil.mavlink.MAV_CMD_REQUEST_MESSAGE,
+                              mavutil.mavlink.MAVLINK_MSG_ID_AUTOPILOT_VERSION, 0, 0, 0, 0, 0, 0)
+                self.firmware = firmware_id(sub.get(timeout=timeout))
+        except TimeoutException:
+            return None
+        return self.firmware
+
+    def load_param_cache(self, cache_dir, timeout=5):
+        """Warm-start self.param_table from cache_dir. The cache is used only
+        if it was saved for this sysid and firmware and the autopilot still
+        reports the same count and first parameter."""
+        if self.firmware is None and self.identify_firmware() is None:
+            return False
+        self.param_cache_path = cache_file(cache_dir, self.target_system, self.firmware)
+        if not self.param_table.load(self.param_cache_path, self.target_system, self.firmware):
+            return False
+        count, first = self.param_table.count, self.param_table.names.get(0)
+        try:
+            with self.subscribe(types={'PARAM_VALUE'},
+                                predicate=lambda m: m.param_index == 0 and self._from_autopilot(m)) as sub:
+                self.tx.param_request_read_send(self.target_system, self.target_component, b"", 0)
+                m = sub.get(timeout=timeout)
+        except TimeoutException:
+            self.param_table.clear()
+            return False
+        if m.param_count != count or m.param_id != first:
+            self.logger.info("Parameter cache %s is stale, refetching" % self.param_cache_path)
+            self.param_table.clear()
+            return False
+        return True
+
+    def save_param_cache(self):
+        self.param_table.save(self.param_cache_path, self.target_system, self.firmware)
+
+    def sync_parameters(self, cache_dir=None, timeout=120):
+        """Fill self.param_table from the cache in cache_dir when it is still
+        valid, otherwise from the autopilot (saving the result to the cache).
+
+        The count/first-name check cannot tell whether a value was changed
+        while the API was down, so a warm-started table is then read again
+        in full while its cached values are served (table.verified turns
+        True when that completes), and the cache is rewritten if anything
+        changed. Returns the table's source: "cache" or "autopilot"."""
+        if cache_dir is not None and self.load_param_cache(cache_dir):
+            self.progress("Loaded %d parameters from %s, refreshing" % (
+                self.param_table.count, self.param_cache_path))
+            try:
+                self.fetch_parameters(timeout=timeout, keep=True)
+            except TimeoutException as e:
+                self.logger.warning("Parameter refresh failed, serving cached values: %s" % e)
+                return "cache"
+            if self.param_table.dirty:
+                self.save_param_cache()
+            return "cache"
+        self.fetch_parameters(timeout=timeout)
+        if cache_dir is not None and self.firmware is not None:
+            self.save_param_cache()
+        return "autopilot"
+
+    def start_param_sync(self, cache_dir=None, timeout=120):
+        """sync_parameters() on a background thread; failures are logged."""
+        def run():
+            try:
+                self.sync_parameters(cache_dir, timeout=timeout)
+            except Exception:
+                self.logger.exception("Parameter sync failed")
+
+        self._param_thread = threading.Thread(target=run, name="param-sync", daemon=True)
+        self._param_thread.start()
+
     ####################################################################################################################
     # COMMAND_LONG / COMMAND_INT #######################################################################################
     ####################################################################################################################
@@ -841,13 +1382,53 @@ class Vehicle:
                               target_sysid=target_sysid, target_compid=target_compid)
             self._wait_ack(sub, command, want_result, timeout, tstart, quiet)
 
+    async def run_cmd_async(self, command, p1, p2, p3, p4, p5, p6, p7,
+                            want_result=mavutil.mavlink.MAV_RESULT_ACCEPTED,
+                            target_sysid=None, target_compid=None,
+                            timeout=10, quiet=False):
+        """Coroutine counterpart of run_cmd(): the ack wait holds no thread."""
+        async with self.subscribe_async(types={'COMMAND_ACK'},
+                                        predicate=lambda m: m.command == command) as sub:
+            tstart = time.time()
+            self.send_cmd(command, p1, p2, p3, p4, p5, p6, p7,
+                          target_sysid=target_sysid, target_compid=target_compid)
+            await self._wait_ack_async(sub, command, want_result, timeout, tstart, quiet)
+
+    async def run_cmd_int_async(self, command, p1, p2, p3, p4, x, y, z,
+                                frame=mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT,
+                                want_result=mavutil.mavlink.MAV_RESULT_ACCEPTED,
+                                target_sysid=None, target_compid=None,
+                                timeout=10, quiet=False):
+        """Coroutine counterpart of run_cmd_int()."""
+        async with self.subscribe_async(types={'COMMAND_ACK'},
+                                        predicate=lambda m: m.command == command) as sub:
+            tstart = time.time()
+            self.send_cmd_int(command, p1, p2, p3, p4, x, y, z,
+                              frame=frame,
+                              target_sysid=target_sysid, target_compid=target_compid)
+            await self._wait_ack_async(sub, command, want_result, timeout, tstart, quiet)
+
     def _wait_ack(self, sub, command, want_result, timeout, tstart, quiet):
         try:
             m = sub.get(timeout=timeout)
         except TimeoutException:
+            self.command_stats.record_timeout(command)
             raise TimeoutException("Did not get good COMMAND_ACK within %fs" % timeout)
+        self._check_ack(m, want_result, tstart, quiet)
+
+    async def _wait_ack_async(self, sub, command, want_result, timeout, tstart, quiet):
+        try:
+            m = await sub.get(timeout=timeout)
+        except TimeoutException:
+            self.command_stats.record_timeout(command)
+            raise TimeoutException("Did not get good COMMAND_ACK within %fs" % timeout)
+        self._check_ack(m, want_result, tstart, quiet)
+
+    def _check_ack(self, m, want_result, tstart, quiet):
+        elapsed = time.time() - tstart
+        self.command_stats.record_ack(m.command, m.result, elapsed)
         if not quiet:
-            self.progress("ACK received: %s (%fs)" % (str(m), time.time() - tstart))
+            self.progress("ACK received: %s (%fs)" % (str(m), elapsed))
         if m.result != want_result:
             raise ValueError("Expected %s got %s" % (
                 mavutil.mavlink.enums["MAV_RESULT"][want_result].name,
@@ -1012,6 +1593,18 @@ class Vehicle:
                     raise TimeoutException("Failed to get HOME_POSITION message")
         return home_message.to_dict()
 
+    async def get_home_position_async(self, timeout=10):
+        """Coroutine counterpart of get_home_position()."""
+        async with self.subscribe_async(types={'HOME_POSITION'}) as sub:
+            self.request_home_message()
+            try:
+                home_message = await sub.get(timeout=timeout)
+            except TimeoutException:
+                home_message = self.latest('HOME_POSITION')
+                if home_message is None:
+                    raise TimeoutException("Failed to get HOME_POSITION message")
+        return home_message.to_dict()
+
     def set_home(self, timeout=30):
         """Set the home position to the vehicle's current position.
 
@@ -1082,6 +1675,36 @@ class Vehicle:
                                accuracy=accuracy, validator=lambda value2, target2: validator(value2, None),
                                timeout=timeout, **kwargs)
 
+    async def wait_location_async(self,
+                                  loc,
+                                  accuracy=5.0,
+                                  timeout=30,
+                                  target_altitude=None,
+                                  height_accuracy=-1,
+                                  minimum_duration=0):
+        """Coroutine counterpart of wait_location()."""
+        here = None
+
+        async def get_distance_to_loc():
+            nonlocal here
+            here = await self.location_async()
+            return self.get_distance(here, loc)
+
+        def validator(value2, target2=None):
+            if value2 > accuracy:
+                return False
+            if target_altitude is not None and height_accuracy != -1:
+                return math.fabs(here.alt - target_altitude) <= height_accuracy
+            return True
+
+        debug_text = "Distance to Location (%.4f, %.4f) " % (loc.lat, loc.lng)
+        if target_altitude is not None:
+            debug_text += ",at altitude %.1f height_accuracy=%.1f, d" % (target_altitude, height_accuracy)
+        await self.wait_and_maintain_async(value_name=debug_text, target=0,
+                                           current_value_getter=get_distance_to_loc,
+                                           accuracy=accuracy, validator=validator,
+                                           timeout=timeout, minimum_duration=minimum_duration)
+
     def wait_distance_to_home(self, distance_min, distance_max, timeout=10, use_cached_home=True, **kwargs):
         """Wait for distance to home to be within specified bounds."""
         assert distance_min <= distance_max, "Distance min should be less than distance max."
@@ -1155,6 +1778,43 @@ class Vehicle:
             sum_of_achieved_values * (1.0 / count_of_achieved_values)) if count_of_achieved_values != 0 else str(
             last_value)))
 
+    async def wait_and_maintain_async(self, value_name, target, current_value_getter, validator=None,
+                                      accuracy=0.3, timeout=30, minimum_duration=0):
+        """Coroutine counterpart of wait_and_maintain() for scalar targets.
+
+        current_value_getter is a coroutine function; it should await a fresh
+        message so the loop is paced at the stream rate."""
+        tstart = time.time()
+        achieving_duration_start = None
+        sum_of_achieved_values = 0.0
+        count_of_achieved_values = 0
+        last_value = 0.0
+        self.progress("Waiting for %s=%.02f with accuracy %.02f" % (value_name, target, accuracy))
+        last_print_time = 0
+        while time.time() < tstart + timeout:
+            last_value = await current_value_getter()
+            if time.time() - last_print_time > 1:
+                self.progress("%s=%0.2f (want %f +- %f)" % (value_name, last_value, target, accuracy))
+                last_print_time = time.time()
+            if validator is not None:
+                is_value_valid = validator(last_value, target)
+            else:
+                is_value_valid = math.fabs(last_value - target) <= accuracy
+            if is_value_valid:
+                sum_of_achieved_values += last_value
+                count_of_achieved_values += 1
+                if achieving_duration_start is None:
+                    achieving_duration_start = time.time()
+                if time.time() - achieving_duration_start >= minimum_duration:
+                    self.progress("Attained %s=%f" % (value_name, sum_of_achieved_values / count_of_achieved_values))
+                    return True
+            else:
+                achieving_duration_start = None
+                sum_of_achieved_values = 0.0
+                count_of_achieved_values = 0
+        raise TimeoutException("Failed to attain %s want %s, reached %s" % (value_name, str(target), str(
+            sum_of_achieved_values / count_of_achieved_values if count_of_achieved_values != 0 else last_value)))
+
     def wait_for_alt(self, alt_min=30, timeout=30, max_err=5):
         """Wait for minimum altitude to be reached."""
         self.wait_altitude(alt_min - 1,
@@ -1456,121 +2116,341 @@ class Vehicle:
         raise WaitWaypointTimeout("Timed out waiting for waypoint %u of %u" %
                                   (wpnum_end, wpnum_end))
 
-    def send_all_waypoints(self, timeout=60):
-        """send all waypoints to vehicle"""
+    def send_all_waypoints(self, timeout=None, window=None):
+        """Upload self.wploader, sending only what changed (see update_mission)."""
+        items = [self.wploader.wp(i) for i in range(self.wploader.count())]
+        return self.update_mission(items, window=window, item_timeout=timeout)
+
+    def upload_mission(self, items, window=None, item_timeout=None, retries=3, progress=None):
+        """Upload `items` (MISSION_ITEM or MISSION_ITEM_INT messages, renumbered
+        in order) as the autopilot's mission and wait for its MISSION_ACK.
+
+        The autopilot asks for each item with MISSION_REQUEST or
+        MISSION_REQUEST_INT; both are answered with MISSION_ITEM_INT. Up to
+        `window` items are sent ahead of the requests, which ArduPilot takes in
+        order without asking, so a transfer needs about one round trip per
+        window instead of per item. A repeated request means an item was lost
+        and is answered by sending from that item again; the items already
+        sent behind it come back as MAV_MISSION_INVALID_SEQUENCE acks, which
+        are ignored while the transfer is open. MISSION_COUNT is
+        repeated (`retries` times) while no request arrives.
+        progress(done, total) is called as the autopilot confirms items.
+
+        Returns {"count", "seconds", "items_per_s", "requests",
+        "retransmitted"}. Raises NotAchievedException when the autopilot
+        rejects the mission and TimeoutException when no request or ack comes
+        for item_timeout seconds."""
+        packed = [self._mission_item_int(item, seq) for seq, item in enumerate(items)]
+        count = len(packed)
         with self._mission_lock:
-            # Subscribe before clear/count so no MISSION_REQUEST can slip by.
-            with self.subscribe(types={'MISSION_REQUEST', 'WAYPOINT_REQUEST'}) as sub:
-                self.txc.waypoint_clear_all_send()
-                self.progress("Sending %d waypoints" % self.wploader.count())
-                if self.wploader.count() == 0:
-                    return
-                self.txc.waypoint_count_send(self.wploader.count())
-                tstart = time.time()
+            tstart = time.monotonic()
+            requests, retransmitted = self._write_mission_items(
+                packed, 0, count - 1, lambda: self.tx.mission_count_send(
+                    self.target_system, self.target_component, count, mavutil.mavlink.MAV_MISSION_TYPE_MISSION),
+                window, item_timeout, retries, progress)
+            elapsed = time.monotonic() - tstart
+            self.mission_cache = MissionCache([item_key(m) for m in packed], "upload")
+        if progress is not None:
+            progress(count, count)
+        self.progress("Uploaded %d mission items in %.2fs" % (count, elapsed))
+        return {
+            "count": count,
+            "seconds": round(elapsed, 3),
+            "items_per_s": round(count / elapsed, 1) if elapsed > 0 else None,
+            "requests": requests,
+            "retransmitted": retransmitted,
+        }
+
+    def update_mission(self, items, window=None, item_timeout=None, retries=3, progress=None):
+        """Make `items` the autopilot's mission, sending only the items that
+        differ from self.mission_cache (the last mission uploaded or
+        downloaded) with one MISSION_WRITE_PARTIAL_LIST per changed range.
+
+        Falls back to upload_mission() when there is no cache, the item count
+        changes (a partial write cannot resize the mission), or the autopilot
+        no longer holds the cached mission: its MISSION_COUNT differs, or the
+        first item of a changed range or the last item differs from the cache
+        when read back.
+
+        Returns upload_mission()'s result plus "mode" ("full", "partial" or
+        "unchanged"), "reason" for a full upload, "ranges" (inclusive
+        [start, end] pairs sent) and "sent" (items sent)."""
+        packed = [self._mission_item_int(item, seq) for seq, item in enumerate(items)]
+        keys = [item_key(m) for m in packed]
+        count = len(packed)
+        with self._mission_lock:
+            tstart = time.monotonic()
+            cache = self.mission_cache
+            reason = None
+            if cache is None:
+                reason = "no cached mission"
+            elif len(cache.keys) != count:
+                reason = "item count changes from %d to %d" % (len(cache.keys), count)
+            else:
+                ranges = changed_ranges(cache.keys, keys)
+                reason = self._check_mission_cache(cache, [start for start, _ in ranges] + [count - 1] * (count > 0),
+                                                   retries=retries)
+            if reason is None:
+                total = sum(end - start + 1 for start, end in ranges)
+                done = 0
+                requests = retransmitted = 0
+                for start, end in ranges:
+                    def range_progress(n, _total, base=done):
+                        if progress is not None:
+                            progress(base + n, total)
+
+                    sent = self._write_mission_items(
+                        packed, start, end, lambda start=start, end=end: self.tx.mission_write_partial_list_send(
+                            self.target_system, self.target_component, start, end,
+                            mavutil.mavlink.MAV_MISSION_TYPE_MISSION),
+                        window, item_timeout, retries, range_progress)
+                    requests += sent[0]
+                    retransmitted += sent[1]
+                    done += end - start + 1
+                elapsed = time.monotonic() - tstart
+                self.mission_cache = MissionCache(keys, "upload")
+        if reason is not None:
+            self.progress("Uploading the whole mission: %s" % reason)
+            result = self.upload_mission(items, window=window, item_timeout=item_timeout, retries=retries,
+                                         progress=progress)
+            result.update(mode="full", reason=reason, ranges=[[0, count - 1]] if count else [], sent=count)
+            return result
+        if progress is not None:
+            progress(total, total)
+        self.progress("Updated %d of %d mission items in %.2fs" % (total, count, elapsed))
+        return {
+            "count": count,
+            "seconds": round(elapsed, 3),
+            "items_per_s": round(total / elapsed, 1) if total and elapsed > 0 else None,
+            "requests": requests,
+            "retransmitted": retransmitted,
+            "mode": "partial" if ranges else "unchanged",
+            "reason": None,
+            "ranges": ranges,
+            "sent": total,
+        }
+
+    def _write_mission_items(self, packed, first, last, open_transfer, window, item_timeout, retries, progress):
+        """Serve the autopilot's requests for packed[first..last] after
+        open_transfer() (MISSION_COUNT or MISSION_WRITE_PARTIAL_LIST, repeated
+        while no request arrives) until its MISSION_ACK; see upload_mission().
+        Call with _mission_lock held. Returns (requests, retransmitted)."""
+        window = max(1, window or self.MISSION_UPLOAD_WINDOW)
+        item_timeout = item_timeout or self.MISSION_ITEM_TIMEOUT
+        total = last - first + 1
+        mission = mavutil.mavlink.MAV_MISSION_TYPE_MISSION
+        with self.subscribe(types={'MISSION_REQUEST', 'MISSION_REQUEST_INT', 'MISSION_ACK'},
+                            predicate=lambda m: m.mission_type == mission) as sub:
+            try:
+                open_transfer()
+                opened = 1
+                requested = first - 1  # highest seq the autopilot asked for
+                next_seq = first  # next seq to send ahead
+                sent_max = first - 1  # highest seq ever sent
+                requests = retransmitted = 0
+                deadline = time.monotonic() + item_timeout
                 while True:
-                    now = time.time()
-                    if now - tstart > timeout:
-                        self.progress("Failed to send Mission")
-                        return
                     try:
-                        msg = sub.get(timeout=3)
+                        m = sub.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except TimeoutException:
+                        if requested < first and opened <= retries:
+                            open_transfer()
+                            opened += 1
+                            deadline = time.monotonic() + item_timeout
+                            continue
+                        raise TimeoutException("Mission upload stalled: no request or ack for %.1fs after item %d of %d"
+                                               % (item_timeout, requested, len(packed)))
+                    if m.get_type() == 'MISSION_ACK':
+                        if m.type == mavutil.mavlink.MAV_MISSION_INVALID_SEQUENCE:
+                            # ArduPilot's answer to each item sent ahead of one
+                            # that was lost; it re-requests the missing item.
+                            continue
+                        if m.type == mavutil.mavlink.MAV_MISSION_ACCEPTED:
+                            if sent_max < last:
+                                continue  # an ack left over from an earlier transfer
+                            return requests, retransmitted
+                        results = mavutil.mavlink.enums['MAV_MISSION_RESULT']
+                        raise NotAchievedException("Mission upload rejected: %s" % (
+                            results[m.type].name if m.type in results else m.type))
+                    deadline = time.monotonic() + item_timeout
+                    seq = m.seq
+                    if not first <= seq <= last:
+                        raise NotAchievedException("Autopilot requested item %d, expected %d to %d" % (
+                            seq, first, last))
+                    requests += 1
+                    if seq <= requested:
+                        next_seq = seq  # a repeated request: the item was lost, go back to it
+                    else:
+                        requested = seq
+                        next_seq = max(next_seq, seq)
+                    while next_seq <= last and next_seq < seq + window:
+                        if next_seq <= sent_max:
+                            retransmitted += 1
+                        self.tx.send(packed[next_seq])
+                        sent_max = max(sent_max, next_seq)
+                        next_seq += 1
+                    if progress is not None:
+                        progress(requested - first, total)
+            except Exception:
+                # Whatever the autopilot holds now, it is not the cached mission.
+                self.mission_cache = None
+                raise
+
+    def _check_mission_cache(self, cache, seqs, retries=3):
+        """None if the autopilot's mission still matches `cache` in count and
+        in the items at `seqs` (read back with MISSION_REQUEST_INT), else the
+        reason it does not. Call with _mission_lock held."""
+        retry_timeout = self.MISSION_RETRY_TIMEOUT
+        mission = mavutil.mavlink.MAV_MISSION_TYPE_MISSION
+        with self.subscribe(types={'MISSION_COUNT', 'MISSION_ITEM_INT', 'MISSION_ITEM'},
+                            predicate=lambda m: m.mission_type == mission) as sub:
+            for attempt in range(retries + 1):
+                self.tx.mission_request_list_send(self.target_system, self.target_component, mission)
+                try:
+                    count = sub.wait_for(lambda m: m.get_type() == 'MISSION_COUNT', timeout=retry_timeout).count
+                    break
+                except TimeoutException:
+                    continue
+            else:
+                return "no MISSION_COUNT"
+            if count != len(cache.keys):
+                self.tx.mission_ack_send(self.target_system, self.target_component,
+                                         mavutil.mavlink.MAV_MISSION_ACCEPTED, mission)
+                return "autopilot has %d items, cache %d" % (count, len(cache.keys))
+            wanted = set(seqs)
+            reason = None
+            for attempt in range(retries + 1):
+                for seq in sorted(wanted):
+                    self.tx.mission_request_int_send(self.target_system, self.target_component, seq, mission)
+                deadline = time.monotonic() + retry_timeout
+                while wanted:
+                    try:
+                        m = sub.get(timeout=max(0.0, deadline - time.monotonic()))
                     except TimeoutException:
+                        break
+                    if m.get_type() == 'MISSION_COUNT' or m.seq not in wanted:
                         continue
-                    if msg.seq >= self.wploader.count():
-                        self.progress("Request for bad waypoint %u (max %u)" % (msg.seq, self.wploader.count()))
-                        return
-                    wp = self.wploader.wp(msg.seq)
-                    wp_send = self.wp_to_mission_item_int(wp)
-
-                    self.tx.send(wp_send)
-                    self.progress("Sent waypoint %u : %s" % (msg.seq, self.wploader.wp(msg.seq)))
-                    if msg.seq == self.wploader.count() - 1:
-                        self.progress("Sent all %u waypoints" % self.wploader.count())
-                        return
-
-    def get_all_waypoints(self, timeout=30):
+                    wanted.discard(m.seq)
+                    if item_key(m) != cache.keys[m.seq]:
+                        reason = "item %d differs from the cache" % m.seq
+                        wanted.clear()
+                if not wanted:
+                    break
+            else:
+                reason = "items %s not read back" % sorted(wanted)
+            self.tx.mission_ack_send(self.target_system, self.target_component,
+                                     mavutil.mavlink.MAV_MISSION_ACCEPTED, mission)
+            return reason
+
+    def _mission_item_int(self, item, seq):
+        item = self.wp_to_mission_item_int(item)
+        return mavutil.mavlink.MAVLink_mission_item_int_message(
+            self.target_system, self.target_component, seq, item.frame, item.command, item.current, item.autocontinue,
+            item.param1, item.param2, item.param3, item.param4, item.x, item.y, item.z,
+            mavutil.mavlink.MAV_MISSION_TYPE_MISSION)
+
+    def get_all_waypoints(self, timeout=None, window=None):
+        """Download the autopilot's mission into self.wploader; returns its
+        item count (see download_mission)."""
+        return self.download_mission(window=window, timeout=timeout)["count"]
+
+    def download_mission(self, window=None, retry_timeout=None, retries=5, timeout=None):
+        """Download the autopilot's mission into self.wploader.
+
+        Keeps up to `window` MISSION_REQUEST_INTs in flight; items are stored
+        as they arrive, in any order (wp_received), and moved to wploader once
+        contiguous. A request unanswered after retry_timeout is repeated, so
+        only the gaps are asked for again, each at most `retries` more times.
+        MISSION_REQUEST_LIST is repeated the same way until MISSION_COUNT
+        arrives. The transfer ends with MISSION_ACK. With `timeout`, the whole
+        download must also finish within that many seconds.
+
+        Returns {"count", "seconds", "items_per_s", "requests", "items"}, with
+        items the MISSION_ITEM messages now in wploader. Raises
+        TimeoutException when an item or the count cannot be obtained."""
+        window = max(1, window or self.MISSION_DOWNLOAD_WINDOW)
+        retry_timeout = retry_timeout or self.MISSION_RETRY_TIMEOUT
+        mission = mavutil.mavlink.MAV_MISSION_TYPE_MISSION
         with self._mission_lock:
-            self.progress("Requesting Mission item count")
-            with self.subscribe(types={'WAYPOINT_COUNT', 'MISSION_COUNT',
-                                       'WAYPOINT', 'MISSION_ITEM', 'MISSION_ITEM_INT'}) as sub:
-                self.txc.waypoint_request_list_send()
+            with self.subscribe(types={'MISSION_COUNT', 'MISSION_ITEM_INT', 'MISSION_ITEM'},
+                                predicate=lambda m: m.mission_type == mission) as sub:
                 tstart = time.time()
-                while True:
-                    now = time.time()
-                    if now - tstart > timeout:
-                        self.progress("Failed to get Mission total item")
-                        return
+                for attempt in range(retries + 1):
+                    self.tx.mission_request_list_send(self.target_system, self.target_component, mission)
                     try:
-                        msg = sub.get(timeout=3)
+                        msg = sub.wait_for(lambda m: m.get_type() == 'MISSION_COUNT', timeout=retry_timeout)
+                        break
                     except TimeoutException:
                         continue
-                    if msg.get_type() not in ('WAYPOINT_COUNT', 'MISSION_COUNT'):
-                        continue
-                    self.wp_expected_count = msg.count
-                    self.progress("Got %s waypoints to get" % msg.count)
-                    self.wploader.clear()
-                    break
-                for seq in self.missing_wps_to_request():
-                    self.wp_requested[seq] = time.time()
-                    self.progress("Requesting waypoint %d" % seq)
-                    self.tx.mission_request_int_send(self.target_system, self.target_component, seq)
-                    tstart = time.time()
-                    while True:
-                        now = time.time()
-                        if now - tstart > timeout:
-                            self.progress("Failed to get Waypoint %d" % seq)
-                            return
+                else:
+                    raise TimeoutException("No MISSION_COUNT after %d requests" % (retries + 1))
+                self.wp_expected_count = msg.count
+                self.wploader.clear()
+                self.wp_requested = {}
+                self.wp_received = {}
+                attempts = collections.Counter()
+                requests = 0
+                try:
+                    while self.wploader.count() < self.wp_expected_count:
+                        if timeout is not None and time.time() - tstart > timeout:
+                            raise TimeoutException("Mission download incomplete after %.0fs: %d of %d items" % (
+                                timeout, self.wploader.count(), self.wp_expected_count))
+                        for seq in self.missing_wps_to_request(window, retry_timeout):
+                            if attempts[seq] > retries:
+                                raise TimeoutException("No reply for mission item %d of %d after %d requests" % (
+                                    seq, self.wp_expected_count, attempts[seq]))
+                            attempts[seq] += 1
+                            requests += 1
+                            self.wp_requested[seq] = time.time()
+                            self.tx.mission_request_int_send(self.target_system, self.target_component, seq, mission)
+                        oldest = min(self.wp_requested.values())
                         try:
-                            msg = sub.get(timeout=3)
+                            msg = sub.get(timeout=max(0.0, oldest + retry_timeout - time.time()))
                         except TimeoutException:
                             continue
-                        if msg.get_type() not in ('WAYPOINT', 'MISSION_ITEM', 'MISSION_ITEM_INT'):
+                        if msg.get_type() == 'MISSION_COUNT':
                             continue
                         if msg.get_type() == 'MISSION_ITEM_INT':
-                            if getattr(msg, 'mission_type', 0) != 0:
-                                # this is not a mission item, likely fence
-                                return
                             # our internal structure assumes MISSION_ITEM
                             msg = self.wp_from_mission_item_int(msg)
-                        if msg.seq < self.wploader.count():
-                            return
-                        if msg.seq + 1 > self.wp_expected_count:
-                            self.progress("Unexpected waypoint number %u - expected %u" % (msg.seq, self.wploader.count()))
+                        if msg.seq >= self.wp_expected_count or msg.seq < self.wploader.count():
+                            continue
                         self.wp_received[msg.seq] = msg
-
+                        self.wp_requested.pop(msg.seq, None)
                         next_seq = self.wploader.count()
                         while next_seq in self.wp_received:
-                            m = self.wp_received.pop(next_seq)
-                            self.wploader.add(m)
+                            self.wploader.add(self.wp_received.pop(next_seq))
                             next_seq += 1
-                        if self.wploader.count() != self.wp_expected_count:
-                            self.progress("m.seq=%u expected_count=%u" % (msg.seq, self.wp_expected_count))
-                            break
-                        if self.wploader.count() == self.wp_expected_count:
-                            self.progress("Got all Waypoints")
-                            break
-            for i in range(self.wploader.count()):
-                w = self.wploader.wp(i)
-                self.logger.debug("%u %u %.10f %.10f %f p1=%.1f p2=%.1f p3=%.1f p4=%.1f cur=%u auto=%u" % (
-                    w.command, w.frame, w.x, w.y, w.z,
-                    w.param1, w.param2, w.param3, w.param4,
-                    w.current, w.autocontinue))
-
-            self.wp_requested = {}
-            self.wp_received = {}
-            return self.wploader.count()
-
-    def missing_wps_to_request(self):
+                finally:
+                    self.wp_requested = {}
+                    self.wp_received = {}
+                self.tx.mission_ack_send(self.target_system, self.target_component,
+                                         mavutil.mavlink.MAV_MISSION_ACCEPTED, mission)
+                items = [self.wploader.wp(i) for i in range(self.wploader.count())]
+                self.mission_cache = MissionCache([item_key(m) for m in items], "download")
+        elapsed = time.time() - tstart
+        self.progress("Downloaded %d mission items in %.2fs" % (len(items), elapsed))
+        return {
+            "count": len(items),
+            "seconds": round(elapsed, 3),
+            "items_per_s": round(len(items) / elapsed, 1) if elapsed > 0 else None,
+            "requests": requests,
+            "items": items,
+        }
+
+    def missing_wps_to_request(self, window=1, retry_timeout=2.0):
+        """Seqs to request next: items not received yet whose last request
+        (if any) is older than retry_timeout, lowest first, while fewer than
+        `window` requests are fresh."""
         ret = []
         tnow = time.time()
-        next_seq = self.wploader.count()
-        for i in range(2 * self.wp_expected_count):
-            seq = next_seq + i
-            if seq + 1 > self.wp_expected_count:
-                continue
-            if seq in self.wp_requested and tnow - self.wp_requested[seq] < 2:
-                continue
-            ret.append(seq)
+        fresh = sum(1 for t in self.wp_requested.values() if tnow - t < retry_timeout)
+        seq = self.wploader.count()
+        while seq < self.wp_expected_count and fresh + len(ret) < window:
+            if seq not in self.wp_received and not (
+                    seq in self.wp_requested and tnow - self.wp_requested[seq] < retry_timeout):
+                ret.append(seq)
+            seq += 1
         return ret
 
     def wp_to_mission_item_int(self, wp):
@@ -1589,8 +2469,8 @@ class Vehicle:
                                                                   wp.param2,
                                                                   wp.param3,
                                                                   wp.param4,
-                                                                  int(wp.x * 1.0e7),
-                                                                  int(wp.y * 1.0e7),
+                                                                  int(round(wp.x * 1.0e7)),
+                                                                  int(round(wp.y * 1.0e7)),
                                                                   wp.z)
         return wp_int
 
@@ -1635,6 +2515,35 @@ class Vehicle:
                                                          0, 0, 0)
         self.wploader.add(p)
 
+    def load_survey(self, polygon, spacing, alt, heading=0.0, overshoot=0.0, takeoff_alt=None, rtl=True):
+        """Fill self.wploader with a lawnmower survey of `polygon` (see
+        survey.lawnmower): home, a takeoff to takeoff_alt (default alt) above
+        home, the survey waypoints at `alt` and, with rtl, a return to launch.
+        Needs add_wp_takeoff() from the vehicle class.
+
+        The loader is filled and copied under _mission_lock, so a concurrent
+        survey or mission download cannot interleave with it; upload the
+        copy with update_mission(). Returns (items, {"waypoints",
+        "length_m", "generation_ms"}); ValueError for a bad polygon or
+        spacing."""
+        tstart = time.perf_counter()
+        points = lawnmower(polygon, spacing, heading, overshoot)
+        generation = time.perf_counter() - tstart
+        with self._mission_lock:
+            self.init_wp()
+            home = self.wploader.wp(0)
+            self.add_wp_takeoff(home.x, home.y, takeoff_alt or alt)
+            for lat, lon in points.tolist():
+                self.add_waypoint(lat, lon, alt)
+            if rtl:
+                self.add_wp_rtl()
+            items = [self.wploader.wp(i) for i in range(self.wploader.count())]
+        return items, {
+            "waypoints": len(points),
+            "length_m": round(path_length(points), 1),
+            "generation_ms": round(generation * 1000.0, 3),
+        }
+
     def wp_mission_start(self):
         # As we don't have RC radio here, we trigger mission start with MAVLink.
         self.run_cmd(mavutil.mavlink.MAV_CMD_MISSION_START,
@@ -1650,6 +2559,7 @@ class Vehicle:
                      )
 
     def wp_clear(self):
+        self.mission_cache = None
         self.run_cmd(mavutil.mavlink.MAV_CMD_MISSION_CLEAR_ALL,
                      0,
                      0,
@@ -1778,6 +2688,15 @@ class Vehicle:
         self.progress("Received local position: %s" % str(msg))
         return Local_pos(x=msg.x, y=msg.y, z=msg.z)
 
+    async def get_ned_position_async(self, timeout=10, allow_cached_age=2.0):
+        """Coroutine counterpart of get_ned_position()."""
+        try:
+            msg = await self.wait_message_async('LOCAL_POSITION_NED', timeout=timeout,
+                                                allow_cached_age=allow_cached_age)
+        except TimeoutException:
+            raise TimeoutException("Failed to get LOCAL_POSITION_NED")
+        return Local_pos(x=msg.x, y=msg.y, z=msg.z)
+
     def get_message(self, msg_type, timeout=10):
         """Get most recent message of the given type sent by the vehicle."""
         try:
@@ -1797,27 +2716,8 @@ class Vehicle:
         return self.get_message("SYS_STATUS", timeout=timeout)
 
     def get_sensor_status(self, timeout=5, sensor_dict=None):
-        if sensor_dict is None:
-            sensor_dict = {
-                "gyro": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_3D_GYRO,
-                "accelerometer": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_3D_ACCEL,
-                "gps": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_GPS,
-                "altitude_control": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_Z_ALTITUDE_CONTROL,
-                "position_control": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_XY_POSITION_CONTROL,
-                "radio_receiver": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_RC_RECEIVER,
-                "motor_output": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_MOTOR_OUTPUTS,
-                "battery": mavutil.mavlink.MAV_SYS_STATUS_SENSOR_BATTERY,
-                "pre_arm_check": mavutil.mavlink.MAV_SYS_STATUS_PREARM_CHECK,
-            }
         sys_msg = self.get_message("SYS_STATUS", timeout)
-        s_data = {}
-        for key, value in sensor_dict.items():
-            s_data[key] = {
-                "present": bool(sys_msg.onboard_control_sensors_present & value),
-                "enabled": bool(sys_msg.onboard_control_sensors_enabled & value),
-                "health": bool(sys_msg.onboard_control_sensors_health & value),
-            }
-        return s_data
+        return sensor_states(sys_msg, sensor_dict)
 
     def get_battery_info(self, timeout=5):
         sys_msg = self.get_last_message("SYS_STATUS")